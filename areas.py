@@ -0,0 +1,269 @@
+"""
+API Documentation
+
+This module provides hierarchical, OSPF-style area routing for the controller.
+
+Nodes are tagged with a routing area (the "area" attribute of the graph nodes, see Network.add_node).
+Border routers are the nodes with a link into another area. Instead of one flat all-pairs computation,
+the controller then computes:
+
+    1. shortest paths inside every area, from every node of the area;
+    2. the backbone: the border routers, joined by the inter-area links and by virtual links between the
+       border routers of each area, weighted with their intra-area distance;
+    3. for every area, the backbone distance from every border router to that area;
+    4. for every node and every other area, the border router of its own area through which that area is
+       closest.
+
+The table of a node holds a path to every destination of its own area, plus one summary entry per
+other area, keyed by the shortest CIDR prefix that covers that area's addresses and no other (or, when
+the addresses of areas interleave, by the prefixes that cover exactly its addresses). A summary path
+leads to the chosen border router, followed by the next router beyond it when the node is that border
+router. Nodes only use the next hop, and every node picks the border router that minimizes its distance
+to the destination area, so forwarding is consistent hop by hop. Per-node tables and the computation
+grow with the area size and the number of areas instead of the network size. Routes are shortest to the
+destination area, not to the destination node, as with OSPF summaries.
+
+Node names that are not IPv4 addresses cannot be summarized and are listed one by one instead.
+
+Functions:
+    is_hierarchical(graph: NetworkX Graph) -> bool:
+        Returns whether the nodes of a graph are in more than one area.
+
+    area_prefixes(graph: NetworkX Graph) -> dict:
+        Returns the summary keys of every area.
+
+    area_routing_tables(graph: NetworkX Graph, algorithm: str = 'dijkstra', cancelled: callable = None) -> dict:
+        Computes hierarchical routing tables.
+
+    expand_summaries(routing_tables: dict, graph: NetworkX Graph) -> dict:
+        Replaces the summary entries of routing tables with one entry per destination.
+
+    summary_route(routing_table: dict, destination: str) -> list:
+        Returns the longest-prefix summary entry of a routing table that covers a destination.
+"""
+import bisect
+import collections
+import functools
+import ipaddress
+import networkx as nx
+import numpy as np
+
+
+def _members(graph):
+    members = collections.defaultdict(list)
+    for node, area in graph.nodes(data="area", default=0):
+        members[area].append(node)
+    return members
+
+
+def is_hierarchical(graph):
+    """
+    Returns whether the nodes of a graph are in more than one area.
+
+    Args:
+        graph (NetworkX Graph): The topology.
+
+    Returns:
+        bool: True if area routing applies.
+    """
+    areas = graph.nodes(data="area", default=0)
+    first = next(iter(areas), (None, 0))[1]
+    return any(area != first for _, area in areas)
+
+
+def area_prefixes(graph):
+    """
+    Returns the summary keys of every area: the shortest CIDR prefix that covers all the addresses of its
+    nodes and no address of another area, or else the prefixes that cover exactly its addresses, plus the
+    names of its nodes that are not IPv4 addresses.
+
+    Args:
+        graph (NetworkX Graph): The topology.
+
+    Returns:
+        dict: Area -> list of summary keys.
+    """
+    members = _members(graph)
+    addresses, others = {}, {}
+    for area, nodes in members.items():
+        addresses[area], others[area] = [], []
+        for node in nodes:
+            network = _network(node)
+            if network is not None and network.prefixlen == 32:
+                addresses[area].append(network)
+            else:
+                others[area].append(node)
+    everywhere = sorted((int(network.network_address), area) for area in members for network in addresses[area])
+    keys = [address for address, _ in everywhere]
+    prefixes = {}
+    for area in members:
+        summary = [str(network) for network in ipaddress.collapse_addresses(addresses[area])]
+        if addresses[area]:
+            low, high = int(min(addresses[area]).network_address), int(max(addresses[area]).network_address)
+            host_bits = (low ^ high).bit_length()
+            covering = ipaddress.IPv4Network((low >> host_bits << host_bits, 32 - host_bits))
+            start = bisect.bisect_left(keys, int(covering.network_address))
+            end = bisect.bisect_right(keys, int(covering.broadcast_address))
+            if all(other == area for _, other in everywhere[start:end]):
+                summary = [str(covering)]
+        prefixes[area] = summary + others[area]
+    return prefixes
+
+
+def area_routing_tables(graph, algorithm="dijkstra", cancelled=None):
+    """
+    Computes hierarchical routing tables: intra-area paths plus one summary entry per other area.
+
+    Args:
+        graph (NetworkX Graph): The topology, with an "area" attribute on its nodes and a "weight" on its edges.
+        algorithm (str, optional): 'dijkstra' or 'bellman', for the intra-area paths (default is 'dijkstra').
+        cancelled (callable, optional): Returns True when the computation should stop; it is checked
+                                        between sources.
+
+    Returns:
+        dict or None: Source name -> {destination name or summary key -> path}, or None if cancelled.
+    """
+    if algorithm == "dijkstra":
+        shortest = nx.single_source_dijkstra
+    elif algorithm == "bellman":
+        shortest = nx.single_source_bellman_ford
+    else:
+        raise ValueError("Invalid algorithm specified. Use 'dijkstra' or 'bellman_ford'.")
+    area_of = dict(graph.nodes(data="area", default=0))
+    members = _members(graph)
+    prefixes = area_prefixes(graph)
+    borders = {node for u, v in graph.edges if area_of[u] != area_of[v] for node in (u, v)}
+
+    # 1. Shortest paths inside every area
+    distances, tables = {}, {}
+    for nodes in members.values():
+        # A concrete copy: Dijkstra on a subgraph view filters every adjacency it reads
+        area_graph = nx.Graph(graph.subgraph(nodes))
+        for node in nodes:
+            if cancelled is not None and cancelled():
+                return None
+            distances[node], tables[node] = shortest(area_graph, node, weight="weight")
+
+    # 2. The backbone of border routers
+    backbone = nx.Graph()
+    backbone.add_nodes_from(borders)
+    backbone.add_weighted_edges_from((u, v, weight) for u, v, weight in graph.edges(data="weight")
+                                     if area_of[u] != area_of[v])
+    area_borders = {area: [node for node in nodes if node in borders] for area, nodes in members.items()}
+    for nodes in area_borders.values():
+        for index, u in enumerate(nodes):
+            for v in nodes[index + 1:]:
+                if v in distances[u] and not backbone.has_edge(u, v):
+                    backbone.add_edge(u, v, weight=distances[u][v])
+
+    # 3. Backbone distance from every border router to every area, and the backbone next hop towards it
+    areas = list(members)
+    to_area = {}
+    for target in areas:
+        if cancelled is not None and cancelled():
+            return None
+        if area_borders[target]:
+            to_area[target] = nx.multi_source_dijkstra(backbone, area_borders[target], weight="weight")
+
+    # 4. The best border router of every node for every other area
+    for area, nodes in members.items():
+        exits = area_borders[area]
+        targets = [target for target in areas if target != area and target in to_area]
+        if not exits or not targets:
+            continue
+        intra = np.array([[distances[node].get(border, np.inf) for border in exits] for node in nodes])
+        backbone_distance = np.array([[to_area[target][0].get(border, np.inf) for target in targets]
+                                      for border in exits])
+        total = intra[:, :, None] + backbone_distance[None, :, :]
+        best = total.argmin(axis=1)
+        reachable = np.isfinite(total.min(axis=1))
+        for i, node in enumerate(nodes):
+            table = tables[node]
+            for j, target in enumerate(targets):
+                if not reachable[i, j]:
+                    continue
+                border = exits[best[i, j]]
+                path = table[border]
+                if node == border:
+                    path = [node, _next_router(node, to_area[target][1][node], tables, area_of)]
+                table.update(dict.fromkeys(prefixes[target], path))
+    return tables
+
+
+def _next_router(border, backbone_path, tables, area_of):
+    # The backbone path leads from the destination area to this border router; walk it backwards
+    if len(backbone_path) < 2:
+        return border
+    following = backbone_path[-2]
+    if area_of[following] != area_of[border]:
+        return following
+    # A virtual link stands for the intra-area path between two border routers of the same area
+    return tables[border][following][1]
+
+
+@functools.lru_cache(maxsize=4096)
+def _network(key):
+    try:
+        return ipaddress.IPv4Network(key)
+    except ValueError:
+        return None
+
+
+def expand_summaries(routing_tables, graph):
+    """
+    Replaces the summary entries of routing tables with one [source, next hop] entry per destination, for
+    the formats that store a full next-hop matrix (binary snapshots and shared memory). Tables of a graph
+    with a single area are returned unchanged.
+
+    Args:
+        routing_tables (dict): Routing tables, as computed by area_routing_tables.
+        graph (NetworkX Graph): The topology they were computed for.
+
+    Returns:
+        dict: Source name -> {destination name -> path}.
+    """
+    if not is_hierarchical(graph):
+        return routing_tables
+    prefixes = area_prefixes(graph)
+    covered = collections.defaultdict(list)
+    for area, nodes in _members(graph).items():
+        for node in nodes:
+            address = _network(node)
+            for key in prefixes[area]:
+                network = _network(key)
+                if key == node or (address is not None and network is not None and address.subnet_of(network)):
+                    covered[key].append(node)
+                    break
+    expanded = {}
+    for source, table in routing_tables.items():
+        row = {}
+        for key, path in table.items():
+            if key in covered:
+                row.update(dict.fromkeys(covered[key], path[:2]))
+            else:
+                row[key] = path
+        expanded[source] = row
+    return expanded
+
+
+def summary_route(routing_table, destination):
+    """
+    Returns the summary entry of a routing table with the longest prefix that covers a destination.
+
+    Args:
+        routing_table (dict): A node's routing table.
+        destination (str): The name of the destination node.
+
+    Returns:
+        list or None: The path of the matching entry, or None if no summary covers the destination.
+    """
+    address = _network(destination)
+    if address is None:
+        return None
+    best, best_length = None, -1
+    for key, path in routing_table.items():
+        if "/" in key:
+            network = _network(key)
+            if network is not None and network.prefixlen > best_length and address.subnet_of(network):
+                best, best_length = path, network.prefixlen
+    return best
@@ -0,0 +1,171 @@
+"""
+API Documentation
+
+This module benchmarks how many node heartbeats the controller can process per second on one core.
+
+Requests are passed straight to TCPServer.process_request, without sockets, so the numbers show the
+controller's own cost per request: the legacy request, which needs an RSA decryption; the session-key
+handshake, which needs one as well but only once per session; and the heartbeat authenticated with the
+session key, which needs an HMAC instead. Requests are built beforehand, so the nodes' share of the
+work is not measured.
+
+With --shards N, N processes run concurrently as the shards of a sharded controller would: each one
+processes the requests of the nodes it owns and computes the routing tables of its own sources on a
+synthetic topology. Rates and times are taken from the first shard starting to the last one finishing,
+so they show how the controller scales with the number of cores.
+
+Functions:
+    measure(server: TCPServer, requests: list) -> float:
+        Processes requests and returns how many were processed per second.
+
+    run_benchmark(count: int) -> dict:
+        Measures the legacy requests, handshakes and authenticated heartbeats.
+
+    run_sharded_benchmark(count: int, shards: int, node_count: int = 1000) -> dict:
+        Measures legacy requests, heartbeats and route computation with concurrent shard processes.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import time
+import rsa
+import session_auth
+import controllerserver
+import topology
+from controllerserver import TCPServer
+from sharding import HashRing
+
+
+def measure(server, requests):
+    """
+    Processes requests one after another and returns how many were processed per second.
+
+    Args:
+        server (TCPServer): The controller.
+        requests (list): The requests, as sent by the nodes.
+
+    Returns:
+        float: Requests per second.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        for request in requests:
+            server.process_request(request)
+        elapsed = time.perf_counter() - started
+    return len(requests) / elapsed
+
+
+def run_benchmark(count):
+    """
+    Measures the legacy requests, handshakes and authenticated heartbeats of the NSFNet nodes.
+
+    Args:
+        count (int): Number of requests of each kind.
+
+    Returns:
+        dict: Requests per second of each kind, and the speedup of heartbeats over legacy requests.
+    """
+    server = TCPServer("localhost", 0, "dijkstra")
+    server.routing_tables = server.build_routing_tables(controllerserver.network.graph)
+    names = sorted(server.routing_tables)
+    public_key = controllerserver.public_key
+
+    legacy = [rsa.encrypt(f"{names[i % len(names)]} 0".encode(), public_key) for i in range(count)]
+    keys = {name: session_auth.new_session_key() for name in names}
+    handshakes = [session_auth.handshake_request(names[i % len(names)], keys[names[i % len(names)]], 0, public_key)
+                  for i in range(count)]
+    heartbeats = [session_auth.heartbeat_request(names[i % len(names)], keys[names[i % len(names)]], i + 1, 0)
+                  for i in range(count)]
+
+    results = {"legacy_per_s": measure(server, legacy), "handshakes_per_s": measure(server, handshakes)}
+    # Register the keys the heartbeats were signed with (the last handshakes did, but with counter 0)
+    server.node_keys = {name: [key, 0] for name, key in keys.items()}
+    results["heartbeats_per_s"] = measure(server, heartbeats)
+    results["speedup"] = results["heartbeats_per_s"] / results["legacy_per_s"]
+    return results
+
+
+def _run_shard(shard, shards, count, node_count, barrier, results):
+    server = TCPServer("localhost", 0, "dijkstra")
+    server.ring = HashRing(shards)
+    server.shard = shard
+    server.routing_tables = server.build_routing_tables(controllerserver.network.graph)
+    names = sorted(server.routing_tables)
+    share = count // shards
+    legacy = [rsa.encrypt(f"{names[i % len(names)]} 0".encode(), controllerserver.public_key) for i in range(share)]
+    server.node_keys = {name: [session_auth.new_session_key(), 0] for name in names}
+    heartbeats = [session_auth.heartbeat_request(names[i % len(names)], server.node_keys[names[i % len(names)]][0],
+                                                 i + 1, 0) for i in range(share)]
+    graph = topology.generate_topology("geometric", node_count).graph
+    # All the shards start each measurement together, so that they compete for the cores as in production
+    result = {}
+    for kind, run in (("legacy", lambda: measure(server, legacy)), ("heartbeats", lambda: measure(server, heartbeats)),
+                      ("compute", lambda: server.build_routing_tables(graph))):
+        barrier.wait()
+        started = time.monotonic()
+        run()
+        result[kind] = (started, time.monotonic())
+    results.put((share, result))
+
+
+def run_sharded_benchmark(count, shards, node_count=1000):
+    """
+    Measures legacy requests, authenticated heartbeats and route computation with one process per shard,
+    running concurrently. The NSFNet nodes are split between the shards with the controller's hash ring.
+
+    Args:
+        count (int): Number of requests of each kind, over all the shards.
+        shards (int): Number of shard processes.
+        node_count (int, optional): Nodes of the geometric topology the routes are computed on (default is 1000).
+
+    Returns:
+        dict: Requests per second of each kind over all the shards, and the wall time of the route
+              computation.
+    """
+    barrier = multiprocessing.Barrier(shards)
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_run_shard, args=(shard, shards, count, node_count, barrier, queue))
+                 for shard in range(shards)]
+    for process in processes:
+        process.start()
+    shard_results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    def wall_time(kind):
+        return (max(result[kind][1] for _, result in shard_results)
+                - min(result[kind][0] for _, result in shard_results))
+
+    requests = sum(share for share, _ in shard_results)
+    return {"shards": shards, "legacy_per_s": requests / wall_time("legacy"),
+            "heartbeats_per_s": requests / wall_time("heartbeats"), "compute_s": wall_time("compute")}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the controller's heartbeat processing rate per core.")
+    parser.add_argument("--count", type=int, default=2000, help="number of requests of each kind")
+    parser.add_argument("--shards", type=int, nargs="+",
+                        help="measure a sharded controller with each of these shard counts instead")
+    parser.add_argument("--nodes", type=int, default=1000,
+                        help="nodes of the topology the shards compute routes on (default 1000)")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.shards:
+        results = [run_sharded_benchmark(args.count, shards, args.nodes) for shards in args.shards]
+        print(f"{'shards':>6} {'legacy (/s)':>12} {'heartbeats (/s)':>16} {'compute (s)':>12}")
+        for result in results:
+            print(f"{result['shards']:>6} {result['legacy_per_s']:>12.0f} {result['heartbeats_per_s']:>16.0f} "
+                  f"{result['compute_s']:>12.2f}")
+    else:
+        results = run_benchmark(args.count)
+        print(f"Legacy RSA requests:      {results['legacy_per_s']:10.0f} /s")
+        print(f"Session handshakes:       {results['handshakes_per_s']:10.0f} /s")
+        print(f"Authenticated heartbeats: {results['heartbeats_per_s']:10.0f} /s")
+        print(f"Heartbeat speedup:        {results['speedup']:10.1f} x")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+        print(f"Results written to {args.output}")
@@ -0,0 +1,317 @@
+"""
+API Documentation
+
+This module provides an end-to-end latency and throughput benchmark for the full NSFNet mesh.
+
+The controller and all nodes are launched as local processes in a scratch copy of the project, so the
+routing_tables.json of the working tree is left untouched. The nodes are only started once the
+controller has computed its first routing tables, so that no message is routed over the bootstrap
+routing_tables.json, which may describe another topology. Text and media messages are then sent
+between every (origin, destination) pair with loadgen.LoadGenerator, which takes the place of the
+receiving clients, and the results are written to a JSON file.
+
+Functions:
+    launch_mesh(workdir: str, node_count: int, algorithm: str, log_dir: str = None, timeout: float = 60) -> list:
+        Starts the controller and, once it has computed routing tables, the nodes, and returns their processes.
+
+    wait_for_ports(ports: list, timeout: float) -> bool:
+        Waits until every port accepts connections.
+
+    wait_for_tables(node_name: str, public_key: rsa.PublicKey, timeout: float, port: int = 8000) -> int:
+        Waits until the controller has computed routing tables and returns their version.
+
+    all_pairs_requests(nodes: list, text_count: int, media_count: int, text_size: int,
+                       media_size: int) -> list:
+        Returns the send requests for text and media traffic between every pair of nodes.
+
+    summarize(stats: dict, deliveries: list) -> dict:
+        Aggregates the load generator statistics by message type and by pair.
+
+    compare_with_baseline(results: dict, baseline: dict, threshold: float) -> list:
+        Returns the metrics that regressed by more than threshold.
+"""
+import argparse
+import json
+import os
+import pickle
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import rsa
+from loadgen import LoadGenerator, percentile
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_FILES = ("pri_key.txt", "pub_key.txt", "port_mapping.json", "routing_tables.json")
+# Metrics where a higher value is a regression; for the others a lower value is
+LATENCY_METRICS = ("latency_p50_s", "latency_p95_s", "latency_p99_s")
+THROUGHPUT_METRICS = ("messages_per_s", "bytes_per_s")
+
+
+def launch_mesh(workdir, node_count, algorithm, log_dir=None, timeout=60):
+    """
+    Starts the controller and the nodes as processes running in workdir. The nodes are started once the
+    controller has computed its first routing tables, so that they fetch those and not the bootstrap file.
+
+    Args:
+        workdir (str): Directory holding a copy of the project.
+        node_count (int): Number of nodes to start (node1.py to nodeN.py).
+        algorithm (str): Routing algorithm given to the controller.
+        log_dir (str, optional): Directory for the processes' output. The output is discarded if omitted.
+        timeout (float, optional): Seconds to wait for the first routing tables (default is 60).
+
+    Returns:
+        list: The started processes, controller first.
+
+    Raises:
+        RuntimeError: If the controller computes no routing tables in time; its process is stopped.
+    """
+    processes = []
+
+    def start(name, args):
+        output = open(os.path.join(log_dir, f"{name}.log"), "w") if log_dir else subprocess.DEVNULL
+        process = subprocess.Popen([sys.executable, "-u"] + args, cwd=workdir, stdout=output,
+                                   stderr=subprocess.STDOUT)
+        processes.append(process)
+        return process
+
+    controller = start("controllerserver", ["controllerserver.py", "--algorithm", algorithm])
+    with open(os.path.join(workdir, "pub_key.txt"), "rb") as file:
+        public_key = pickle.load(file)
+    with open(os.path.join(workdir, "port_mapping.json"), "r") as file:
+        first_node = next(iter(json.load(file)))
+    if not wait_for_ports([8000], 10) or wait_for_tables(first_node, public_key, timeout) is None:
+        controller.terminate()
+        controller.wait()
+        raise RuntimeError("The controller computed no routing tables in time.")
+    for index in range(1, node_count + 1):
+        start(f"node{index}", [f"node{index}.py"])
+    return processes
+
+
+def wait_for_ports(ports, timeout):
+    """
+    Waits until every port on localhost accepts connections.
+
+    Args:
+        ports (list): The ports to wait for.
+        timeout (float): Seconds to wait in total.
+
+    Returns:
+        bool: True if all ports accept connections, False on timeout.
+    """
+    deadline = time.monotonic() + timeout
+    for port in ports:
+        while True:
+            try:
+                socket.create_connection(("localhost", port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    return False
+                time.sleep(0.1)
+    return True
+
+
+def wait_for_tables(node_name, public_key, timeout, port=8000):
+    """
+    Waits until the controller has computed routing tables, version 1 or later, asking with the plain
+    request of a node that holds version 0.
+
+    Args:
+        node_name (str): A node of the bootstrap routing tables to ask as.
+        public_key (rsa.PublicKey): The public key used to encrypt the request.
+        timeout (float): Seconds to wait in total.
+        port (int, optional): The controller port (default is 8000).
+
+    Returns:
+        int or None: The version of the routing tables, or None on timeout.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection(("localhost", port), timeout=5) as client_socket:
+                client_socket.sendall(rsa.encrypt(f"{node_name} 0".encode(), public_key))
+                chunks = []
+                while True:
+                    chunk = client_socket.recv(65536)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+            version = json.loads(b"".join(chunks)).get("version", 0)
+            if version >= 1:
+                return version
+        except (OSError, ValueError):
+            pass
+        if time.monotonic() > deadline:
+            return None
+        time.sleep(0.2)
+
+
+def all_pairs_requests(nodes, text_count, media_count, text_size, media_size):
+    """
+    Returns the send requests for text and media traffic between every ordered pair of nodes.
+
+    Args:
+        nodes (list): The node names.
+        text_count (int): Text messages per pair.
+        media_count (int): Media messages per pair.
+        text_size (int): Payload size of a text message in bytes.
+        media_size (int): Payload size of a media message in bytes.
+
+    Returns:
+        list: The send requests.
+    """
+    requests = []
+    for origin in nodes:
+        for destination in nodes:
+            if origin == destination:
+                continue
+            if text_count:
+                requests.append({"origin": origin, "destination": destination, "type": "user_message",
+                                 "payload_size": text_size, "count": text_count})
+            if media_count:
+                requests.append({"origin": origin, "destination": destination, "type": "audio_message",
+                                 "payload_size": media_size, "count": media_count})
+    return requests
+
+
+def summarize(stats, deliveries):
+    """
+    Aggregates the load generator statistics by message type and by pair.
+
+    Args:
+        stats (dict): The statistics returned by LoadGenerator.run.
+        deliveries (list): LoadGenerator.deliveries.
+
+    Returns:
+        dict: The overall statistics, per message type statistics and per pair statistics.
+    """
+    by_type = {}
+    by_pair = {}
+    for delivery in deliveries:
+        by_type.setdefault(delivery["type"], []).append(delivery)
+        by_pair.setdefault((delivery["origin"], delivery["destination"]), []).append(delivery)
+
+    def describe(group):
+        latencies = [delivery["latency_s"] for delivery in group]
+        hops = [delivery["hops"] for delivery in group if delivery["hops"] is not None]
+        return {
+            "delivered": len(group),
+            "bytes": sum(delivery["bytes"] for delivery in group),
+            "hops_mean": sum(hops) / len(hops) if hops else None,
+            "hops_max": max(hops) if hops else None,
+            "latency_p50_s": percentile(latencies, 50),
+            "latency_p95_s": percentile(latencies, 95),
+            "latency_p99_s": percentile(latencies, 99),
+        }
+
+    summary = dict(stats)
+    summary.update({key: value for key, value in describe(deliveries).items() if key.startswith("hops")})
+    return {
+        "summary": summary,
+        "by_type": {message_type: describe(group) for message_type, group in by_type.items()},
+        "pairs": [dict(origin=origin, destination=destination, **describe(group))
+                  for (origin, destination), group in sorted(by_pair.items())],
+    }
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """
+    Returns the summary metrics that regressed by more than threshold against the baseline.
+
+    Args:
+        results (dict): The current results.
+        baseline (dict): Results of an earlier run.
+        threshold (float): Allowed relative change, e.g. 0.2 for 20%.
+
+    Returns:
+        list: A description of every regression.
+    """
+    regressions = []
+    current, previous = results["summary"], baseline["summary"]
+    for metric in LATENCY_METRICS + THROUGHPUT_METRICS:
+        if current.get(metric) is None or not previous.get(metric):
+            continue
+        change = (current[metric] - previous[metric]) / previous[metric]
+        if (metric in LATENCY_METRICS and change > threshold) or (
+                metric in THROUGHPUT_METRICS and -change > threshold):
+            regressions.append(f"{metric}: {previous[metric]:.6g} -> {current[metric]:.6g} ({change:+.1%})")
+    if current.get("lost", 0) > previous.get("lost", 0):
+        regressions.append(f"lost: {previous.get('lost', 0)} -> {current['lost']}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end latency and throughput of the full mesh.")
+    parser.add_argument("--nodes", type=int, default=14, help="number of nodes to launch")
+    parser.add_argument("--algorithm", default="dijkstra", help="routing algorithm of the controller")
+    parser.add_argument("--text-count", type=int, default=5, help="text messages per pair")
+    parser.add_argument("--media-count", type=int, default=1, help="media messages per pair")
+    parser.add_argument("--text-size", type=int, default=40, help="text payload size in bytes")
+    parser.add_argument("--media-size", type=int, default=1060, help="media payload size in bytes")
+    parser.add_argument("--in-flight", type=int, default=8, help="maximum number of concurrent connections")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for outstanding messages")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file for the results")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression")
+    parser.add_argument("--warmup", type=float, default=1, help="seconds to let the nodes fetch their routing "
+                        "tables before sending, once the controller has computed them (default 1)")
+    parser.add_argument("--log-dir", help="directory for the output of the launched processes")
+    args = parser.parse_args()
+
+    with open(os.path.join(PROJECT_DIR, "port_mapping.json"), "r") as file:
+        port_mapping = json.load(file)
+    with open(os.path.join(PROJECT_DIR, "pub_key.txt"), "rb") as file:
+        public_key = pickle.load(file)
+    nodes = list(port_mapping)[:args.nodes]
+
+    workdir = tempfile.mkdtemp(prefix="nsfnet-bench-")
+    for name in os.listdir(PROJECT_DIR):
+        if name.endswith(".py") or name in PROJECT_FILES:
+            shutil.copy(os.path.join(PROJECT_DIR, name), workdir)
+    if args.log_dir:
+        os.makedirs(args.log_dir, exist_ok=True)
+    # Make sure the launched processes are stopped when the benchmark itself is terminated
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1))
+    try:
+        processes = launch_mesh(workdir, args.nodes, args.algorithm, args.log_dir)
+    except RuntimeError as e:
+        shutil.rmtree(workdir, ignore_errors=True)
+        sys.exit(str(e))
+    try:
+        if not wait_for_ports([port_mapping[node] for node in nodes], 30):
+            sys.exit("Nodes did not start listening in time.")
+        time.sleep(args.warmup)
+        generator = LoadGenerator(port_mapping, public_key, args.in_flight, args.timeout)
+        requests = all_pairs_requests(nodes, args.text_count, args.media_count, args.text_size, args.media_size)
+        stats = generator.run(requests)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = summarize(stats, generator.deliveries)
+    results["config"] = vars(args)
+    results["timestamp"] = time.time()
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=4)
+    for key, value in results["summary"].items():
+        print(f"{key}: {value}")
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        if regressions:
+            print("Regressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against the baseline.")
@@ -0,0 +1,202 @@
+"""
+API Documentation
+
+This module provides a scaling benchmark for the routing algorithms of dijkstra_paths and of the controller.
+
+Synthetic topologies of several families and sizes are generated with topology.generate_topology,
+with bandwidth-weighted links as Network.add_link creates them. Each algorithm is timed on each topology,
+its peak memory is measured with tracemalloc in a separate run, and the results are written as a
+scaling table, a JSON file and a log-log chart, so they can be tracked over releases. For functions that
+return routing tables, the mean number of entries per node is recorded too: on the multi_area family the
+controller computes area tables with summaries, which flat_routing_tables does not.
+
+Algorithms whose cost grows too fast are skipped above their node limit (see ALGORITHMS).
+
+Functions:
+    measure(function: callable, network: Network, memory: bool = True) -> dict:
+        Times a routing function, measures its peak memory and the size of the tables it returns.
+
+    run_benchmark(families: list, sizes: list, algorithms: list, memory: bool = True, seed: int = 1) -> list:
+        Runs every algorithm on every topology and returns the measurements.
+
+    format_table(results: list) -> str:
+        Formats the measurements as a scaling table.
+
+    plot_results(results: list, file_name: str):
+        Writes a log-log chart of time against node count.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import time
+import tracemalloc
+import networkx as nx
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import dijkstra_paths
+from controllerserver import TCPServer
+from topology import FAMILIES, generate_topology
+
+SIZES = (100, 500, 1000, 5000, 10000, 20000)
+
+
+def _bellman_ford_pair(network):
+    names = list(network.graph.nodes)
+    return dijkstra_paths.find_path_bellman_ford(network, names[0], names[-1])
+
+
+def _dijkstra_pair(network):
+    names = list(network.graph.nodes)
+    return dijkstra_paths.find_shortest_path_dijks(network, names[0], names[-1])
+
+
+def _controller_tables(network):
+    return TCPServer("localhost", 0, "dijkstra").build_routing_tables(network.graph)
+
+
+def _flat_tables(network):
+    return dict(nx.all_pairs_dijkstra_path(network.graph))
+
+
+# Algorithm name -> (function, largest node count it is run on)
+ALGORITHMS = {
+    "find_path_bellman_ford": (_bellman_ford_pair, 1000),
+    "compute_shortest_paths_bellman_ford": (dijkstra_paths.compute_shortest_paths_bellman_ford, 100),
+    "find_shortest_path_dijks": (_dijkstra_pair, 20000),
+    "compute_all_shortest_paths": (dijkstra_paths.compute_all_shortest_paths, 1000),
+    "compute_all_widest_paths": (dijkstra_paths.compute_all_widest_paths, 2000),
+    "compute_routing_tables": (_controller_tables, 2000),
+    "flat_routing_tables": (_flat_tables, 2000),
+}
+
+
+def measure(function, network, memory=True):
+    """
+    Times a routing function and measures its peak memory. Output printed by the function is discarded.
+    If it returns routing tables (a dict of dicts), the mean number of entries per node is recorded.
+
+    Args:
+        function (callable): A function taking the network.
+        network (Network): The network.
+        memory (bool, optional): Whether to measure peak memory in a second, traced run (default is True).
+
+    Returns:
+        dict: The wall time in seconds, the peak memory in bytes (None if not measured) and the mean
+              table entries per node (None if the function does not return tables).
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        tables = function(network)
+        elapsed = time.perf_counter() - started
+        entries = None
+        if isinstance(tables, dict) and tables and all(isinstance(table, dict) for table in tables.values()):
+            entries = sum(map(len, tables.values())) / len(tables)
+        del tables
+        peak = None
+        if memory:
+            tracemalloc.start()
+            function(network)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return {"time_s": elapsed, "peak_memory_bytes": peak, "entries_per_node": entries}
+
+
+def run_benchmark(families, sizes, algorithms, memory=True, seed=1):
+    """
+    Runs every algorithm on every topology.
+
+    Args:
+        families (list): Topology families.
+        sizes (list): Node counts.
+        algorithms (list): Algorithm names, keys of ALGORITHMS.
+        memory (bool, optional): Whether to measure peak memory (default is True).
+        seed (int, optional): Random seed (default is 1).
+
+    Returns:
+        list: One measurement per (family, size, algorithm).
+    """
+    results = []
+    for family in families:
+        for size in sizes:
+            network = generate_topology(family, size, seed)
+            for name in algorithms:
+                function, limit = ALGORITHMS[name]
+                if size > limit:
+                    continue
+                result = {"family": family, "nodes": len(network.nodes), "edges": len(network.links),
+                          "algorithm": name}
+                result.update(measure(function, network, memory))
+                print(f"{family:<10} {size:>6} {name:<36} {result['time_s']:.4f} s")
+                results.append(result)
+    return results
+
+
+def format_table(results):
+    """
+    Formats the measurements as a scaling table.
+
+    Args:
+        results (list): Measurements returned by run_benchmark.
+
+    Returns:
+        str: The table.
+    """
+    lines = [f"{'family':<10} {'nodes':>6} {'edges':>7} {'algorithm':<36} {'time (s)':>10} {'peak (MiB)':>11} "
+             f"{'entries/node':>12}"]
+    for result in results:
+        peak = result["peak_memory_bytes"]
+        peak = f"{peak / 2 ** 20:11.2f}" if peak is not None else f"{'-':>11}"
+        entries = result.get("entries_per_node")
+        entries = f"{entries:12.1f}" if entries is not None else f"{'-':>12}"
+        lines.append(f"{result['family']:<10} {result['nodes']:>6} {result['edges']:>7} {result['algorithm']:<36} "
+                     f"{result['time_s']:>10.4f} {peak} {entries}")
+    return "\n".join(lines)
+
+
+def plot_results(results, file_name):
+    """
+    Writes a log-log chart of time against node count, one panel per topology family.
+
+    Args:
+        results (list): Measurements returned by run_benchmark.
+        file_name (str): The image file to write.
+    """
+    families = sorted({result["family"] for result in results})
+    figure = Figure(figsize=(6 * len(families), 5))
+    FigureCanvasAgg(figure)
+    for index, family in enumerate(families, 1):
+        ax = figure.add_subplot(1, len(families), index)
+        for name in ALGORITHMS:
+            points = [(r["nodes"], r["time_s"]) for r in results if r["family"] == family and r["algorithm"] == name]
+            if points:
+                ax.plot(*zip(*points), marker="o", label=name)
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        ax.set_title(family)
+        ax.set_xlabel("nodes")
+        ax.set_ylabel("time (s)")
+        ax.legend(fontsize=7)
+    figure.tight_layout()
+    figure.savefig(file_name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark how the routing algorithms scale.")
+    parser.add_argument("--families", nargs="+", default=list(FAMILIES), choices=FAMILIES)
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(SIZES))
+    parser.add_argument("--algorithms", nargs="+", default=list(ALGORITHMS), choices=list(ALGORITHMS))
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory measurement")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="routing_bench.json", help="JSON file for the results")
+    parser.add_argument("--chart", default="routing_bench.png", help="image file for the scaling chart")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.families, args.sizes, args.algorithms, not args.no_memory, args.seed)
+    print(format_table(results))
+    with open(args.output, "w") as file:
+        json.dump({"timestamp": time.time(), "python": platform.python_version(), "networkx": nx.__version__,
+                   "results": results}, file, indent=4)
+    plot_results(results, args.chart)
+    print(f"Results written to {args.output} and {args.chart}")
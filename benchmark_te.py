@@ -0,0 +1,195 @@
+"""
+API Documentation
+
+This module provides a simulation benchmark of load-aware traffic engineering on NSFNet.
+
+Packets are simulated in discrete ticks of one millisecond on the controller's topology. Every link
+direction is a FIFO queue of at most buffer packets that sends bandwidth / BANDWIDTH_PER_PACKET packets
+per tick, and packets take one tick per hop. Nodes forward every packet to the next hop of the current
+routing tables, as the network nodes do, and packets that find a full queue, no route or have taken too
+many hops are dropped. Traffic follows a skewed matrix: the node pairs are ranked at random and a pair of
+rank r sends in proportion to 1 / r^skew, so a few hot pairs carry most of the packets.
+
+The same traffic is run twice: with the static 1/bandwidth weights, and with the weights of a
+LinkUtilization fed every report interval with the load of every link direction, in the format of
+LinkLoadMeter.report, the routing tables being recomputed whenever it reports a change. The throughput,
+the latency percentiles of delivered packets, the drops and the route changes are reported and written
+as JSON.
+
+Functions:
+    skewed_traffic(nodes: list, skew: float = 1.2, seed: int = 1) -> tuple:
+        Returns the node pairs and their share of the traffic.
+
+    simulate(graph: NetworkX Graph, traffic: tuple, ticks: int, load: float,
+             traffic_engineering: LinkUtilization = None, report_interval: int = 100, buffer: int = 200,
+             warmup: int = 1000, seed: int = 1) -> dict:
+        Simulates the traffic with static or congestion-aware weights and returns the measurements.
+"""
+import argparse
+import collections
+import contextlib
+import io
+import json
+import random
+import numpy as np
+from controllerserver import TCPServer, network
+from loadgen import percentile
+from traffic_engineering import LinkUtilization
+
+PACKET_SIZE = 1500  # Bytes
+TICKS_PER_SECOND = 1000
+BANDWIDTH_PER_PACKET = 300  # Link bandwidth (Gbps) per packet sent each tick
+MAX_HOPS = 32
+
+
+def skewed_traffic(nodes, skew=1.2, seed=1):
+    """
+    Returns a skewed traffic matrix: the ordered node pairs in a random order, with Zipf shares.
+
+    Args:
+        nodes (list): The node names.
+        skew (float, optional): Exponent of the Zipf distribution, 0 for uniform traffic (default is 1.2).
+        seed (int, optional): Seed of the pair order (default is 1).
+
+    Returns:
+        tuple: The list of (origin, destination) pairs and the list of their shares, which sum to 1.
+    """
+    pairs = [(origin, destination) for origin in nodes for destination in nodes if origin != destination]
+    random.Random(seed).shuffle(pairs)
+    weights = [1 / rank ** skew for rank in range(1, len(pairs) + 1)]
+    total = sum(weights)
+    return pairs, [weight / total for weight in weights]
+
+
+def _next_hops(graph):
+    # The controller's routing tables, reduced to the next hop; its progress messages are discarded
+    with contextlib.redirect_stdout(io.StringIO()):
+        routing_tables = TCPServer("localhost", 0, "dijkstra").build_routing_tables(graph)
+    return {node: {destination: path[1] for destination, path in table.items() if len(path) > 1}
+            for node, table in routing_tables.items()}
+
+
+def simulate(graph, traffic, ticks, load, traffic_engineering=None, report_interval=100, buffer=200, warmup=1000,
+             seed=1):
+    """
+    Simulates the traffic on a topology, with static weights or with congestion-aware weights.
+
+    Args:
+        graph (NetworkX Graph): The topology, with the static weights 1/bandwidth.
+        traffic (tuple): The pairs and their shares, as returned by skewed_traffic.
+        ticks (int): Number of ticks simulated.
+        load (float): Mean number of packets sent per tick over the whole network.
+        traffic_engineering (LinkUtilization, optional): Computes the weights from the reported link load
+                                                         (default is the static weights).
+        report_interval (int, optional): Ticks between two load reports (default is 100).
+        buffer (int, optional): Packets a link direction can queue (default is 200).
+        warmup (int, optional): Ticks before the measurements start (default is 1000).
+        seed (int, optional): Seed of the packet arrivals (default is 1).
+
+    Returns:
+        dict: The measurements.
+    """
+    pairs, shares = traffic
+    rng = np.random.default_rng(seed)
+    next_hops = _next_hops(graph)
+    capacity = {}
+    for source, destination, data in graph.edges(data=True):
+        capacity[(source, destination)] = capacity[(destination, source)] = 1 / data["weight"] / BANDWIDTH_PER_PACKET
+    queues = {link: collections.deque() for link in capacity}
+    credit = dict.fromkeys(capacity, 0.0)
+    packets_sent = collections.Counter()
+    peak_queue = collections.Counter()
+    arrivals = []  # (node, [destination, tick sent, hops]) reaching a node this tick
+    latencies = []
+    offered = delivered = dropped = recomputations = route_changes = 0
+    for tick in range(ticks):
+        measured = tick >= warmup
+        for index in rng.choice(len(pairs), size=rng.poisson(load), p=shares):
+            origin, destination = pairs[index]
+            arrivals.append((origin, [destination, tick, 0]))
+            offered += measured
+        for node, packet in arrivals:
+            if node == packet[0]:
+                if packet[1] >= warmup:
+                    delivered += 1
+                    latencies.append(tick - packet[1])
+                continue
+            next_hop = next_hops[node].get(packet[0])
+            queue = queues.get((node, next_hop))
+            if queue is None or len(queue) >= buffer or packet[2] >= MAX_HOPS:
+                dropped += packet[1] >= warmup
+                continue
+            queue.append(packet)
+            peak_queue[(node, next_hop)] = max(peak_queue[(node, next_hop)], len(queue))
+        arrivals = []
+        for link, queue in queues.items():
+            # Capacity left unused by an empty queue is not saved for later ticks
+            available = credit[link] + capacity[link]
+            count = min(int(available), len(queue))
+            credit[link] = min(available - count, capacity[link])
+            packets_sent[link] += count
+            for _ in range(count):
+                packet = queue.popleft()
+                packet[2] += 1
+                arrivals.append((link[1], packet))
+        if traffic_engineering is not None and (tick + 1) % report_interval == 0:
+            seconds = report_interval / TICKS_PER_SECOND
+            changed = False
+            for node in graph:
+                report = {neighbor: [packets_sent[(node, neighbor)] * PACKET_SIZE / seconds,
+                                     peak_queue[(node, neighbor)]] for neighbor in graph[node]}
+                changed |= traffic_engineering.update(node, report, graph)
+            packets_sent.clear()
+            peak_queue = collections.Counter({link: len(queue) for link, queue in queues.items() if queue})
+            if changed:
+                new_next_hops = _next_hops(traffic_engineering.weighted_graph(graph))
+                recomputations += 1
+                route_changes += sum(new_next_hops[node].get(destination) != next_hop
+                                     for node, table in next_hops.items() for destination, next_hop in table.items())
+                next_hops = new_next_hops
+    seconds = (ticks - warmup) / TICKS_PER_SECOND
+    return {"offered_packets": offered, "delivered_packets": delivered, "dropped_packets": dropped,
+            "throughput_gbps": delivered * PACKET_SIZE * 8 / seconds / 1e9,
+            "delivery_ratio": delivered / offered if offered else None,
+            "latency_p50_ms": percentile(latencies, 50), "latency_p99_ms": percentile(latencies, 99),
+            "recomputations": recomputations, "route_changes": route_changes}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate NSFNet under skewed traffic with static and "
+                                                 "congestion-aware link weights.")
+    parser.add_argument("--ticks", type=int, default=20000, help="milliseconds simulated (default 20000)")
+    parser.add_argument("--load", type=float, nargs="+", default=[8.0, 12.0, 16.0],
+                        help="packets sent per millisecond over the network (default 8 12 16)")
+    parser.add_argument("--skew", type=float, default=1.2, help="Zipf exponent of the traffic matrix (default 1.2)")
+    parser.add_argument("--report-interval", type=int, default=100,
+                        help="milliseconds between two load reports (default 100)")
+    parser.add_argument("--hysteresis", type=float, default=0.25,
+                        help="relative change of a congestion factor needed to reroute (default 0.25)")
+    parser.add_argument("--buffer", type=int, default=200, help="packets a link direction can queue (default 200)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="te_bench.json", help="JSON file for the results")
+    args = parser.parse_args()
+
+    graph = network.graph
+    traffic = skewed_traffic(sorted(graph.nodes), args.skew, args.seed)
+    results = []
+    print(f"{'load':>6} {'weights':>10} {'Gbps':>7} {'delivered':>10} {'p50 ms':>7} {'p99 ms':>7} {'drops':>8} "
+          f"{'reroutes':>9}")
+    for load in args.load:
+        for mode in ("static", "congestion"):
+            traffic_engineering = None
+            if mode == "congestion":
+                traffic_engineering = LinkUtilization(
+                    capacity_per_bandwidth=PACKET_SIZE * TICKS_PER_SECOND / BANDWIDTH_PER_PACKET,
+                    hysteresis=args.hysteresis)
+            result = simulate(graph, traffic, args.ticks, load, traffic_engineering, args.report_interval,
+                              args.buffer, seed=args.seed)
+            results.append(dict(result, load=load, weights=mode))
+            print(f"{load:>6.1f} {mode:>10} {result['throughput_gbps']:>7.2f} {result['delivery_ratio']:>10.1%} "
+                  f"{result['latency_p50_ms']:>7.1f} {result['latency_p99_ms']:>7.1f} "
+                  f"{result['dropped_packets']:>8} {result['route_changes']:>9}")
+    with open(args.output, "w") as file:
+        json.dump({"ticks": args.ticks, "skew": args.skew, "report_interval": args.report_interval,
+                   "hysteresis": args.hysteresis, "buffer": args.buffer, "results": results}, file, indent=4)
+    print(f"Results written to {args.output}")
@@ -0,0 +1,496 @@
+"""
+API Documentation
+
+This module provides a capacity planner: it routes a traffic matrix over the network and computes the
+utilization of every link from Link.bandwidth.
+
+A traffic matrix is a list of demands, an origin node, a destination node and a rate in Gbps, read from
+a CSV file with the columns origin, destination and demand. Demands between the same nodes are added up.
+
+With the controller's routing tables, every demand follows its single routed path: the tables are turned
+into a next-hop matrix, and all demands advance one hop at a time together, the load of every link
+direction being summed with NumPy. Without tables, the shortest paths by link weight are used, as the
+controller computes them.
+
+The planner also approximates the routing that minimizes the largest utilization when demands may be
+split over several paths (the min-max multi-commodity flow), with the block-coordinate Frank-Wolfe method
+on a smooth maximum of the utilizations. The destinations are split into blocks of BLOCK_DESTINATIONS;
+every step routes the demands of one block over the shortest paths for link costs that grow steeply with
+utilization, and moves part of that block's flow onto them. The costs are thus updated after every block
+rather than once per routing of the whole matrix, which takes far fewer passes for the same quality, and
+a pass costs about one Dijkstra per destination. It reports a lower bound on the optimum, so the quality
+of the approximation is known, and stops once the flow is within a tolerance of the bound. Every cut of
+the network gives a bound: the demand from one side to the other must cross the links of the cut, so the
+largest utilization is at least that demand divided by their capacity. The cuts tried are every single
+node, and the sweep cuts of the spectral ordering of the nodes, which follow the sparse cuts of the
+network: the nodes are sorted by the eigenvectors of the smallest eigenvalues of the capacity-weighted
+Laplacian, and every prefix of the order is a cut. When all the destinations fit in one block, the dual
+bound of the link costs of every step is also taken into account: for any nonnegative link lengths, every
+flow puts at least the sum of the demands times the length of their shortest paths onto the links.
+
+The gap to expect: on NSFNet with 1000 random demands, the flow is 5.5% above the bound after 5 passes,
+and 5.4% after 20, where the bound is below the optimum. On a 1000-node geometric topology with 100,000
+random demands, 10 passes take about 8 s on one core and end at 1.3 times the bound, where 20 routings
+of the whole matrix took 21 s and ended at 1.9 times. The bound can be below the optimum, so the gap
+overstates the error of the flow, and a tolerance below it only runs all the passes.
+
+Links saturate in the order of their utilization when the whole matrix grows: a link at utilization u
+saturates when the demands are multiplied by 1/u.
+
+Classes:
+    CapacityPlanner:
+        Routes traffic matrices over a network and computes the link utilization.
+
+        Methods:
+            __init__(self, network: Network):
+                Indexes the nodes and link directions of a network.
+
+            next_hop_matrix(self, routing_tables: dict) -> numpy.ndarray:
+                Returns the next-hop matrix of routing tables.
+
+            shortest_next_hops(self, costs: numpy.ndarray, destinations: numpy.ndarray) -> numpy.ndarray:
+                Returns the next-hop matrix of the shortest paths for link costs.
+
+            route(self, next_hops: numpy.ndarray, origins: numpy.ndarray, destinations: numpy.ndarray,
+                  demands: numpy.ndarray) -> tuple:
+                Routes demands over a next-hop matrix and returns the load of every link direction.
+
+            balance(self, origins: numpy.ndarray, destinations: numpy.ndarray, demands: numpy.ndarray,
+                    iterations: int = 10, tolerance: float = 0.05) -> dict:
+                Approximates the min-max utilization multi-commodity flow.
+
+            saturation_report(self, loads: numpy.ndarray, count: int = 10) -> list:
+                Returns the most utilized link directions, in the order they saturate.
+
+Functions:
+    load_demands(file_name: str, planner: CapacityPlanner) -> tuple:
+        Reads a traffic matrix from a CSV file.
+
+    random_demands(planner: CapacityPlanner, count: int, total: float, seed: int = 1) -> tuple:
+        Returns a random traffic matrix.
+"""
+import argparse
+import csv
+import json
+import time
+import warnings
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra, laplacian
+from scipy.sparse.linalg import lobpcg
+import areas
+
+GOLDEN = (5 ** 0.5 - 1) / 2
+SMOOTHING = 0.1  # Relative distance between the maximum and the smooth maximum that is minimized
+LINE_SEARCH_STEPS = 40  # Golden-section steps, which narrow the Frank-Wolfe step down to about 1e-8
+SWEEP_ORDERS = 3  # Spectral orderings of the nodes whose sweep cuts bound the optimum
+DENSE_EIGEN_NODES = 500  # Up to this many nodes, the Laplacian is decomposed densely
+DENSE_ARC_NODES = 2000  # Up to this many nodes, link directions are found in a node x node matrix
+BLOCK_DESTINATIONS = 16  # Destinations routed together by a step of the min-max flow
+
+
+def _smooth_max(loads, capacities, beta):
+    utilization = loads / capacities
+    peak = utilization.max()
+    return peak + np.log(np.exp(beta * (utilization - peak)).sum()) / beta
+
+
+class CapacityPlanner:
+    def __init__(self, network):
+        """
+        Indexes the nodes and the link directions of a network. Every link carries its bandwidth in each
+        direction.
+
+        Args:
+            network (Network or NetworkSnapshot): The network.
+        """
+        self.graph = network.graph
+        self.names = list(self.graph.nodes)
+        self.index = {name: position for position, name in enumerate(self.names)}
+        tails, heads, capacities, weights = [], [], [], []
+        for link in network.links:
+            source, destination = self.index[link.source.name], self.index[link.destination.name]
+            tails += [source, destination]
+            heads += [destination, source]
+            capacities += [link.bandwidth, link.bandwidth]
+            weights += [1 / link.bandwidth, 1 / link.bandwidth]
+        self.tails = np.array(tails, dtype=np.int32)
+        self.heads = np.array(heads, dtype=np.int32)
+        self.capacities = np.array(capacities, dtype=np.float64)
+        self.weights = np.array(weights, dtype=np.float64)
+        # Link directions sorted by tail * node count + head, to find them with a binary search
+        keys = self.tails.astype(np.int64) * len(self.names) + self.heads
+        self._order = np.argsort(keys)
+        self._keys = keys[self._order]
+        self._arc_matrix = None
+        if len(self.names) <= DENSE_ARC_NODES:
+            self._arc_matrix = np.full((len(self.names), len(self.names)), -1, dtype=np.int32)
+            self._arc_matrix[self.tails, self.heads] = np.arange(len(self.tails), dtype=np.int32)
+
+    def _arcs(self, tails, heads):
+        if self._arc_matrix is not None:
+            return self._arc_matrix[tails, heads]
+        return self._order[np.searchsorted(self._keys, tails.astype(np.int64) * len(self.names) + heads)]
+
+    def _aggregate(self, origins, destinations, demands):
+        # One demand per (origin, destination) pair, without the demands of a node to itself
+        keep = origins != destinations
+        keys, inverse = np.unique(origins[keep].astype(np.int64) * len(self.names) + destinations[keep],
+                                  return_inverse=True)
+        totals = np.bincount(inverse, weights=demands[keep], minlength=len(keys))
+        return ((keys // len(self.names)).astype(np.int32), (keys % len(self.names)).astype(np.int32), totals)
+
+    def next_hop_matrix(self, routing_tables):
+        """
+        Returns the next-hop matrix of routing tables as computed by the controller. Area summaries are
+        expanded, and entries that are not nodes of the network are ignored.
+
+        Args:
+            routing_tables (dict): Source name -> {destination name -> path}.
+
+        Returns:
+            numpy.ndarray: next_hops[node, destination], the index of the next hop, -1 if there is no route.
+        """
+        next_hops = np.full((len(self.names), len(self.names)), -1, dtype=np.int32)
+        for source, table in areas.expand_summaries(routing_tables, self.graph).items():
+            if source not in self.index:
+                continue
+            row = next_hops[self.index[source]]
+            for destination, path in table.items():
+                if path and destination in self.index:
+                    hop = path[1] if len(path) > 1 else path[0]
+                    if hop in self.index:
+                        row[self.index[destination]] = self.index[hop]
+        return next_hops
+
+    def shortest_next_hops(self, costs, destinations):
+        """
+        Returns the next-hop matrix of the shortest paths towards some destinations, for costs of the link
+        directions.
+
+        Args:
+            costs (numpy.ndarray): The positive cost of every link direction, in the order of self.tails.
+            destinations (numpy.ndarray): Indexes of the destinations; other columns have no route.
+
+        Returns:
+            numpy.ndarray: next_hops[node, destination], the index of the next hop, -1 if there is no route.
+        """
+        # Trees grown from the destinations over reversed links: the predecessor of a node is its next hop
+        reversed_links = csr_matrix((costs, (self.heads, self.tails)), shape=(len(self.names), len(self.names)))
+        _, predecessors = dijkstra(reversed_links, indices=destinations, return_predecessors=True)
+        next_hops = np.full((len(self.names), len(self.names)), -1, dtype=np.int32)
+        next_hops[:, destinations] = np.where(predecessors < 0, -1, predecessors).T
+        return next_hops
+
+    def route(self, next_hops, origins, destinations, demands):
+        """
+        Routes demands over a next-hop matrix, all demands advancing one hop at a time together.
+
+        Args:
+            next_hops (numpy.ndarray): next_hops[node, destination], as from next_hop_matrix.
+            origins (numpy.ndarray): Origin indexes.
+            destinations (numpy.ndarray): Destination indexes.
+            demands (numpy.ndarray): Rates in Gbps.
+
+        Returns:
+            tuple: The load in Gbps of every link direction, in the order of self.tails, and the total demand
+                   that could not be routed (no route, or a routing loop).
+        """
+        loads = np.zeros(len(self.tails))
+        current = origins.copy()
+        active = np.nonzero(current != destinations)[0]
+        unrouted = 0.0
+        for _ in range(len(self.names)):
+            if not len(active):
+                break
+            hops = next_hops[current[active], destinations[active]]
+            unrouted += demands[active[hops < 0]].sum()
+            active, hops = active[hops >= 0], hops[hops >= 0]
+            loads += np.bincount(self._arcs(current[active], hops), weights=demands[active], minlength=len(loads))
+            current[active] = hops
+            active = active[hops != destinations[active]]
+        # Demands still travelling after as many hops as there are nodes are caught in a loop
+        return loads, unrouted + demands[active].sum()
+
+    def balance(self, origins, destinations, demands, iterations=10, tolerance=0.05):
+        """
+        Approximates the min-max utilization multi-commodity flow, in which demands may be split over
+        several paths, with the block-coordinate Frank-Wolfe method on the smooth maximum of the
+        utilizations max_u + log(sum(exp(beta * (u - max_u)))) / beta.
+
+        Args:
+            origins (numpy.ndarray): Origin indexes.
+            destinations (numpy.ndarray): Destination indexes.
+            demands (numpy.ndarray): Rates in Gbps.
+            iterations (int, optional): Passes over the blocks of destinations (default is 10).
+            tolerance (float, optional): The flow is returned once its largest utilization is at most
+                                         1 + tolerance times the lower bound (default is 0.05).
+
+        Returns:
+            dict: "loads", the load of every link direction, "max_utilization", the largest utilization of
+                  that flow, "lower_bound", a lower bound on the largest utilization of any flow, and
+                  "iterations", the passes made.
+        """
+        origins, destinations, demands = self._aggregate(origins, destinations, demands)
+        targets = np.unique(destinations)
+        # Blocks of destinations chosen at random, so that every block spreads over the network
+        blocks = np.array_split(np.random.default_rng(0).permutation(targets),
+                                max(1, -(-len(targets) // BLOCK_DESTINATIONS)))
+        block_of = np.zeros(len(self.names), dtype=np.int64)
+        for block, block_targets in enumerate(blocks):
+            block_of[block_targets] = block
+        members = [np.nonzero(block_of[destinations] == block)[0] for block in range(len(blocks))]
+        next_hops = self.shortest_next_hops(self.weights, targets)
+        block_loads = np.array([self.route(next_hops, origins[demand_indexes], destinations[demand_indexes],
+                                           demands[demand_indexes])[0]
+                                for demand_indexes in members]).reshape(len(blocks), len(self.tails))
+        loads = block_loads.sum(axis=0)
+        best_loads, best_peak = loads, np.inf
+        lower_bound = self._cut_bound(origins, destinations, demands)
+        passes = 0
+        while passes < iterations and not (loads / self.capacities).max() <= (1 + tolerance) * lower_bound:
+            passes += 1
+            for block, block_targets in enumerate(blocks):
+                utilization = loads / self.capacities
+                peak = utilization.max()
+                if peak == 0:
+                    break
+                if peak < best_peak:
+                    best_loads, best_peak = loads, peak
+                # The smooth maximum is at most SMOOTHING times the current maximum above it
+                beta = np.log(len(utilization)) / (SMOOTHING * peak)
+                softmax = np.exp(beta * (utilization - peak))
+                gradient = softmax / softmax.sum() / self.capacities
+                # Link costs are the gradient, with a small share of the weights to break ties by length
+                costs = gradient + 1e-6 * gradient.max() * self.weights / self.weights.max()
+                demand_indexes = members[block]
+                target_loads, _ = self.route(self.shortest_next_hops(costs, block_targets), origins[demand_indexes],
+                                             destinations[demand_indexes], demands[demand_indexes])
+                if len(blocks) == 1:
+                    # The target flow takes the shortest paths for the costs, so costs @ target_loads is the least
+                    # cost of any flow, which is at most the largest utilization times costs @ capacities
+                    lower_bound = max(lower_bound, costs @ target_loads / (costs @ self.capacities))
+                direction = target_loads - block_loads[block]
+                step = self._line_search(loads, direction, beta)
+                block_loads[block] += step * direction
+                loads = loads + step * direction
+        if (loads / self.capacities).max() < best_peak:
+            best_loads = loads
+        return {"loads": best_loads, "max_utilization": float((best_loads / self.capacities).max()),
+                "lower_bound": float(lower_bound), "iterations": passes}
+
+    def _line_search(self, loads, direction, beta):
+        # Exact line search: the smooth maximum is convex along the direction, so a golden-section search finds
+        # the best step; every step keeps one of the two inner points and evaluates the other
+        def value(step):
+            return _smooth_max(loads + step * direction, self.capacities, beta)
+
+        low, high = 0.0, 1.0
+        first, second = high - GOLDEN * (high - low), low + GOLDEN * (high - low)
+        first_value, second_value = value(first), value(second)
+        for _ in range(LINE_SEARCH_STEPS):
+            if first_value <= second_value:
+                high, second, second_value = second, first, first_value
+                first = high - GOLDEN * (high - low)
+                first_value = value(first)
+            else:
+                low, first, first_value = first, second, second_value
+                second = low + GOLDEN * (high - low)
+                second_value = value(second)
+        return (low + high) / 2
+
+    def _cut_bound(self, origins, destinations, demands):
+        # The demand of a node leaves, or reaches, it over its own links, whatever the routing
+        outgoing = np.bincount(origins, weights=demands, minlength=len(self.names))
+        incoming = np.bincount(destinations, weights=demands, minlength=len(self.names))
+        capacity = np.bincount(self.tails, weights=self.capacities, minlength=len(self.names))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bounds = np.maximum(outgoing, incoming) / capacity
+        bounds = bounds[capacity > 0]
+        bound = float(bounds.max()) if len(bounds) else 0.0
+        for order in self._spectral_orders():
+            bound = max(bound, self._sweep_bound(order, origins, destinations, demands))
+        return bound
+
+    def _spectral_orders(self):
+        # Orders of the nodes along the eigenvectors of the smallest nonzero eigenvalues of the Laplacian
+        count = len(self.names)
+        if count < 3 or not len(self.tails):
+            return []
+        matrix = laplacian(csr_matrix((self.capacities, (self.tails, self.heads)), shape=(count, count)))
+        vectors = min(SWEEP_ORDERS + 1, count - 1)
+        if count <= DENSE_EIGEN_NODES:
+            _, eigenvectors = np.linalg.eigh(matrix.toarray())
+        else:
+            start = np.random.default_rng(0).standard_normal((count, vectors))
+            # Any order gives valid cuts, so the eigenvectors need not be accurate
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                _, eigenvectors = lobpcg(matrix.astype(np.float64), start, largest=False, tol=1e-3, maxiter=200)
+        return [np.argsort(eigenvectors[:, column]) for column in range(1, vectors)]
+
+    def _sweep_bound(self, order, origins, destinations, demands):
+        # Cut k separates the first k nodes of the order from the others; an arc or a demand from position a to
+        # position b crosses the cuts a + 1 to b, which cumulative sums count for all the cuts at once
+        count = len(self.names)
+        position = np.empty(count, dtype=np.int64)
+        position[order] = np.arange(count)
+
+        def crossing(tails, heads, weights):
+            forward = tails < heads
+            starts = np.bincount(tails[forward] + 1, weights=weights[forward], minlength=count + 1)
+            ends = np.bincount(heads[forward] + 1, weights=weights[forward], minlength=count + 1)
+            return np.cumsum(starts - ends)[1:count]
+
+        tails, heads = position[self.tails], position[self.heads]
+        # Links carry their bandwidth in both directions, so a cut has the same capacity both ways
+        capacity = crossing(tails, heads, self.capacities)
+        origin_positions, destination_positions = position[origins], position[destinations]
+        bound = 0.0
+        for demand in (crossing(origin_positions, destination_positions, demands),
+                       crossing(destination_positions, origin_positions, demands)):
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ratios = demand / capacity
+            # A cut without capacity between nodes with demands means no route, not an infinite utilization
+            ratios = ratios[capacity > 0]
+            if len(ratios):
+                bound = max(bound, float(ratios.max()))
+        return bound
+
+    def saturation_report(self, loads, count=10):
+        """
+        Returns the most utilized link directions, which are the first to saturate when the traffic grows.
+
+        Args:
+            loads (numpy.ndarray): The load of every link direction, as from route or balance.
+            count (int, optional): Number of link directions returned (default is 10).
+
+        Returns:
+            list: Dicts with the source, destination, bandwidth, load, utilization and the factor by which
+                  the traffic must grow to saturate the link, most utilized first.
+        """
+        utilization = loads / self.capacities
+        report = []
+        for arc in np.argsort(-utilization)[:count]:
+            report.append({"source": self.names[self.tails[arc]], "destination": self.names[self.heads[arc]],
+                           "bandwidth": float(self.capacities[arc]), "load": float(loads[arc]),
+                           "utilization": float(utilization[arc]),
+                           "saturation_factor": float(1 / utilization[arc]) if utilization[arc] else None})
+        return report
+
+
+def load_demands(file_name, planner):
+    """
+    Reads a traffic matrix from a CSV file with the columns origin, destination and demand (Gbps). Demands
+    of unknown nodes are skipped.
+
+    Args:
+        file_name (str): The CSV file.
+        planner (CapacityPlanner): The planner of the network, for the node indexes.
+
+    Returns:
+        tuple: The origin indexes, destination indexes and demands, as NumPy arrays.
+    """
+    origins, destinations, demands = [], [], []
+    with open(file_name, newline="") as file:
+        for row in csv.DictReader(file):
+            origin, destination = planner.index.get(row["origin"]), planner.index.get(row["destination"])
+            if origin is None or destination is None:
+                print(f"Skipping demand between unknown nodes {row['origin']} and {row['destination']}.")
+                continue
+            origins.append(origin)
+            destinations.append(destination)
+            demands.append(float(row["demand"]))
+    return (np.array(origins, dtype=np.int32), np.array(destinations, dtype=np.int32),
+            np.array(demands, dtype=np.float64))
+
+
+def random_demands(planner, count, total, seed=1):
+    """
+    Returns a random traffic matrix: uniformly chosen node pairs with log-normal demands.
+
+    Args:
+        planner (CapacityPlanner): The planner of the network.
+        count (int): Number of demands.
+        total (float): Sum of the demands in Gbps.
+        seed (int, optional): Seed of the random generator (default is 1).
+
+    Returns:
+        tuple: The origin indexes, destination indexes and demands, as NumPy arrays.
+    """
+    rng = np.random.default_rng(seed)
+    origins = rng.integers(len(planner.names), size=count, dtype=np.int32)
+    # An offset of 1 to n - 1 never picks the origin itself
+    destinations = ((origins + rng.integers(1, len(planner.names), size=count)) % len(planner.names)).astype(np.int32)
+    demands = rng.lognormal(size=count)
+    return origins, destinations, demands * total / demands.sum()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Route a traffic matrix over the network and report the link "
+                                                 "utilization.")
+    parser.add_argument("--topology", help="a topology file written by topology.py (default is the embedded NSFNet)")
+    parser.add_argument("--tables", help="the controller's routing tables, e.g. routing_tables.json (default is the "
+                                         "shortest paths by link weight)")
+    demands_group = parser.add_mutually_exclusive_group(required=True)
+    demands_group.add_argument("--demands", help="CSV file with the columns origin, destination and demand (Gbps)")
+    demands_group.add_argument("--random", type=int, metavar="COUNT", help="generate COUNT random demands")
+    parser.add_argument("--total", type=float, default=10000.0,
+                        help="sum of the random demands in Gbps (default 10000)")
+    parser.add_argument("--iterations", type=int, default=10,
+                        help="passes of the min-max utilization flow over the destinations, 0 to skip it (default 10)")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="stop the min-max utilization flow once it is within this share of its lower bound "
+                             "(default 0.05)")
+    parser.add_argument("--top", type=int, default=10, help="number of link directions reported (default 10)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="JSON file for the results")
+    args = parser.parse_args()
+
+    if args.topology:
+        import topology
+        network = topology.load_topology(args.topology)
+    else:
+        from controllerserver import network
+    planner = CapacityPlanner(network)
+    if args.demands:
+        origins, destinations, demands = load_demands(args.demands, planner)
+    else:
+        origins, destinations, demands = random_demands(planner, args.random, args.total, args.seed)
+    print(f"{len(planner.names)} nodes, {len(planner.tails) // 2} links, {len(demands)} demands, "
+          f"{demands.sum():.1f} Gbps in total.")
+
+    started = time.perf_counter()
+    if args.tables:
+        with open(args.tables) as file:
+            next_hops = planner.next_hop_matrix(json.load(file))
+    else:
+        next_hops = planner.shortest_next_hops(planner.weights, np.unique(destinations))
+    loads, unrouted = planner.route(next_hops, origins, destinations, demands)
+    routed = time.perf_counter()
+    results = {"nodes": len(planner.names), "links": len(planner.tails) // 2, "demands": len(demands),
+               "routed": {"seconds": routed - started, "unrouted_gbps": float(unrouted),
+                          "max_utilization": float((loads / planner.capacities).max()),
+                          "links": planner.saturation_report(loads, args.top)}}
+    print(f"Routed with the {'routing tables' if args.tables else 'shortest paths'} in {routed - started:.2f} s, "
+          f"{unrouted:.1f} Gbps without a route. Links that saturate first:")
+    for link in results["routed"]["links"]:
+        factor = link["saturation_factor"]
+        print(f"    {link['source']} -> {link['destination']}: {link['load']:.1f} / {link['bandwidth']:g} Gbps, "
+              f"utilization {link['utilization']:.1%}, "
+              + ("idle" if factor is None else "overloaded" if factor < 1 else f"saturates at x{factor:.2f}"))
+    if args.iterations:
+        balanced = planner.balance(origins, destinations, demands, args.iterations, args.tolerance)
+        finished = time.perf_counter()
+        results["balanced"] = {"seconds": finished - routed, "iterations": balanced["iterations"],
+                               "max_utilization": balanced["max_utilization"],
+                               "lower_bound": balanced["lower_bound"],
+                               "links": planner.saturation_report(balanced["loads"], args.top)}
+        bound = f" (optimum at least {balanced['lower_bound']:.1%})" if balanced["lower_bound"] > 0 else ""
+        print(f"Min-max utilization flow in {finished - routed:.2f} s, {balanced['iterations']} passes: largest "
+              f"utilization {balanced['max_utilization']:.1%}{bound}, against "
+              f"{results['routed']['max_utilization']:.1%} on single paths.")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+        print(f"Results written to {args.output}")
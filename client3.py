@@ -10,8 +10,8 @@ Functions:
     decrypt_message(encrypted_message: bytes, private_key: rsa.PrivateKey) -> bytes:
         Decrypts the given encrypted message using the provided private key.
 
-    send_message(origin_node: str, destination_node: str, message: str, public_key: rsa.PublicKey, message_type: str = "user_message") -> None:
-        Sends a message from the origin node to the destination node.
+    send_message(origin_node: str, destination_node: str, message: str, public_key: rsa.PublicKey, message_type: str = "user_message", renderer: PathRenderer = None) -> None:
+        Sends a message from the origin node to the destination node, optionally queueing its path for rendering.
 
     handle_client(client_socket: socket.socket, private_key: rsa.PrivateKey) -> None:
         Handles incoming messages from other nodes.
@@ -19,6 +19,7 @@ Functions:
     listen_for_messages(private_key: rsa.PrivateKey) -> None:
         Listens for incoming messages from other nodes.
 """
+import argparse
 import socket
 import json
 import threading
@@ -26,8 +27,8 @@ import base64
 import time
 import pickle
 import rsa
-import dijkstra_paths
 from controllerserver import network
+from visualization import PathRenderer
 
 CHUNK = 1024
 
@@ -68,7 +69,7 @@ def decrypt_message(encrypted_message, private_key):
 
     return rsa.decrypt(encrypted_message, private_key)
 
-def send_message(origin_node, destination_node, message, public_key, message_type="user_message"):
+def send_message(origin_node, destination_node, message, public_key, message_type="user_message", renderer=None):
     """
     Sends a message from the origin node to the destination node.
 
@@ -78,6 +79,7 @@ def send_message(origin_node, destination_node, message, public_key, message_typ
         message (str): The message to be sent.
         public_key (rsa.PublicKey): The public key used for encryption.
         message_type (str, optional): The type of message ('user_message' or 'audio_message'). Defaults to "user_message".
+        renderer (PathRenderer, optional): If given, the path is queued for background rendering. Defaults to None.
     """
     try:
         # Establish connection with the destination node
@@ -131,8 +133,10 @@ def send_message(origin_node, destination_node, message, public_key, message_typ
             # Send the complete message to the node
             client_socket.sendall(pickle.dumps(data))
 
+        # Queue the path for rendering without waiting for it
+        if renderer is not None:
+            renderer.submit(path, network)
         # Close the connection
-        dijkstra_paths.visualize_path(path, network)
         client_socket.close()
     except Exception as e:
         print(f"Error sending message: {e}")
@@ -191,6 +195,12 @@ def listen_for_messages(private_key):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send an encrypted message through the network.")
+    parser.add_argument("--visualize", action="store_true", help="render the message path to an image file")
+    parser.add_argument("--visualize-dir", default="path_renders", help="directory for rendered paths")
+    parser.add_argument("--visualize-format", default="png", choices=["png", "svg"], help="image format")
+    args = parser.parse_args()
+    renderer = PathRenderer(args.visualize_dir, args.visualize_format) if args.visualize else None
     # Start a thread to listen for incoming messages
     threading.Thread(target=listen_for_messages, args=(private_key,)).start()
     # Get information of the message to send
@@ -200,12 +210,16 @@ if __name__ == "__main__":
 
     if message_type == "user_message":
         message = input("Enter message: ")
-        send_message(origin_node, destination_node, message, public_key)
+        send_message(origin_node, destination_node, message, public_key, renderer=renderer)
     elif message_type == "audio_message":
         audio_file = "Bye_Bye.wav"  # Cambiar al nombre de tu archivo de audio
-        send_message(origin_node, destination_node, audio_file, public_key, message_type="audio_message")
+        send_message(origin_node, destination_node, audio_file, public_key, message_type="audio_message",
+                     renderer=renderer)
     else:
         print("Invalid message type. Please enter 'user_message' or 'audio_message'.")
 
+    if renderer is not None:
+        renderer.close()
+
     while True:
         time.sleep(1)
@@ -3,6 +3,23 @@ API Documentation
 
 This module provides functionalities to manage a TCP server for routing tables updates.
 
+With --shards N, the controller runs as N processes, each owning the nodes that sharding.HashRing assigns
+to it: a shard tracks the liveness of its nodes, computes their routing tables and shares the topology
+changes it makes with the other shards over a sharding.ShardBus.
+
+With --replicate, the controller streams its state to hot-standby controllers started with --standby (see
+replication.py); a standby takes over the ports with that state as soon as the primary fails.
+
+The 'widest' algorithm routes over the paths with the greatest bottleneck bandwidth instead of the
+shortest ones. With --media-routing, widest-path entries for audio and video messages are added to the
+tables of the other algorithms (see media_routes.py).
+
+With --protection-paths, the controller precomputes the k shortest and the node-disjoint paths of every
+pair of nodes once per topology version (see path_protection.py), adds to every table a protection path
+per destination that nodes switch to when their next hop does not answer, and writes the paths to a file
+for clients that stripe their traffic. The paths are computed in the background: the tables of a new
+topology version keep the paths of the previous one until the next version of the tables.
+
 Classes:
     TCPServer:
         A class to handle TCP server operations.
@@ -17,17 +34,84 @@ Classes:
             handle_client(self, client_socket: socket.socket):
                 Handles the incoming client requests.
 
-            compute_routing_tables(self):
-                Computes the routing tables using the specified algorithm.
+            process_request(self, request: bytes) -> bytes:
+                Authenticates a handshake, heartbeat or legacy request and returns the reply.
+
+            decrypt(self, ciphertext: bytes) -> bytes:
+                Decrypts with the private key, in the decryption pool if there is one.
+
+            heartbeat(self, node_name: str):
+                Records that a node is alive in the failure detector.
+
+            record_load(self, node_name: str, report: dict):
+                Records the link load a node reported, and schedules a recomputation when it changes the
+                congestion-aware weights.
+
+            replicate(self, message: dict):
+                Sends a change of the controller's state to the standby controllers, if replicating.
+
+            replication_state(self) -> dict:
+                Returns the full state that a standby controller starts from.
+
+            apply_replication(self, message: dict):
+                Applies the full state or a change received from the primary controller.
+
+            run_standby(self, path: str):
+                Follows the primary controller until it fails, then takes over.
+
+            owns(self, node_name: str) -> bool:
+                Returns whether this controller, or this shard of it, is in charge of a node.
+
+            apply_topology_event(self, event: dict):
+                Applies a topology change received from another shard.
+
+            watch_failures(self):
+                Removes the nodes that the failure detector suspects.
+
+            watch_shared_heartbeats(self):
+                Turns the heartbeats that nodes write to shared memory into heartbeat calls.
+
+            serve_sessions(self):
+                Accepts persistent node sessions on session_port.
+
+            handle_session(self, client_socket: socket.socket):
+                Authenticates a node once, then receives its heartbeats and pushes its table updates.
+
+            push_routing_tables(self, version: int, changes: dict, routing_tables: dict):
+                Sends every open session the changes of its node's routing table in a given version, and
+                closes the sessions that cannot take them within PUSH_TIMEOUT seconds.
+
+            routing_table_update(self, node_name: str, version: int) -> dict:
+                Returns what a node holding a given table version needs: nothing, a diff or its full table.
+
+            compute_routing_tables(self, cancelled: callable = None) -> bool:
+                Computes the routing tables using the specified algorithm, unless superseded, with
+                congestion-aware weights if traffic engineering is enabled, and adds the protection
+                paths if they are enabled.
+
+            build_routing_tables(self, graph: NetworkX Graph, cancelled: callable = None) -> dict:
+                Returns the routing tables of the nodes this controller owns, without writing or
+                scheduling anything. When the nodes are in several areas, the tables are computed per
+                area, with one summary entry per other area (see areas.py). Otherwise, media entries are
+                added if media routing is enabled.
 
             update_routing_tables(self):
-                Updates the routing tables periodically.
+                Reports a topology change to the recomputation scheduler.
+
+            persist_routing_tables(self, routing_tables: dict, topology_snapshot: NetworkSnapshot):
+                Writes the tables file, and the binary snapshot if configured, atomically.
 
             remove_node(self, node_name: str):
-                Removes a node from the network.
+                Removes a node from the network, and from the other shards' copies.
 
             add_node_to_network(self, node_name: str, node_id: int):
-                Adds a node back to the network.
+                Adds a node back to the network, and to the other shards' copies, in one topology version
+                with the other nodes reconnecting at the same time.
+
+Functions:
+    routing_table_delta(old_table: dict, new_table: dict) -> dict:
+        Returns the destinations whose next hop changed, with the new [source, next hop] path (None for
+        removed destinations).
 
 Variables:
     private_key: rsa.PrivateKey
@@ -37,16 +121,43 @@ Variables:
         The public key used for encrypting messages.
 
     network: Network
-        An instance of the Network class representing the network topology.
+        An instance of the Network class representing the network topology. It is the embedded NSFNet
+        unless the controller is started with --topology FILE, a file written by topology.py, or with
+        --snapshot FILE, a binary snapshot (see snapshot.py). With --event-log DIRECTORY, every change
+        is logged there, and the controller restarts from the logged topology (see event_log.py).
 """
+import argparse
+import areas
+import collections
+import os
+import signal
 import socket
+import struct
+import subprocess
+import sys
 import threading
+import time
 import json
 import networkx as nx
 import dijkstra_paths
 import rsa
 import pickle
+import framing
+import media_routes
+import path_protection
+from event_log import EventLog
+from failure_detector import PhiAccrualDetector
+from persistence import WriteBehind, write_json_atomic
+from recompute_scheduler import RecomputeScheduler
+import session_auth
+import topology
 from network import Network
+from replication import DEFAULT_PATH, ReplicationServer, StandbyClient
+from rsa_pool import DecryptionPool
+from shared_routes import SharedRoutingTables
+from traffic_engineering import LinkUtilization
+from sharding import HashRing, ShardBus, controller_port
+from snapshot import TopologySnapshot, write_snapshot
 
 file_pri = open('pri_key.txt', 'rb')
 private_key = pickle.load(file_pri)
@@ -94,24 +205,93 @@ network.add_link(11, 12, 1200)
 network.add_link(11, 13, 1500)
 network.add_link(12, 14, 600)
 network.add_link(13, 14, 300)
+
+
+TABLE_HISTORY = 16  # Number of recent table versions that nodes can get a diff against
+PUSH_TIMEOUT = 5  # Seconds a node session may block a table push before it is closed
+
+
+def routing_table_delta(old_table, new_table):
+    # Nodes only use the next hop of a path, so changes further along the path are not sent
+    delta = {}
+    for destination, path in new_table.items():
+        old_path = old_table.get(destination)
+        if old_path is None or old_path[1:2] != path[1:2]:
+            delta[destination] = path[:2]
+    delta.update({destination: None for destination in old_table if destination not in new_table})
+    return delta
+
+
 class TCPServer:
     def __init__(self, host, port, algorithm):
         self.host = host
         self.port = port
         self.server_socket = None
-        self.node_timers = {}  # Diccionario para almacenar temporizadores de nodos
-        self.algorithm = None
+        self.failure_detector = PhiAccrualDetector()  # Heartbeat history and suspicion level of every node
+        self.scheduler = RecomputeScheduler(self.compute_routing_tables)  # Runs every routing computation
+        self.writer = WriteBehind(self.persist_routing_tables)  # Writes the latest tables in the background
+        self.algorithm = algorithm
+        self.snapshot_file = None  # Binary snapshot also written after each computation, if set
+        self.shared_routes = None  # SharedRoutingTables published after each computation, if set
+        self.session_port = port + 1 if port else None  # Port for persistent node sessions, None to disable
+        self.routing_tables = {}
+        self.table_version = 0
+        self.table_history = collections.deque(maxlen=TABLE_HISTORY)  # (version, changes by node) tuples
+        self.tables_lock = threading.Lock()
+        self.sessions = {}  # Node name -> [socket, send lock, table version the node has]
+        self.sessions_lock = threading.Lock()
+        self.node_keys = {}  # Node name -> [heartbeat key, last heartbeat counter]
+        self.node_keys_lock = threading.Lock()
+        self.decryption_pool = None  # DecryptionPool for private key operations, None to decrypt on request threads
+        self.tables_file = "routing_tables.json"  # Where the routing tables are persisted
+        self.ring = None  # HashRing assigning nodes to shards, None when the controller is not sharded
+        self.shard = 0  # Index of this shard on the ring
+        self.bus = None  # ShardBus to the other shards, None when the controller is not sharded
+        self.removed_nodes = set()  # Nodes of this shard currently removed, for shards that (re)start
+        self.pending_additions = {}  # Reconnected node name -> node ID, waiting to be added to the network
+        self.pending_additions_lock = threading.Lock()
+        self.replication = None  # ReplicationServer streaming the state to standby controllers, if set
+        self.event_log = None  # EventLog recording every topology change, if set
+        self.traffic = None  # LinkUtilization giving congestion-aware weights, None for the static weights
+        self.media_routing = False  # Whether the tables also hold widest-path entries for media messages
+        self.paths = None  # PathCache of the protection paths, None when the tables have none
 
     def start(self):
         # Create a TCP server socket
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # A standby taking over must not wait for the connections of the failed controller to time out
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         # Bind the socket to the address and port
         self.server_socket.bind((self.host, self.port))
         # Listen for incoming connections
-        self.server_socket.listen(5)
+        # A burst of message chunks must not overflow the accept queue, whose dropped connections wait 1 s
+        self.server_socket.listen(128)
         print(f"Server listening on {self.host}:{self.port}...")
-        # Start a timer to update routing tables periodically
-        threading.Timer(30, self.update_routing_tables).start()
+        if self.event_log is not None:
+            # Log from the topology this controller serves, which may be a standby's replicated one
+            self.event_log.open(network.snapshot())
+            network.journal = self.event_log.append
+        if not self.routing_tables:
+            # A shard that never persisted its own tables starts from the full ones
+            tables_file = self.tables_file if os.path.exists(self.tables_file) else "routing_tables.json"
+            with open(tables_file, "r") as file:
+                self.routing_tables = {node_name: table for node_name, table in json.load(file).items()
+                                       if self.owns(node_name)}
+        if self.replication is not None:
+            self.replication.start()
+        if self.bus is not None:
+            self.bus.start()
+            self.bus.publish({"event": "hello"})
+        if self.shared_routes is not None:
+            # Publish the persisted tables right away so co-located nodes need not wait for a computation
+            self.shared_routes.publish(areas.expand_summaries(self.routing_tables, network.graph))
+            threading.Thread(target=self.watch_shared_heartbeats, daemon=True).start()
+        # Start the scheduler that recomputes the routing tables at once, then on topology changes and
+        # periodically; it starts after the bootstrap tables are loaded, so that they cannot replace its result
+        self.scheduler.start()
+        if self.session_port:
+            threading.Thread(target=self.serve_sessions, daemon=True).start()
+        threading.Thread(target=self.watch_failures, daemon=True).start()
         while True:
             try:
                 # Accept a new connection
@@ -125,75 +305,588 @@ class TCPServer:
 
     def handle_client(self, client_socket):
         try:
-            # Receive the encrypted node name from the client
-            encrypted_node_name = client_socket.recv(1024)
-
-            # Decrypt the node name
-            node_name_bytes = rsa.decrypt(encrypted_node_name, private_key)
-            node_name = node_name_bytes.decode()  # Convertir bytes a cadena
-
-            print(f"Received request from node: {node_name}")
-            # If there is an existing timer for the node, cancel it
-            if node_name in self.node_timers:
-                self.node_timers[node_name].cancel()
-            # Start a new timer for the node
-            self.node_timers[node_name] = threading.Timer(30, self.remove_node, args=(node_name,))
-            self.node_timers[node_name].start()
-            # Send routing table for the corresponding node
-            with open("routing_tables.json", "r") as file:
-                routing_tables = json.load(file)
-                if node_name in routing_tables:
-                    routing_table_json = json.dumps(routing_tables[node_name], indent=4)
-                    client_socket.sendall(routing_table_json.encode())
-                    print(f"Routing table sent to {node_name}.")
-                else:
-                    print(f"No routing table found for node {node_name}.")
-                    node_id = node_name[-1]
-                    self.add_node_to_network(node_name, node_id)
+            request = client_socket.recv(1024)
+            reply = self.process_request(request)
+            if reply is not None:
+                client_socket.sendall(reply)
         except Exception as e:
             print(f"Error handling client: {e}")
         finally:
             # Close the client socket
             client_socket.close()
 
-    def compute_routing_tables(self):
-        if algorithm == 'dijkstra':
-            all_paths = dict(nx.all_pairs_dijkstra_path(network.graph))
-        elif algorithm == 'bellman':
-            all_paths = dict(nx.all_pairs_bellman_ford_path(network.graph))
+    def process_request(self, request):
+        nonce = None
+        if request.startswith(session_auth.HELLO):
+            # Handshake: the only request that needs an RSA decryption
+            node_name, session_key, version = session_auth.read_handshake(request[len(session_auth.HELLO):],
+                                                                          private_key, self.decrypt)
+            # The counter restarts, so the heartbeats are signed with a key that no earlier session used, even
+            # if the handshake itself is a replay
+            nonce = session_auth.new_nonce()
+            mac_key = session_auth.session_mac_key(session_key, nonce)
+            with self.node_keys_lock:
+                self.node_keys[node_name] = [mac_key, 0]
+            print(f"Session key registered for node: {node_name}")
+            self.replicate({"type": "key", "node": node_name, "key": mac_key.hex()})
+        elif request.startswith(session_auth.BEAT):
+            node_name, counter, version, mac, report = session_auth.read_heartbeat(request[len(session_auth.BEAT):])
+            with self.node_keys_lock:
+                keys = self.node_keys.get(node_name)
+                valid = (keys is not None and counter > keys[1]
+                         and session_auth.verify_heartbeat(keys[0], node_name, counter, version, mac, report))
+                if valid:
+                    keys[1] = counter
+            if not valid:
+                print(f"Rejected heartbeat from {node_name}, a new handshake is required.")
+                return json.dumps({"error": "handshake required"}).encode()
+            if report:
+                self.record_load(node_name, json.loads(report))
+        else:
+            # Receive the encrypted node name, optionally followed by the table version the node has
+            node_name_bytes = self.decrypt(request)
+            node_name, _, version = node_name_bytes.decode().partition(" ")  # Convertir bytes a cadena
+            version = int(version) if version else None
+
+        if not self.owns(node_name):
+            shard = self.ring.shard_of(node_name)
+            print(f"Node {node_name} belongs to shard {shard}.")
+            # Shards listen two ports apart, see sharding.controller_port
+            return json.dumps({"error": "wrong shard", "port": self.port + 2 * (shard - self.shard)}).encode()
+        print(f"Received request from node: {node_name}")
+        self.heartbeat(node_name)
+        # Send routing table for the corresponding node
+        if node_name not in self.routing_tables:
+            print(f"No routing table found for node {node_name}.")
+            node_id = node_name[-1]
+            self.add_node_to_network(node_name, node_id)
+            return None
+        if version is None:
+            # Nodes that do not report a version get their bare table
+            reply = json.dumps(self.routing_tables[node_name], indent=4)
+        else:
+            update = self.routing_table_update(node_name, version)
+            if nonce is not None:
+                update = {**update, "nonce": nonce.hex()}
+            reply = json.dumps(update, separators=(",", ":"))
+        print(f"Routing table sent to {node_name}.")
+        return reply.encode()
+
+    def decrypt(self, ciphertext):
+        if self.decryption_pool is not None:
+            return self.decryption_pool.decrypt(ciphertext)
+        return rsa.decrypt(ciphertext, private_key)
+
+    def heartbeat(self, node_name):
+        arrival = time.monotonic()
+        self.failure_detector.heartbeat(node_name, arrival)
+        if self.replication is not None:
+            self.replication.record_heartbeat(node_name, arrival)
+
+    def record_load(self, node_name, report):
+        if self.traffic is not None and self.traffic.update(node_name, report, network.graph):
+            print(f"Link utilization reported by {node_name} changed the link weights.")
+            self.update_routing_tables()
+
+    def replicate(self, message):
+        if self.replication is not None:
+            self.replication.send(message)
+
+    def replication_state(self):
+        with self.tables_lock:
+            routing_tables, version, history = self.routing_tables, self.table_version, list(self.table_history)
+        with self.node_keys_lock:
+            node_keys = {node_name: [key.hex(), counter] for node_name, (key, counter) in self.node_keys.items()}
+        topology_snapshot = network.snapshot()
+        return {"type": "state", "version": version, "tables": routing_tables, "history": history,
+                "node_keys": node_keys, "liveness": self.failure_detector.export_state(),
+                "nodes": [[node.node_id, node.name, node.node_type, node.area]
+                          for node in topology_snapshot.nodes.values()],
+                "links": [[link.source.node_id, link.destination.node_id, link.bandwidth]
+                          for link in topology_snapshot.links]}
+
+    def apply_replication(self, message):
+        global network
+        # Every change is applied idempotently, see replication.py
+        if message["type"] == "ping":
+            for node_name, arrival in message["heartbeats"]:
+                self.failure_detector.heartbeat(node_name, arrival)
+        elif message["type"] == "state":
+            replicated_network = Network()
+            replicated_network.bulk_load(map(tuple, message["nodes"]), map(tuple, message["links"]))
+            network = replicated_network
+            self.failure_detector.import_state(message["liveness"])
+            with self.node_keys_lock:
+                self.node_keys = {node_name: [bytes.fromhex(key), counter]
+                                  for node_name, (key, counter) in message["node_keys"].items()}
+            with self.tables_lock:
+                self.routing_tables = message["tables"]
+                self.table_version = message["version"]
+                self.table_history = collections.deque(map(tuple, message["history"]), maxlen=TABLE_HISTORY)
+            print(f"Replicated {len(network.nodes)} nodes and routing tables version {self.table_version}.")
+        elif message["type"] == "tables":
+            with self.tables_lock:
+                if message["version"] <= self.table_version:
+                    return
+                routing_tables = dict(self.routing_tables)
+                routing_tables.update(message["tables"])
+                for node_name in message["removed"]:
+                    routing_tables.pop(node_name, None)
+                self.routing_tables = routing_tables
+                self.table_version = message["version"]
+                self.table_history.append((self.table_version, message["changes"]))
+        elif message["type"] == "removed":
+            with network.batch():
+                for node_name in message["nodes"]:
+                    self.failure_detector.remove(node_name)
+                    if node_name in network.graph:
+                        network.remove_node(node_name)
+        elif message["type"] == "added":
+            if message["node"] not in network.graph:
+                network.add_node(message["node_id"], message["node"])
+        elif message["type"] == "key":
+            with self.node_keys_lock:
+                self.node_keys[message["node"]] = [bytes.fromhex(message["key"]), 0]
+
+    def run_standby(self, path):
+        print(f"Standing by for the primary controller on {path}...")
+        StandbyClient(path, self.apply_replication).run()
+        print(f"Taking over as the primary controller on {self.host}:{self.port}.")
+        # The failed primary may still hold the port for a moment if it hung instead of exiting
+        while True:
+            probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            probe.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                probe.bind((self.host, self.port))
+                break
+            except OSError:
+                time.sleep(0.05)
+            finally:
+                probe.close()
+        # Further standbys can follow this controller on the same path
+        self.replication = ReplicationServer(path, self.replication_state)
+        self.start()
+
+    def owns(self, node_name):
+        return self.ring is None or self.ring.shard_of(node_name) == self.shard
+
+    def apply_topology_event(self, event):
+        if event["event"] == "hello":
+            # A shard (re)started: tell it which of our nodes are currently removed
+            if self.removed_nodes:
+                self.bus.publish({"event": "removed", "nodes": sorted(self.removed_nodes)}, event["shard"])
+        elif event["event"] == "removed":
+            removed = [node_name for node_name in event["nodes"] if node_name in network.graph]
+            if removed:
+                with network.batch():
+                    for node_name in removed:
+                        print(f"Shard {event['shard']} removed node {node_name}.")
+                        network.remove_node(node_name)
+                self.update_routing_tables()
+        elif event["event"] == "added":
+            print(f"Shard {event['shard']} added node {event['node']}.")
+            network.add_node(event["node_id"], event["node"])
+            self.update_routing_tables()
+
+    def watch_failures(self):
+        while True:
+            time.sleep(1)
+            suspects = self.failure_detector.suspects()
+            if not suspects:
+                continue
+            # Nodes that failed together are removed in one topology version
+            with network.batch():
+                for node_name in suspects:
+                    # Forget the node first, so that it is removed once; its next heartbeat starts a new history
+                    self.failure_detector.remove(node_name)
+                    self.remove_node(node_name)
+
+    def watch_shared_heartbeats(self):
+        node_ids = {node.name: node.node_id for node in network.nodes.values()}
+        last_seen = {}
+        while True:
+            time.sleep(1)
+            # Nodes that reappear in the same scan are added back in one topology version
+            with network.batch():
+                for node_name, timestamp in self.shared_routes.heartbeats().items():
+                    if timestamp == last_seen.get(node_name):
+                        continue
+                    last_seen[node_name] = timestamp
+                    self.heartbeat(node_name)
+                    if node_name not in network.graph and node_name in node_ids:
+                        self.add_node_to_network(node_name, node_ids[node_name])
+
+    def serve_sessions(self):
+        session_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        session_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        session_socket.bind((self.host, self.session_port))
+        session_socket.listen(128)
+        print(f"Session server listening on {self.host}:{self.session_port}...")
+        while True:
+            try:
+                client_socket, client_address = session_socket.accept()
+                threading.Thread(target=self.handle_session, args=(client_socket,), daemon=True).start()
+            except Exception as e:
+                print(f"Error accepting session: {e}")
+
+    def handle_session(self, client_socket):
+        node_name = None
+        session = [client_socket, threading.Lock(), None]
+        # Only sends time out: a session is idle between heartbeats, but a node that stops reading must not
+        # hold up the pushes to the others
+        client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, struct.pack("ll", PUSH_TIMEOUT, 0))
+        try:
+            # The node authenticates once per session with its RSA encrypted name
+            encrypted_node_name = framing.recv_frame(client_socket)
+            if encrypted_node_name is None:
+                return
+            node_name = self.decrypt(encrypted_node_name).decode()
+            if not self.owns(node_name):
+                print(f"Session of node {node_name} refused, it belongs to shard {self.ring.shard_of(node_name)}.")
+                node_name = None
+                return
+            print(f"Session opened by node: {node_name}")
+            self.heartbeat(node_name)
+            with self.sessions_lock:
+                previous_session = self.sessions.get(node_name)
+                self.sessions[node_name] = session
+            if previous_session is not None:
+                previous_session[0].close()
+            self.send_full_table(node_name, session)
+            while True:
+                message = framing.recv_json(client_socket)
+                if message is None:
+                    break
+                if message.get("type") == "heartbeat":
+                    self.heartbeat(node_name)
+                    if message.get("load"):
+                        self.record_load(node_name, message["load"])
+                elif message.get("type") == "resync":
+                    self.send_full_table(node_name, session)
+        except Exception as e:
+            print(f"Error handling session: {e}")
+        finally:
+            with self.sessions_lock:
+                if node_name is not None and self.sessions.get(node_name) is session:
+                    del self.sessions[node_name]
+            client_socket.close()
+
+    def send_full_table(self, node_name, session):
+        with self.tables_lock:
+            version = self.table_version
+            table = self.routing_tables.get(node_name, {})
+        with session[1]:
+            if session[2] is not None and session[2] >= version:
+                return  # A push of this or a newer version got the send lock first
+            framing.send_json(session[0], {"type": "table", "version": version, "table": table})
+            session[2] = version
+
+    def push_routing_tables(self, version, changes, routing_tables):
+        # Called without tables_lock: a slow node only delays its own session, whose send lock keeps the
+        # messages of one session in version order
+        with self.sessions_lock:
+            sessions = list(self.sessions.items())
+        for node_name, session in sessions:
+            try:
+                with session[1]:
+                    if session[2] is not None and session[2] >= version:
+                        continue
+                    if session[2] != version - 1:
+                        # The node missed an update, so a delta against the previous version would be wrong
+                        message = {"type": "table", "version": version, "table": routing_tables.get(node_name, {})}
+                    elif node_name in changes:
+                        message = {"type": "delta", "version": version, "changes": changes[node_name]}
+                    else:
+                        message = None
+                    if message is not None:
+                        framing.send_json(session[0], message)
+                    session[2] = version
+            except Exception as e:
+                print(f"Error pushing routing table to {node_name}, closing its session: {e}")
+                with self.sessions_lock:
+                    if self.sessions.get(node_name) is session:
+                        del self.sessions[node_name]
+                # Shutting down also wakes the session thread blocked in recv
+                try:
+                    session[0].shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                session[0].close()
+
+    def routing_table_update(self, node_name, version):
+        with self.tables_lock:
+            if version == self.table_version:
+                return {"version": version, "not_modified": True}
+            oldest = self.table_history[0][0] - 1 if self.table_history else self.table_version
+            if not oldest <= version < self.table_version:
+                # The version is unknown or too old for the history, so the node needs its full table
+                return {"version": self.table_version, "table": self.routing_tables.get(node_name, {})}
+            changes = {}
+            for history_version, node_changes in self.table_history:
+                if history_version > version:
+                    changes.update(node_changes.get(node_name, {}))
+            if not changes:
+                return {"version": self.table_version, "not_modified": True}
+            return {"version": self.table_version, "changes": changes}
+
+    def compute_routing_tables(self, cancelled=None):
+        # Work on an immutable snapshot, so that nodes can be removed and added while routes are computed
+        topology_snapshot = network.snapshot()
+        graph = topology_snapshot.graph
+        if self.traffic is not None:
+            graph = self.traffic.weighted_graph(graph)
+        routing_tables = self.build_routing_tables(graph, cancelled)
+        if routing_tables is None:
+            print(f"Routing computation for topology version {topology_snapshot.version} superseded.")
+            return False
+        if self.paths is not None and not areas.is_hierarchical(graph):
+            # The paths depend on the topology, not on the load, so they are computed once per topology version, in
+            # the background: the tables are published with the previous paths, and a recomputation adds the new ones
+            path_table = self.paths.table
+            if path_table is None or path_table.version != topology_snapshot.version:
+                self.paths.compute_async(topology_snapshot, list(routing_tables), self.update_routing_tables)
+            if path_table is not None:
+                path_protection.add_protection_routes(routing_tables, path_table, topology_snapshot.graph)
+        with self.tables_lock:
+            changes = {}
+            for node_name in routing_tables.keys() | self.routing_tables.keys():
+                delta = routing_table_delta(self.routing_tables.get(node_name, {}), routing_tables.get(node_name, {}))
+                if delta:
+                    changes[node_name] = delta
+            if self.replication is not None:
+                # Standbys get the full tables that differ, also beyond the next hop, for the nodes that poll
+                replicated = {"type": "tables", "version": self.table_version + 1, "changes": changes,
+                              "tables": {node_name: table for node_name, table in routing_tables.items()
+                                         if self.routing_tables.get(node_name) != table},
+                              "removed": [node_name for node_name in self.routing_tables
+                                          if node_name not in routing_tables]}
+            self.routing_tables = routing_tables
+            self.table_version += 1
+            self.table_history.append((self.table_version, changes))
+            version = self.table_version
+        self.push_routing_tables(version, changes, routing_tables)
+        if self.replication is not None:
+            self.replication.send(replicated)
+        self.writer.submit(routing_tables, topology_snapshot)
+        if self.shared_routes is not None:
+            # Shared memory holds a full next-hop matrix, so area summaries are listed per destination
+            self.shared_routes.publish(areas.expand_summaries(routing_tables, topology_snapshot.graph))
+            print(f"Routing tables published to shared memory, version {self.shared_routes.version()}.")
+        counters = self.scheduler.counters()
+        print(f"Routing tables version {version} computed for topology version {topology_snapshot.version}. "
+              f"Scheduler: {counters['queued']} changes queued, {counters['coalesced']} coalesced, "
+              f"{counters['started']} computations started, {counters['completed']} completed, "
+              f"{counters['superseded']} superseded, {counters['failed']} failed, {counters['periodic']} periodic, "
+              f"delay {counters['delay_s']:.2f} s.")
+        return True
+
+    def build_routing_tables(self, graph, cancelled=None):
+        if areas.is_hierarchical(graph):
+            # Area routing needs the distances of every node of an area, so shards keep their share of all tables
+            # Area routing adds up distances, which widest paths do not have, so it always uses shortest paths
+            routing_tables = areas.area_routing_tables(graph, 'bellman' if self.algorithm == 'bellman' else 'dijkstra',
+                                                       cancelled)
+            if routing_tables is None or self.ring is None:
+                return routing_tables
+            return {node: table for node, table in routing_tables.items() if self.owns(node)}
+        if self.algorithm == 'dijkstra':
+            single_source_paths = nx.single_source_dijkstra_path
+        elif self.algorithm == 'bellman':
+            single_source_paths = nx.single_source_bellman_ford_path
+        elif self.algorithm == 'widest':
+            # Every widest route is a path of the same spanning tree, so it is computed once for all sources
+            tree = dijkstra_paths.widest_path_tree(graph)
+            single_source_paths = lambda _, node, weight: nx.single_source_shortest_path(tree, node)
         else:
             raise ValueError(
-                "Invalid algorithm specified. Use 'dijkstra' or 'bellman_ford'.")
+                "Invalid algorithm specified. Use 'dijkstra', 'bellman_ford' or 'widest'.")
         #all_paths = dijkstra_paths.compute_shortest_paths_bellman_ford(network)
+        # Only the sources this shard owns are computed, so the shards share the work
+        all_paths = ((node, single_source_paths(graph, node, weight="weight")) for node in graph if self.owns(node))
         routing_tables = {}
-        for node, paths in all_paths.items():
+        # Sources are computed one at a time, so a superseded computation stops between two of them
+        for node, paths in all_paths:
+            if cancelled is not None and cancelled():
+                return None
             routing_tables[node] = {}
             for destination, path in paths.items():
                 routing_tables[node][destination] = path
-        with open("routing_tables.json", "w") as file:
-            json.dump(routing_tables, file, indent=4)
-        print("Routing tables written to routing_tables.json.")
-        # Schedule the next update
-        threading.Timer(30, self.update_routing_tables).start()
+        if self.media_routing and self.algorithm != 'widest':
+            tree = dijkstra_paths.widest_path_tree(graph)
+            media_routes.add_media_routes(routing_tables, {node: nx.single_source_shortest_path(tree, node)
+                                                           for node in routing_tables})
+        return routing_tables
+
+    def persist_routing_tables(self, routing_tables, topology_snapshot):
+        # Readers of these files see either the previous or the new version, never a partial write
+        write_json_atomic(routing_tables, self.tables_file)
+        print(f"Routing tables written to {self.tables_file}.")
+        if self.snapshot_file:
+            write_snapshot(topology_snapshot, self.snapshot_file,
+                           areas.expand_summaries(routing_tables, topology_snapshot.graph))
+            print(f"Routing snapshot written to {self.snapshot_file}.")
 
     def update_routing_tables(self):
-        threading.Thread(target=self.compute_routing_tables).start()
+        self.scheduler.notify()
 
     def remove_node(self, node_name):
         print(f"Removing node {node_name} from topology.")
         network.remove_node(node_name)
+        self.update_routing_tables()
+        self.replicate({"type": "removed", "nodes": [node_name]})
+        if self.bus is not None:
+            self.removed_nodes.add(node_name)
+            self.bus.publish({"event": "removed", "nodes": [node_name]})
 
     def add_node_to_network(self, node_name, node_id):
-        print(f"Node {node_name} reconnected. Adding it back to the network.")
-        network.add_node(node_id, node_name)
+        with self.pending_additions_lock:
+            self.pending_additions[node_name] = node_id
+        # The heartbeats of nodes that reconnect together wait for the network lock here, and whichever gets it
+        # first adds all the waiting nodes in one topology version
+        with network.batch():
+            with self.pending_additions_lock:
+                additions, self.pending_additions = self.pending_additions, {}
+            for node_name, node_id in additions.items():
+                print(f"Node {node_name} reconnected. Adding it back to the network.")
+                network.add_node(node_id, node_name)
+        if not additions:
+            return
         network.display_network()
+        self.update_routing_tables()
+        for node_name, node_id in additions.items():
+            self.replicate({"type": "added", "node": node_name, "node_id": node_id})
+            if self.bus is not None:
+                self.removed_nodes.discard(node_name)
+                self.bus.publish({"event": "added", "node": node_name, "node_id": node_id})
 
 # Example usage
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the routing controller.")
+    parser.add_argument("--algorithm", choices=["dijkstra", "bellman", "widest"],
+                        help="routing algorithm, asked if omitted")
+    parser.add_argument("--media-routing", action="store_true",
+                        help="also route audio and video messages over the widest paths")
+    parser.add_argument("--protection-paths", nargs="?", const="protection_paths.npz", metavar="FILE",
+                        help="add precomputed protection paths to the routing tables and write the k shortest "
+                             "and disjoint paths to this file (default protection_paths.npz)")
+    parser.add_argument("--k-paths", type=int, default=3,
+                        help="shortest paths per pair for --protection-paths (default 3)")
+    parser.add_argument("--paths-memory", type=float, default=256,
+                        help="MiB the protection paths may use (default 256)")
+    parser.add_argument("--topology", help="boot from a topology file instead of the embedded NSFNet")
+    parser.add_argument("--snapshot", help="boot from a binary snapshot instead of the embedded NSFNet")
+    parser.add_argument("--write-snapshot", help="write the topology and next-hop tables to this binary snapshot "
+                        "after each computation, for nodes started with --snapshot (N x N entries)")
+    parser.add_argument("--shared-memory", nargs="?", const="nsfnet_routes", metavar="SEGMENT",
+                        help="publish next-hop tables to a shared memory segment for co-located nodes")
+    parser.add_argument("--session-port", type=int, default=8001,
+                        help="port for persistent node sessions with pushed updates, 0 to disable")
+    parser.add_argument("--phi-threshold", type=float, default=8.0,
+                        help="suspicion level at which a silent node is removed (default 8: about one false "
+                             "removal in 10^8 checks)")
+    parser.add_argument("--recompute-period", type=float, default=30.0,
+                        help="seconds between routing computations when the topology does not change")
+    parser.add_argument("--decrypt-workers", type=int,
+                        help="processes for RSA decryption (default is the number of CPUs, shared by the "
+                             "shards), 0 to decrypt on request threads")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="controller processes sharing the nodes; shard i listens on port 8000 + 2i, and "
+                             "nodes must be started with the same --shards")
+    parser.add_argument("--shard", type=int, help=argparse.SUPPRESS)  # Set by the launcher for each shard
+    parser.add_argument("--replicate", nargs="?", const=DEFAULT_PATH, metavar="SOCKET",
+                        help="stream the controller's state to standby controllers on this Unix socket")
+    parser.add_argument("--standby", nargs="?", const=DEFAULT_PATH, metavar="SOCKET",
+                        help="follow the primary controller on this Unix socket and take over when it fails")
+    parser.add_argument("--traffic-engineering", action="store_true",
+                        help="route around congested links, using the link load that nodes report")
+    parser.add_argument("--te-hysteresis", type=float, default=0.25,
+                        help="relative change of a link's congestion factor needed to reroute (default 0.25)")
+    parser.add_argument("--te-capacity-per-bandwidth", type=float, default=1e9 / 8,
+                        help="bytes per second a link carries per unit of its bandwidth (default 125000000, for "
+                             "bandwidths in Gbps); 125 reads them as kbit/s, the scale of the local mesh")
+    parser.add_argument("--event-log", metavar="DIRECTORY",
+                        help="log topology changes to this directory and restart from the logged topology "
+                             "(each shard uses a subdirectory)")
+    args = parser.parse_args()
+    if args.shards > 1 and (args.replicate or args.standby):
+        parser.error("--replicate and --standby cannot be used with --shards")
+    if args.standby and args.shared_memory:
+        parser.error("--shared-memory cannot be used with --standby, the primary owns the segment")
+    if args.shards > 1 and (args.write_snapshot or args.shared_memory):
+        parser.error("--write-snapshot and --shared-memory need the tables of every node, not one shard's")
+    if args.shards > 1 and args.shard is None:
+        # Launcher: run one controller process per shard and wait for them
+        algorithm = args.algorithm or input("Enter bellman, dijkstra or widest to set your algorithm: ")
+        shard_processes = [subprocess.Popen([sys.executable, *sys.argv, "--algorithm", algorithm,
+                                             "--shard", str(shard)]) for shard in range(args.shards)]
+        # Stopping the launcher stops the shards
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            for shard_process in shard_processes:
+                shard_process.wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for shard_process in shard_processes:
+                shard_process.terminate()
+        sys.exit(0)
+    event_log = None
+    if args.event_log:
+        event_log = EventLog(os.path.join(args.event_log, f"shard{args.shard}") if args.shard is not None
+                             else args.event_log)
+    started = time.perf_counter()
+    restored_network = event_log.load() if event_log is not None else None
+    if restored_network is not None:
+        # The logged topology, with its removed and added nodes, replaces the boot topology
+        network = restored_network
+        print(f"Restored {len(network.nodes)} nodes and {len(network.links)} links from the event log in "
+              f"{time.perf_counter() - started:.3f} s.")
+    elif args.topology:
+        network = topology.load_topology(args.topology)
+        print(f"Loaded {len(network.nodes)} nodes and {len(network.links)} links from {args.topology}.")
+    elif args.snapshot:
+        network = TopologySnapshot(args.snapshot).to_network()
+        print(f"Loaded {len(network.nodes)} nodes and {len(network.links)} links from {args.snapshot}.")
     # Start TCP server
-    algorithm = input("Enter bellman or dijkstra to set your algorithm: ")
-    server = TCPServer("localhost", 8000, algorithm)
-    server.start()
+    algorithm = args.algorithm or input("Enter bellman, dijkstra or widest to set your algorithm: ")
+    server = TCPServer("localhost", controller_port(args.shard or 0), algorithm)
+    server.snapshot_file = args.write_snapshot
+    server.session_port = args.session_port or None
+    server.failure_detector.threshold = args.phi_threshold
+    server.scheduler.period = args.recompute_period
+    server.media_routing = args.media_routing
+    decrypt_workers = args.decrypt_workers
+    if args.shard is not None:
+        server.ring = HashRing(args.shards)
+        server.shard = args.shard
+        server.bus = ShardBus(args.shard, args.shards, server.apply_topology_event)
+        server.tables_file = f"routing_tables.shard{args.shard}.json"
+        # Every shard's session server listens next to its port
+        server.session_port = server.port + 1 if args.session_port else None
+        if decrypt_workers is None:
+            decrypt_workers = max(1, (os.cpu_count() or 1) // args.shards)
+    if decrypt_workers != 0:
+        server.decryption_pool = DecryptionPool("pri_key.txt", decrypt_workers)
+    if args.shared_memory:
+        server.shared_routes = SharedRoutingTables([node.name for node in network.nodes.values()],
+                                                   args.shared_memory)
+    if args.replicate:
+        server.replication = ReplicationServer(args.replicate, server.replication_state)
+    server.event_log = event_log
+    if args.traffic_engineering:
+        server.traffic = LinkUtilization(capacity_per_bandwidth=args.te_capacity_per_bandwidth,
+                                         hysteresis=args.te_hysteresis)
+    if args.protection_paths:
+        paths_file = args.protection_paths
+        if args.shard is not None:
+            # Every shard computes the paths of its own nodes
+            paths_file = f"{os.path.splitext(paths_file)[0]}.shard{args.shard}.npz"
+        server.paths = path_protection.PathCache(args.k_paths, max(1, (os.cpu_count() or 1) // args.shards),
+                                                 int(args.paths_memory * 2 ** 20), paths_file)
+    if args.standby:
+        server.run_standby(args.standby)
+    else:
+        server.start()
 
 
 
@@ -1,6 +1,8 @@
+import heapq
 import networkx as nx
 import matplotlib.pyplot as plt
 from network import Network
+from visualization import draw_paths
 
 def find_path_bellman_ford(self, start_node_name, end_node_name):
     """
@@ -155,19 +157,98 @@ def compute_all_shortest_paths(network):
         for destination, path in destinations.items():
             print(f"Shortest path from {source} to {destination}: {path}")
 
-def visualize_path(path, network):
+def find_widest_path(network, source_name, destination_name):
     """
-    Visualizes a path in the network graph.
+    Finds the widest path between two nodes, the path whose narrowest link has the greatest bandwidth, with
+    Dijkstra's algorithm modified to maximize the bottleneck bandwidth instead of minimizing a sum. The
+    bandwidth of a link is 1/weight.
+
+    Args:
+        network (Network): The network instance representing the network topology.
+        source_name (str): The name of the source node.
+        destination_name (str): The name of the destination node.
+
+    Returns:
+        list or None: A list of node names representing the widest path from source_name to destination_name,
+                      or None if no path exists.
+    """
+    graph = network.graph
+    for name in (source_name, destination_name):
+        if name not in graph:
+            print(f"Node {name} not found in the network.")
+            return None
+    # Bottleneck bandwidth of the widest path found so far to each node
+    widths = {source_name: float('inf')}
+    predecessors = {source_name: None}
+    visited = set()
+    heap = [(-float('inf'), source_name)]
+    while heap:
+        negative_width, node = heapq.heappop(heap)
+        if node in visited:
+            continue
+        visited.add(node)
+        if node == destination_name:
+            break
+        for neighbor, data in graph[node].items():
+            width = min(-negative_width, 1 / data['weight'])
+            if neighbor not in visited and width > widths.get(neighbor, 0):
+                widths[neighbor] = width
+                predecessors[neighbor] = node
+                heapq.heappush(heap, (-width, neighbor))
+    if destination_name not in visited:
+        print(f"No path exists between {source_name} and {destination_name}.")
+        return None
+    path = []
+    step = destination_name
+    while step is not None:
+        path.append(step)
+        step = predecessors[step]
+    path.reverse()
+    print(f"Widest path from {source_name} to {destination_name}: {path}, bottleneck {widths[destination_name]:g}")
+    return path
+
+def widest_path_tree(graph):
+    """
+    Returns a maximum bandwidth spanning tree of a graph. The path between two nodes in this tree is a
+    widest path between them, and the routes it gives are consistent hop by hop: the route of a next hop
+    is the rest of the route, so forwarding over them cannot loop.
+
+    Args:
+        graph (NetworkX Graph): The topology, with weights 1/bandwidth.
+
+    Returns:
+        NetworkX Graph: The tree, a forest if the graph is not connected.
+    """
+    # The narrowest links have the largest weights, so the minimum weight tree has the widest links
+    return nx.minimum_spanning_tree(graph, weight='weight')
+
+def compute_all_widest_paths(network):
+    """
+    Computes widest paths between all pairs of nodes in the network, from a maximum bandwidth spanning tree.
+
+    Args:
+        network (Network): The network instance representing the network topology.
+
+    Returns:
+        dict: The widest paths from each node to all the nodes it can reach.
+    """
+    tree = widest_path_tree(network.graph)
+    return {source: nx.single_source_shortest_path(tree, source) for source in tree}
+
+def visualize_path(path, network, pos=None):
+    """
+    Visualizes a path in the network graph in an interactive window.
+
+    For non-blocking rendering to a file, use visualization.PathRenderer instead.
 
     Args:
         path (list): A list of node names representing the path.
         network (Network): The network instance representing the network topology.
+        pos (dict, optional): Precomputed node positions. A spring layout is computed if omitted.
     """
-    pos = nx.spring_layout(network.graph)
-    nx.draw(network.graph, pos, with_labels=True, node_color='lightblue', node_size=500, font_size=10, font_weight='bold')
-    path_edges = list(zip(path, path[1:]))
-    nx.draw_networkx_nodes(network.graph, pos, nodelist=path, node_color='red')
-    nx.draw_networkx_edges(network.graph, pos, edgelist=path_edges, edge_color='red', width=2)
+    if pos is None:
+        pos = nx.spring_layout(network.graph)
+    draw_paths(plt.gca(), network.graph, pos, [path])
     plt.show()
 
 
@@ -0,0 +1,279 @@
+"""
+API Documentation
+
+This module provides the durable event log of the controller's topology.
+
+Every published version of the network is appended to the log as one entry: a sequence number and the
+events that led to it (node_added, node_removed, link_added, link_removed, bandwidth_changed, see
+Network). Entries are flushed to disk with fsync before the change takes effect elsewhere.
+
+The log is a directory of segment files, events.<first sequence number>.jsonl, plus snapshot.json, a
+compacted copy of the whole topology at a sequence number. Every snapshot_every entries, a new segment is
+started and the topology is snapshotted in the background; once the snapshot is written, the segments it
+covers are deleted. On start, the controller loads the snapshot and replays only the entries after it, so
+the restart time is bounded by the log tail rather than by the history of the topology.
+
+An entry is complete once its line ends with a newline. A crash can leave the last entry of the last
+segment cut short; open() truncates that segment after its last complete entry before appending, so
+that new entries are not written after the partial line, where they could not be read back.
+
+The log is also a deterministic input for performance regression tests: running this module replays a
+log, and optionally recomputes the routing tables after every entry, and reports the timings.
+
+Classes:
+    EventLog:
+        An append-only, periodically compacted log of topology events.
+
+        Methods:
+            __init__(self, directory: str, snapshot_every: int = 1000):
+                Initializes the log, creating its directory if needed.
+
+            load(self) -> Network:
+                Rebuilds the network from the snapshot and the log tail.
+
+            entries(self) -> iterator:
+                Yields the (sequence number, events) entries after the snapshot.
+
+            open(self, topology_snapshot: NetworkSnapshot):
+                Snapshots the current topology and starts appending.
+
+            append(self, topology_snapshot: NetworkSnapshot, events: list):
+                Appends the events of a new network version.
+
+            close(self):
+                Waits for the pending snapshot and closes the current segment.
+
+Functions:
+    apply_events(network: Network, events: list):
+        Applies logged events to a network.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from network import Network
+from persistence import WriteBehind, write_json_atomic
+
+SNAPSHOT_FILE = "snapshot.json"
+
+
+def apply_events(network, events):
+    """
+    Applies logged events to a network, in one batch.
+
+    Args:
+        network (Network): The network.
+        events (list): Events as logged, dicts with an "event" key.
+    """
+    with network.batch():
+        for event in events:
+            kind = event["event"]
+            if kind == "node_added":
+                network.add_node(event["node_id"], event["name"], event["node_type"], event["area"])
+            elif kind == "node_removed":
+                network.remove_node(event["name"])
+            elif kind == "link_added":
+                network.add_link(event["source_id"], event["destination_id"], event["bandwidth"])
+            elif kind == "link_removed":
+                network.remove_link(event["source_id"], event["destination_id"])
+            elif kind == "bandwidth_changed":
+                network.set_bandwidth(event["source_id"], event["destination_id"], event["bandwidth"])
+            else:
+                print(f"Unknown topology event: {kind}")
+
+
+class EventLog:
+    def __init__(self, directory, snapshot_every=1000):
+        """
+        Initializes the log, creating its directory if needed. Nothing is written before open().
+
+        Args:
+            directory (str): The directory of the log.
+            snapshot_every (int, optional): Entries between two snapshots (default is 1000).
+        """
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.sequence = 0  # Sequence number of the last entry on disk
+        self.segment = None
+        self.segment_entries = 0
+        self.writer = WriteBehind(self._write_snapshot)
+        os.makedirs(directory, exist_ok=True)
+
+    def _segments(self):
+        # Segment files, sorted by the sequence number of their first entry
+        paths = glob.glob(os.path.join(self.directory, "events.*.jsonl"))
+        return sorted((int(os.path.basename(path).split(".")[1]), path) for path in paths)
+
+    def _read_snapshot(self):
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as file:
+            return json.load(file)
+
+    def entries(self):
+        """
+        Yields the entries after the snapshot, in order. A line cut short by a crash, with or without
+        its newline, ends the entries of its segment.
+
+        Yields:
+            tuple: (sequence number, list of events).
+        """
+        snapshot = self._read_snapshot()
+        after = snapshot["sequence"] if snapshot is not None else 0
+        for _, path in self._segments():
+            with open(path) as file:
+                for line in file:
+                    try:
+                        if not line.endswith("\n"):
+                            raise ValueError("no newline")
+                        entry = json.loads(line)
+                    except ValueError:
+                        print(f"Skipping a truncated entry in {path}.")
+                        break
+                    if entry["sequence"] > after:
+                        yield entry["sequence"], entry["events"]
+
+    def load(self):
+        """
+        Rebuilds the network from the snapshot and replays the entries after it.
+
+        Returns:
+            Network or None: The network, or None if the log has no snapshot yet.
+        """
+        snapshot = self._read_snapshot()
+        if snapshot is None:
+            return None
+        network = Network()
+        network.bulk_load(map(tuple, snapshot["nodes"]), map(tuple, snapshot["links"]))
+        self.sequence = snapshot["sequence"]
+        # One version for the whole tail: each version copies the node and link collections once
+        with network.batch():
+            for sequence, events in self.entries():
+                apply_events(network, events)
+                self.sequence = sequence
+        return network
+
+    def open(self, topology_snapshot):
+        """
+        Snapshots the current topology, synchronously, and starts appending to a new segment. The
+        topology must include every entry already in the log, e.g. the network returned by load().
+
+        Args:
+            topology_snapshot (NetworkSnapshot): The current version of the network.
+        """
+        self._truncate_tail()
+        # Another controller may have appended to the log since it was loaded, e.g. a failed primary
+        snapshot = self._read_snapshot()
+        self.sequence = snapshot["sequence"] if snapshot is not None else 0
+        for sequence, _ in self.entries():
+            self.sequence = sequence
+        self._start_segment()
+        self._write_snapshot(topology_snapshot, self.sequence)
+
+    def append(self, topology_snapshot, events):
+        """
+        Appends the events of a new network version and flushes them to disk. Meant to be set as the
+        network's journal.
+
+        Args:
+            topology_snapshot (NetworkSnapshot): The new version of the network.
+            events (list): The events that led to it.
+        """
+        try:
+            self.sequence += 1
+            self.segment.write(json.dumps({"sequence": self.sequence, "events": events}, separators=(",", ":")))
+            self.segment.write("\n")
+            self.segment.flush()
+            os.fsync(self.segment.fileno())
+            self.segment_entries += 1
+            if self.segment_entries >= self.snapshot_every:
+                self._start_segment()
+                self.writer.submit(topology_snapshot, self.sequence)
+        except OSError as e:
+            print(f"Error appending to the event log: {e}")
+
+    def close(self):
+        """Waits for the pending snapshot and closes the current segment."""
+
+        self.writer.flush()
+        if self.segment is not None:
+            self.segment.close()
+            self.segment = None
+
+    def _truncate_tail(self):
+        # Appending after an entry cut short by a crash would hide the new entries from entries()
+        segments = self._segments()
+        if not segments:
+            return
+        path = segments[-1][1]
+        with open(path, "rb+") as file:
+            complete = 0
+            for line in iter(file.readline, b""):
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("no newline")
+                    json.loads(line)
+                except ValueError:
+                    break
+                complete += len(line)
+            if complete < file.seek(0, os.SEEK_END):
+                print(f"Truncating {path} after its last complete entry.")
+                file.truncate(complete)
+                os.fsync(file.fileno())
+
+    def _start_segment(self):
+        if self.segment is not None:
+            self.segment.close()
+        path = os.path.join(self.directory, f"events.{self.sequence + 1:012d}.jsonl")
+        self.segment = open(path, "a")
+        self.segment_entries = 0
+
+    def _write_snapshot(self, topology_snapshot, sequence):
+        write_json_atomic({"sequence": sequence,
+                           "nodes": [[node.node_id, node.name, node.node_type, node.area]
+                                     for node in topology_snapshot.nodes.values()],
+                           "links": [[link.source.node_id, link.destination.node_id, link.bandwidth]
+                                     for link in topology_snapshot.links]},
+                          os.path.join(self.directory, SNAPSHOT_FILE))
+        # A segment ends where the next one starts; those that end by sequence are covered by the snapshot
+        segments = self._segments()
+        for (_, path), (next_first, _) in zip(segments, segments[1:]):
+            if next_first <= sequence + 1:
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a topology event log and report the timings.")
+    parser.add_argument("directory", help="the event log directory, as given to the controller's --event-log")
+    parser.add_argument("--compute", choices=["dijkstra", "bellman"],
+                        help="also recompute the routing tables after every entry with this algorithm")
+    args = parser.parse_args()
+
+    if args.compute:
+        from controllerserver import TCPServer
+        server = TCPServer("localhost", 0, args.compute)
+    event_log = EventLog(args.directory)
+    started = time.perf_counter()
+    snapshot = event_log._read_snapshot()
+    if snapshot is None:
+        parser.error(f"{args.directory} holds no snapshot")
+    network = Network()
+    network.bulk_load(map(tuple, snapshot["nodes"]), map(tuple, snapshot["links"]))
+    loaded = time.perf_counter()
+    print(f"Snapshot at entry {snapshot['sequence']}: {len(network.nodes)} nodes, {len(network.links)} links, "
+          f"loaded in {loaded - started:.3f} s.")
+    count, compute_time = 0, 0.0
+    for sequence, events in event_log.entries():
+        apply_events(network, events)
+        count += 1
+        if args.compute:
+            compute_started = time.perf_counter()
+            server.build_routing_tables(network.graph)
+            compute_time += time.perf_counter() - compute_started
+    replayed = time.perf_counter()
+    print(f"Replayed {count} entries in {replayed - loaded - compute_time:.3f} s: {len(network.nodes)} nodes, "
+          f"{len(network.links)} links.")
+    if args.compute and count:
+        print(f"Routing computations: {compute_time:.3f} s in total, {compute_time / count:.4f} s per entry.")
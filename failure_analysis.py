@@ -0,0 +1,287 @@
+"""
+API Documentation
+
+This module provides a what-if analysis of router and link failures.
+
+Every single failure of a node or a link, and optionally every double failure, is evaluated in advance:
+which pairs of surviving nodes can no longer reach each other, how much longer (by link weight) the
+shortest paths of the others become, and which links are overloaded by the traffic that moves. The
+traffic is a matrix of demands in Gbps, by default the same demand between every pair of nodes, scaled so
+that the busiest link is at the given utilization before any failure.
+
+A scenario is evaluated on a restricted view of the topology, which hides the failed elements without
+copying the graph. Shortest paths are computed incrementally: the shortest-path tree of every source and
+the link loads it contributes are computed once for the intact topology, and a scenario only recomputes
+the sources whose tree routes through a failed element, a link of the tree or a node with children in it;
+removing elements cannot shorten any path, so the other trees stay valid, and a failed leaf only takes
+away the path to itself and the load of its demand. Pairs that were already unreachable in the intact
+topology are left out of every scenario. Scenarios are spread over a pool of worker processes, each of
+which receives the topology and the trees once.
+
+Scenarios are ranked by criticality: the unreachable pairs first, then the overloaded links, the highest
+link utilization and the mean stretch.
+
+Functions:
+    failure_scenarios(graph: NetworkX Graph, double: bool = False) -> list:
+        Returns the failure scenarios of a topology.
+
+    uniform_demands(graph: NetworkX Graph, utilization: float = 0.5) -> dict:
+        Returns a uniform traffic matrix that loads the busiest link to a given utilization.
+
+    read_demands(file_name: str) -> dict:
+        Reads a traffic matrix from a CSV file.
+
+    analyze(graph: NetworkX Graph, demands: dict, double: bool = False, workers: int = None) -> list:
+        Evaluates every failure scenario and returns the results, most critical first.
+
+    format_report(results: list, count: int = 20) -> str:
+        Formats the most critical scenarios as a table.
+"""
+import argparse
+import collections
+import concurrent.futures
+import csv
+import itertools
+import json
+import os
+import time
+import networkx as nx
+
+_state = None  # In the workers: the topology, the demands and the trees of the intact topology
+
+
+def _link(source, destination):
+    return tuple(sorted((source, destination)))
+
+
+def _source_routes(graph, source, demands):
+    # Shortest-path tree of a source, and the load its demands put on each link direction
+    distances, paths = nx.single_source_dijkstra(graph, source, weight="weight")
+    carried = collections.Counter()
+    loads = collections.Counter()
+    for destination in sorted(distances, key=distances.get, reverse=True):
+        if destination == source:
+            continue
+        carried[destination] += demands.get((source, destination), 0.0)
+        parent = paths[destination][-2]
+        if carried[destination]:
+            loads[(parent, destination)] += carried[destination]
+            carried[parent] += carried[destination]
+    parents = {destination: path[-2] for destination, path in paths.items() if destination != source}
+    links = {_link(parent, destination) for destination, parent in parents.items()}
+    interior = set(parents.values()) - {source}
+    return {"distances": distances, "parents": parents, "links": links, "interior": interior, "loads": loads}
+
+
+def _baseline(graph, demands):
+    routes = {source: _source_routes(graph, source, demands) for source in graph}
+    loads = collections.Counter()
+    for source_routes in routes.values():
+        loads.update(source_routes["loads"])
+    return routes, loads
+
+
+def _start_worker(graph, demands, routes, loads):
+    global _state
+    _state = (graph, demands, routes, loads)
+
+
+def _evaluate(scenario):
+    graph, demands, routes, baseline_loads = _state
+    failed_nodes = {name for kind, name in scenario if kind == "node"}
+    failed_links = [name for kind, name in scenario if kind == "link"]
+    view = nx.restricted_view(graph, failed_nodes, failed_links)
+    hidden = {_link(*link) for link in failed_links}
+    loads = collections.Counter(baseline_loads)
+    unreachable = []
+    stretches = []
+    unchanged = 0  # Pairs that keep their path, with a stretch of 1
+    for source, source_routes in routes.items():
+        distances = source_routes["distances"]
+        if source not in failed_nodes and not (failed_nodes & source_routes["interior"]
+                                               or hidden & source_routes["links"]):
+            # The tree is still valid, but for its failed leaves: their demands no longer load the path to them
+            failed_leaves = failed_nodes & distances.keys()
+            for leaf in failed_leaves:
+                demand = demands.get((source, leaf), 0.0)
+                node = leaf
+                while demand and node != source:
+                    parent = source_routes["parents"][node]
+                    loads[(parent, node)] -= demand
+                    node = parent
+            unchanged += len(distances) - 1 - len(failed_leaves)
+            continue
+        loads.subtract(source_routes["loads"])
+        if source in failed_nodes:
+            continue
+        new_routes = _source_routes(view, source, demands)
+        loads.update(new_routes["loads"])
+        # Only the pairs reachable in the intact topology are compared
+        for destination, distance in distances.items():
+            if destination == source or destination in failed_nodes:
+                continue
+            new_distance = new_routes["distances"].get(destination)
+            if new_distance is None:
+                unreachable.append([source, destination])
+            else:
+                stretches.append(new_distance / distance if distance else 1.0)
+    reachable = len(stretches) + unchanged
+    overloaded = []
+    max_utilization = 0.0
+    for (source, destination), load in loads.items():
+        if source in failed_nodes or destination in failed_nodes or _link(source, destination) in hidden:
+            continue
+        utilization = load * graph[source][destination]["weight"]  # The weight is 1/bandwidth
+        max_utilization = max(max_utilization, utilization)
+        if utilization > 1:
+            overloaded.append([source, destination, round(utilization, 4)])
+    return {"failed": [[kind, name if kind == "node" else list(name)] for kind, name in scenario],
+            "unreachable_pairs": len(unreachable), "unreachable": unreachable,
+            "mean_stretch": (sum(stretches) + unchanged) / reachable if reachable else None,
+            "max_stretch": max(stretches, default=1.0), "max_utilization": max_utilization,
+            "overloaded_links": sorted(overloaded, key=lambda link: -link[2])}
+
+
+def _evaluate_chunk(scenarios):
+    return [_evaluate(scenario) for scenario in scenarios]
+
+
+def failure_scenarios(graph, double=False):
+    """
+    Returns the failure scenarios of a topology: every node and every link, and optionally every pair of
+    them.
+
+    Args:
+        graph (NetworkX Graph): The topology.
+        double (bool, optional): Whether to add the double failures (default is False).
+
+    Returns:
+        list: Scenarios, tuples of failed elements ('node', name) or ('link', (source, destination)).
+    """
+    elements = [("node", name) for name in graph] + [("link", _link(*link)) for link in graph.edges]
+    scenarios = [(element,) for element in elements]
+    if double:
+        scenarios += list(itertools.combinations(elements, 2))
+    return scenarios
+
+
+def uniform_demands(graph, utilization=0.5):
+    """
+    Returns the same demand between every ordered pair of nodes, scaled so that the busiest link direction
+    is at a given utilization on the shortest paths of the intact topology.
+
+    Args:
+        graph (NetworkX Graph): The topology, with weights 1/bandwidth.
+        utilization (float, optional): Utilization of the busiest link direction (default is 0.5).
+
+    Returns:
+        dict: (origin, destination) -> demand in Gbps.
+    """
+    demands = {(origin, destination): 1.0 for origin in graph for destination in graph if origin != destination}
+    _, loads = _baseline(graph, demands)
+    peak = max((load * graph[source][destination]["weight"] for (source, destination), load in loads.items()),
+               default=0.0)
+    scale = utilization / peak if peak else 1.0
+    return {pair: demand * scale for pair, demand in demands.items()}
+
+
+def read_demands(file_name):
+    """
+    Reads a traffic matrix from a CSV file with the columns origin, destination and demand (Gbps), as for
+    capacity_planner.py. Demands between the same nodes are added up.
+
+    Args:
+        file_name (str): The CSV file.
+
+    Returns:
+        dict: (origin, destination) -> demand in Gbps.
+    """
+    demands = collections.Counter()
+    with open(file_name, newline="") as file:
+        for row in csv.DictReader(file):
+            demands[(row["origin"], row["destination"])] += float(row["demand"])
+    return dict(demands)
+
+
+def analyze(graph, demands, double=False, workers=None):
+    """
+    Evaluates every failure scenario of a topology in a pool of worker processes.
+
+    Args:
+        graph (NetworkX Graph): The topology, with weights 1/bandwidth.
+        demands (dict): (origin, destination) -> demand in Gbps.
+        double (bool, optional): Whether to evaluate the double failures too (default is False).
+        workers (int, optional): Number of worker processes (default is the number of CPUs).
+
+    Returns:
+        list: One result per scenario, most critical first: the failed elements, the unreachable pairs,
+              the mean and largest stretch, the largest link utilization and the overloaded links.
+    """
+    workers = workers or os.cpu_count() or 1
+    # A plain graph pickles faster than the network's, and the workers only read it
+    graph = nx.Graph(graph)
+    routes, loads = _baseline(graph, demands)
+    scenarios = failure_scenarios(graph, double)
+    # A few chunks per worker balance the load without a round trip per scenario
+    size = max(1, -(-len(scenarios) // (workers * 4)))
+    chunks = [scenarios[start:start + size] for start in range(0, len(scenarios), size)]
+    with concurrent.futures.ProcessPoolExecutor(workers, initializer=_start_worker,
+                                                initargs=(graph, demands, routes, loads)) as executor:
+        results = [result for chunk in executor.map(_evaluate_chunk, chunks) for result in chunk]
+    results.sort(key=lambda result: (-result["unreachable_pairs"], -len(result["overloaded_links"]),
+                                     -result["max_utilization"], -(result["mean_stretch"] or 0)))
+    return results
+
+
+def format_report(results, count=20):
+    """
+    Formats the most critical scenarios as a table.
+
+    Args:
+        results (list): The results, as returned by analyze.
+        count (int, optional): Number of scenarios listed (default is 20).
+
+    Returns:
+        str: The table.
+    """
+    lines = [f"{'rank':>4}  {'failed':<44} {'unreachable':>11} {'overloaded':>10} {'max util':>8} "
+             f"{'stretch':>7} {'max stretch':>11}"]
+    for rank, result in enumerate(results[:count], 1):
+        failed = ", ".join(name if kind == "node" else "-".join(name) for kind, name in result["failed"])
+        mean_stretch = f"{result['mean_stretch']:.3f}" if result["mean_stretch"] is not None else "-"
+        lines.append(f"{rank:>4}  {failed:<44} {result['unreachable_pairs']:>11} {len(result['overloaded_links']):>10} "
+                     f"{result['max_utilization']:>8.1%} {mean_stretch:>7} {result['max_stretch']:>11.2f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate every single, and optionally double, node and link "
+                                                 "failure, and rank them by criticality.")
+    parser.add_argument("--topology", help="a topology file written by topology.py (default is the embedded NSFNet)")
+    parser.add_argument("--double", action="store_true", help="also evaluate every pair of failures")
+    parser.add_argument("--demands", help="CSV file with the columns origin, destination and demand (Gbps) "
+                                          "(default is a uniform matrix)")
+    parser.add_argument("--utilization", type=float, default=0.5,
+                        help="utilization of the busiest link before any failure, for the uniform matrix "
+                             "(default 0.5)")
+    parser.add_argument("--workers", type=int, help="worker processes (default is the number of CPUs)")
+    parser.add_argument("--top", type=int, default=20, help="number of scenarios listed (default 20)")
+    parser.add_argument("--output", help="JSON file for the results of every scenario")
+    args = parser.parse_args()
+
+    if args.topology:
+        import topology
+        network = topology.load_topology(args.topology)
+    else:
+        from controllerserver import network
+    graph = network.graph
+    demands = read_demands(args.demands) if args.demands else uniform_demands(graph, args.utilization)
+    started = time.perf_counter()
+    results = analyze(graph, demands, args.double, args.workers)
+    print(f"Evaluated {len(results)} failure scenarios on {len(graph)} nodes and {graph.number_of_edges()} links "
+          f"in {time.perf_counter() - started:.2f} s.")
+    print(format_report(results, args.top))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+        print(f"Results written to {args.output}")
@@ -0,0 +1,187 @@
+"""
+API Documentation
+
+This module provides the phi-accrual failure detector that the controller uses for node liveness.
+
+Instead of declaring a node dead after a fixed silence, the detector learns the distribution of each
+node's heartbeat inter-arrival times (a sliding window, approximated by a normal distribution) and turns
+the time since the last heartbeat into a suspicion level phi = -log10(P(the next heartbeat is still to
+come)). A phi of 8 means the chance that the node is alive but late is about 1 in 10^8. Nodes that poll
+every 15 s are thus suspected a few seconds after a missed heartbeat, while nodes that poll every 30 s
+are not removed by mistake.
+
+Until a node has sent a few heartbeats, its history is seeded with first_interval, so a node that has
+just joined is judged as a node that polls every first_interval seconds.
+
+Classes:
+    PhiAccrualDetector:
+        Tracks heartbeats and computes suspicion levels.
+
+        Methods:
+            __init__(self, threshold: float = 8.0, window_size: int = 100, min_std: float = 1.0,
+                     first_interval: float = 15.0, min_interval: float = 1.0):
+                Initializes an empty detector.
+
+            heartbeat(self, name: str, now: float = None):
+                Records a heartbeat of a node.
+
+            phi(self, name: str, now: float = None) -> float:
+                Returns the suspicion level of a node.
+
+            suspects(self, now: float = None) -> list:
+                Returns the nodes whose suspicion level reached the threshold.
+
+            remove(self, name: str):
+                Forgets a node.
+
+            export_state(self) -> dict:
+                Returns the heartbeat history of every node, for a standby controller.
+
+            import_state(self, state: dict):
+                Replaces the heartbeat histories with exported ones.
+"""
+import collections
+import math
+import threading
+import time
+
+
+class _History:
+    def __init__(self, window_size, first_interval, intervals=None):
+        self.intervals = collections.deque(maxlen=window_size)
+        self.total = 0.0
+        self.squares = 0.0
+        self.last = None
+        # Seed the window as if the node had polled every first_interval seconds, with some jitter
+        for interval in intervals or (first_interval * 0.75, first_interval * 1.25):
+            self.add(interval)
+
+    def add(self, interval):
+        if len(self.intervals) == self.intervals.maxlen:
+            oldest = self.intervals[0]
+            self.total -= oldest
+            self.squares -= oldest * oldest
+        self.intervals.append(interval)
+        self.total += interval
+        self.squares += interval * interval
+
+    def mean_std(self):
+        count = len(self.intervals)
+        mean = self.total / count
+        return mean, math.sqrt(max(self.squares / count - mean * mean, 0.0))
+
+
+class PhiAccrualDetector:
+    def __init__(self, threshold=8.0, window_size=100, min_std=1.0, first_interval=15.0, min_interval=1.0):
+        """
+        Initializes an empty detector.
+
+        Args:
+            threshold (float, optional): Suspicion level at which a node is considered failed (default is 8.0).
+            window_size (int, optional): Number of recent inter-arrival times kept per node (default is 100).
+            min_std (float, optional): Lower bound of the standard deviation, in seconds, so that very
+                                       regular nodes are not suspected on the slightest delay (default is 1.0).
+            first_interval (float, optional): Heartbeat interval assumed for new nodes, in seconds
+                                              (default is 15.0).
+            min_interval (float, optional): Heartbeats closer than this to the previous one, such as the
+                                            request a node sends when it starts followed by its first poll,
+                                            only refresh the arrival time (default is 1.0).
+        """
+        self.threshold = threshold
+        self.window_size = window_size
+        self.min_std = min_std
+        self.first_interval = first_interval
+        self.min_interval = min_interval
+        self.histories = {}
+        self.lock = threading.Lock()
+
+    def heartbeat(self, name, now=None):
+        """
+        Records a heartbeat of a node.
+
+        Args:
+            name (str): The name of the node.
+            now (float, optional): The arrival time, from time.monotonic() (default is now).
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            history = self.histories.get(name)
+            if history is None:
+                history = self.histories[name] = _History(self.window_size, self.first_interval)
+            elif now - history.last >= self.min_interval:
+                history.add(now - history.last)
+            history.last = now
+
+    def _phi(self, history, now):
+        mean, std = history.mean_std()
+        y = (now - history.last - mean) / max(std, self.min_std)
+        # Logistic approximation of the normal CDF, accurate to about 1e-4
+        e = math.exp(-y * (1.5976 + 0.070566 * y * y))
+        if y > 0:
+            return -math.log10(e / (1.0 + e)) if e > 0 else math.inf
+        return -math.log10(1.0 - 1.0 / (1.0 + e))
+
+    def phi(self, name, now=None):
+        """
+        Returns the suspicion level of a node.
+
+        Args:
+            name (str): The name of the node.
+            now (float, optional): The current time, from time.monotonic() (default is now).
+
+        Returns:
+            float: The suspicion level, 0.0 if the node never sent a heartbeat.
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            history = self.histories.get(name)
+            return self._phi(history, now) if history is not None else 0.0
+
+    def suspects(self, now=None):
+        """
+        Returns the nodes whose suspicion level reached the threshold.
+
+        Args:
+            now (float, optional): The current time, from time.monotonic() (default is now).
+
+        Returns:
+            list: The names of the suspected nodes.
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            return [name for name, history in self.histories.items() if self._phi(history, now) >= self.threshold]
+
+    def remove(self, name):
+        """
+        Forgets a node, e.g. after it was removed from the topology. Its next heartbeat starts a new history.
+
+        Args:
+            name (str): The name of the node.
+        """
+        with self.lock:
+            self.histories.pop(name, None)
+
+    def export_state(self):
+        """
+        Returns the heartbeat history of every node. Arrival times are time.monotonic() values, which all
+        processes of a host share, so the history can be imported by another controller on the same host.
+
+        Returns:
+            dict: Node name -> [last arrival time, recent inter-arrival times].
+        """
+        with self.lock:
+            return {name: [history.last, list(history.intervals)] for name, history in self.histories.items()}
+
+    def import_state(self, state):
+        """
+        Replaces the heartbeat histories with exported ones.
+
+        Args:
+            state (dict): Histories returned by export_state.
+        """
+        histories = {}
+        for name, (last, intervals) in state.items():
+            histories[name] = _History(self.window_size, self.first_interval, intervals)
+            histories[name].last = last
+        with self.lock:
+            self.histories = histories
@@ -0,0 +1,94 @@
+"""
+API Documentation
+
+This module provides length-prefixed framing for long-lived TCP connections.
+
+Every frame is a 4-byte big-endian length followed by that many bytes. JSON frames carry a UTF-8
+encoded JSON object.
+
+Functions:
+    send_frame(sock: socket.socket, payload: bytes):
+        Sends one frame.
+
+    recv_frame(sock: socket.socket) -> bytes:
+        Receives one frame, or returns None if the connection was closed.
+
+    send_json(sock: socket.socket, message: dict):
+        Sends a JSON object as one frame.
+
+    recv_json(sock: socket.socket) -> dict:
+        Receives a JSON object, or returns None if the connection was closed.
+"""
+import json
+import struct
+
+LENGTH = struct.Struct(">I")
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+
+def _recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(min(size - len(data), 1 << 20))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+def send_frame(sock, payload):
+    """
+    Sends one frame.
+
+    Args:
+        sock (socket.socket): A connected socket.
+        payload (bytes): The frame content.
+    """
+    sock.sendall(LENGTH.pack(len(payload)) + payload)
+
+
+def recv_frame(sock):
+    """
+    Receives one frame.
+
+    Args:
+        sock (socket.socket): A connected socket.
+
+    Returns:
+        bytes or None: The frame content, or None if the connection was closed.
+
+    Raises:
+        ValueError: If the announced frame is larger than MAX_FRAME_SIZE.
+    """
+    header = _recv_exactly(sock, LENGTH.size)
+    if header is None:
+        return None
+    size = LENGTH.unpack(header)[0]
+    if size > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame of {size} bytes exceeds the limit of {MAX_FRAME_SIZE} bytes")
+    return _recv_exactly(sock, size)
+
+
+def send_json(sock, message):
+    """
+    Sends a JSON object as one frame.
+
+    Args:
+        sock (socket.socket): A connected socket.
+        message (dict): The object to send.
+    """
+    send_frame(sock, json.dumps(message, separators=(",", ":")).encode())
+
+
+def recv_json(sock):
+    """
+    Receives a JSON object sent with send_json.
+
+    Args:
+        sock (socket.socket): A connected socket.
+
+    Returns:
+        dict or None: The object, or None if the connection was closed.
+    """
+    payload = recv_frame(sock)
+    return json.loads(payload) if payload is not None else None
@@ -0,0 +1,378 @@
+"""
+API Documentation
+
+This module provides a non-interactive load generator for the network.
+
+Send requests are streamed from a JSONL file, one request per line:
+
+    {"origin": "10.0.0.1", "destination": "10.0.0.13", "type": "user_message",
+     "payload_size": 40, "count": 100, "rate": 50}
+
+    origin, destination (str): Node names. Messages are injected at the origin node's listen port.
+    type (str, optional): 'user_message' or 'audio_message' (default is 'user_message').
+    payload_size (int, optional): Size in bytes of a random payload (default is 32).
+    payload_file (str, optional): A file sent as payload instead of random bytes.
+    count (int, optional): Number of messages sent for this request (default is 1).
+    rate (float, optional): Messages per second for this request, 0 for unpaced (default is the --rate option).
+    stripe (bool, optional): Whether the chunks of every message are spread round-robin over the disjoint
+                             paths of the pair, as source routes (default is False). Needs --paths.
+
+Requests run concurrently: each is paced on its own schedule, and a single dispatcher sends the
+message that is due next, so a long paced request does not hold back the lines after it. The file is
+streamed: a request is read once fewer than max_active requests still have messages to send, and the
+payload of a message is built when the message is sent, so memory does not grow with the file. Payloads
+are encrypted in RSA sized chunks, as the clients do, and every chunk is sent over its own
+connection. The generator listens on the client ports of the destinations itself, so the receiving
+clients must not be running. A message is delivered when all of its chunks have arrived, and its
+end-to-end latency is measured from its first chunk being sent to its last chunk being received.
+Each delivery is also recorded in LoadGenerator.deliveries with its hop count. Striped requests take their
+paths from a table written by the controller with --protection-paths, or by path_protection.py.
+
+Classes:
+    LoadGenerator:
+        Dispatches messages concurrently and records their end-to-end latency.
+
+        Methods:
+            __init__(self, port_mapping: dict, public_key: rsa.PublicKey, in_flight: int = 16,
+                     timeout: float = 10.0, encrypt: bool = True, paths: PathTable = None,
+                     max_active: int = 1024):
+                Initializes the load generator.
+
+            run(self, requests: iterable, default_rate: float = 0) -> dict:
+                Sends all requests and returns the measured statistics.
+
+Functions:
+    load_requests(file_name: str) -> generator:
+        Yields the valid send requests of a JSONL file.
+
+    percentile(values: list, p: float) -> float:
+        Returns the p-th percentile of the values.
+
+    client_ports(port_mapping: dict) -> dict:
+        Returns the port of the receiving client attached to every node.
+"""
+import argparse
+import heapq
+import itertools
+import json
+import os
+import pickle
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import rsa
+from path_protection import PathTable
+
+CHUNK = 53  # Largest plaintext accepted by rsa.encrypt with the 512-bit network key
+NODE_PORT_BASE = 9010
+CLIENT_PORT_BASE = 7000
+
+
+def load_requests(file_name):
+    """
+    Yields the valid send requests of a JSONL file. Invalid lines are reported and skipped.
+
+    Args:
+        file_name (str): The JSONL file to read.
+
+    Yields:
+        dict: A send request.
+    """
+    with open(file_name, "r") as file:
+        for line_number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping line {line_number}: {e}")
+                continue
+            if not isinstance(request, dict) or "origin" not in request or "destination" not in request:
+                print(f"Skipping line {line_number}: origin and destination are required")
+                continue
+            yield request
+
+
+def percentile(values, p):
+    """
+    Returns the p-th percentile of the values, by linear interpolation.
+
+    Args:
+        values (list): The values.
+        p (float): The percentile, between 0 and 100.
+
+    Returns:
+        float or None: The percentile, or None if there are no values.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def client_ports(port_mapping):
+    """
+    Returns the port of the receiving client attached to every node. The node listening on 9010 + N
+    delivers to its client on 7000 + N, as the NSFNet nodes do. On topologies too large for that range,
+    whose client ports would reach the node ports, the remaining clients get the ports after the last
+    node port.
+
+    Args:
+        port_mapping (dict): Node listen ports keyed by node name.
+
+    Returns:
+        dict: Client ports keyed by node name.
+
+    Raises:
+        ValueError: If the client ports would not fit below 65536.
+    """
+    client_range = NODE_PORT_BASE - CLIENT_PORT_BASE
+    next_port = max(port_mapping.values(), default=NODE_PORT_BASE) + 1
+    ports = {}
+    for node_name, node_port in sorted(port_mapping.items(), key=lambda item: item[1]):
+        offset = node_port - NODE_PORT_BASE
+        if 0 <= offset < client_range:
+            ports[node_name] = CLIENT_PORT_BASE + offset
+        else:
+            ports[node_name] = next_port
+            next_port += 1
+    if ports and max(ports.values()) > 65535:
+        raise ValueError("Too many nodes for one host: client ports above 65535 would be needed.")
+    return ports
+
+
+class LoadGenerator:
+    def __init__(self, port_mapping, public_key, in_flight=16, timeout=10.0, encrypt=True, paths=None,
+                 max_active=1024):
+        """
+        Initializes the load generator.
+
+        Args:
+            port_mapping (dict): Node listen ports keyed by node name.
+            public_key (rsa.PublicKey): The public key used to encrypt the payloads.
+            in_flight (int, optional): Maximum number of concurrent connections (default is 16).
+            timeout (float, optional): Seconds to wait for outstanding messages after the last send
+                                       (default is 10.0).
+            encrypt (bool, optional): Whether payload chunks are RSA encrypted (default is True).
+            paths (PathTable, optional): The paths striped requests are spread over (default is none).
+            max_active (int, optional): Maximum number of requests sending concurrently; the next ones are
+                                        read as these finish (default is 1024).
+        """
+        self.port_mapping = port_mapping
+        self.public_key = public_key
+        self.in_flight = in_flight
+        self.timeout = timeout
+        self.encrypt = encrypt
+        self.paths = paths
+        self.max_active = max_active
+        self.client_ports = client_ports(port_mapping)
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._latencies = []
+        self._delivered_bytes = 0
+        self._errors = 0
+        self._listeners = {}
+        self._all_delivered = threading.Condition(self._lock)
+        self.deliveries = []
+
+    def run(self, requests, default_rate=0):
+        """
+        Sends all requests and waits for their delivery.
+
+        Args:
+            requests (iterable): Send requests, as yielded by load_requests. They are read as they are due.
+            default_rate (float, optional): Messages per second for requests without a rate, 0 for unpaced.
+
+        Returns:
+            dict: The number of sent, delivered and lost messages and failed sends, the duration, the
+                  throughput in messages/s and bytes/s and the p50/p95/p99 latency in seconds.
+        """
+        sent = 0
+        started = time.perf_counter()
+        # Every request is paced on its own: the heap holds the time its next message is due
+        due = []
+        order = itertools.count()
+        accepted = filter(self._accept_request, requests)
+        with ThreadPoolExecutor(max_workers=self.in_flight) as executor:
+            slots = threading.BoundedSemaphore(self.in_flight)
+            while True:
+                # Requests are read as the active ones finish, so the file is streamed rather than loaded
+                while len(due) < self.max_active:
+                    request = next(accepted, None)
+                    if request is None:
+                        break
+                    rate = request.get("rate", default_rate)
+                    heapq.heappush(due, (time.perf_counter(), next(order), request, int(request.get("count", 1)),
+                                         1 / rate if rate else 0.0))
+                if not due:
+                    break
+                send_time, _, request, count, interval = heapq.heappop(due)
+                delay = send_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                slots.acquire()
+                message_id = f"{os.getpid()}-{sent}"
+                sent += 1
+                future = executor.submit(self._send_request, request, message_id)
+                future.add_done_callback(lambda _: slots.release())
+                if count > 1:
+                    # Unpaced requests go back behind the messages already due, so they share the slots
+                    next_time = send_time + interval if interval else time.perf_counter()
+                    heapq.heappush(due, (next_time, next(order), request, count - 1, interval))
+        with self._lock:
+            self._all_delivered.wait_for(lambda: not self._pending, timeout=self.timeout)
+            lost = len(self._pending)
+            self._pending.clear()
+            latencies = list(self._latencies)
+            delivered_bytes = self._delivered_bytes
+            errors = self._errors
+        duration = time.perf_counter() - started
+        return {
+            "sent": sent,
+            "delivered": len(latencies),
+            "lost": lost,
+            "errors": errors,
+            "duration_s": duration,
+            "messages_per_s": len(latencies) / duration if duration else 0.0,
+            "bytes_per_s": delivered_bytes / duration if duration else 0.0,
+            "latency_p50_s": percentile(latencies, 50),
+            "latency_p95_s": percentile(latencies, 95),
+            "latency_p99_s": percentile(latencies, 99),
+        }
+
+    def _accept_request(self, request):
+        if request["origin"] not in self.port_mapping or request["destination"] not in self.port_mapping:
+            print(f"Skipping request with unknown node: {request}")
+            return False
+        if int(request.get("count", 1)) < 1:
+            return False
+        self._listen(request["destination"])
+        return True
+
+    def _send_request(self, request, message_id):
+        # The payload is built by the sending thread, so that reading a payload file does not delay the dispatcher
+        self._send(request, message_id, self._payload(request))
+
+    def _payload(self, request):
+        if "payload_file" in request:
+            with open(request["payload_file"], "rb") as file:
+                return file.read()
+        return os.urandom(int(request.get("payload_size", 32)))
+
+    def _send(self, request, message_id, payload):
+        chunks = [payload[i:i + CHUNK] for i in range(0, len(payload), CHUNK)] or [b""]
+        port = self.port_mapping[request["origin"]]
+        stripes = []
+        if request.get("stripe") and self.paths is not None:
+            stripes = self.paths.stripe_paths(request["origin"], request["destination"])
+        with self._lock:
+            self._pending[message_id] = [time.perf_counter(), len(chunks), request, len(payload)]
+        try:
+            for index, chunk in enumerate(chunks):
+                data = {
+                    "tipo": request.get("type", "user_message"),
+                    "origen": request["origin"],
+                    "destino": request["destination"],
+                    "mensaje": rsa.encrypt(chunk, self.public_key) if self.encrypt else chunk,
+                    "id": f"{message_id}:{index}",
+                    "saltos": 0
+                }
+                if stripes:
+                    data["ruta"] = stripes[index % len(stripes)]
+                client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                client_socket.connect(("localhost", port))
+                client_socket.sendall(pickle.dumps(data))
+                client_socket.close()
+        except Exception as e:
+            print(f"Error sending message {message_id}: {e}")
+            with self._lock:
+                self._errors += 1
+                self._pending.pop(message_id, None)
+                if not self._pending:
+                    self._all_delivered.notify_all()
+
+    def _listen(self, destination):
+        port = self.client_ports[destination]
+        if port in self._listeners:
+            return
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server_socket.bind(("localhost", port))
+        server_socket.listen(128)
+        self._listeners[port] = server_socket
+        threading.Thread(target=self._accept, args=(server_socket,), daemon=True).start()
+
+    def _accept(self, server_socket):
+        while True:
+            client_socket, _ = server_socket.accept()
+            threading.Thread(target=self._receive, args=(client_socket,), daemon=True).start()
+
+    def _receive(self, client_socket):
+        try:
+            data = b""
+            while True:
+                chunk = client_socket.recv(4096)
+                if not chunk:
+                    break
+                data += chunk
+            message = pickle.loads(data)
+            received = time.perf_counter()
+            message_id = message.get("id", "").rpartition(":")[0]
+            with self._lock:
+                entry = self._pending.get(message_id)
+                if entry is None:
+                    return
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._pending[message_id]
+                    request, size = entry[2], entry[3]
+                    self._latencies.append(received - entry[0])
+                    self._delivered_bytes += size
+                    self.deliveries.append({
+                        "origin": request["origin"],
+                        "destination": request["destination"],
+                        "type": request.get("type", "user_message"),
+                        "bytes": size,
+                        "hops": message.get("saltos"),
+                        "latency_s": received - entry[0]
+                    })
+                    if not self._pending:
+                        self._all_delivered.notify_all()
+        except Exception as e:
+            print(f"Error receiving message: {e}")
+        finally:
+            client_socket.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the network with send requests from a JSONL file.")
+    parser.add_argument("requests_file", nargs="?", default="requests.jsonl", help="JSONL file with send requests")
+    parser.add_argument("--in-flight", type=int, default=16, help="maximum number of concurrent connections")
+    parser.add_argument("--rate", type=float, default=0, help="default messages/s per request, 0 for unpaced")
+    parser.add_argument("--max-active", type=int, default=1024,
+                        help="maximum number of requests sending concurrently, the next ones are read as these finish")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds to wait for outstanding messages")
+    parser.add_argument("--no-encrypt", action="store_true", help="send payload chunks unencrypted")
+    parser.add_argument("--paths", help="path table for striped requests, e.g. protection_paths.npz")
+    parser.add_argument("--output", help="write the statistics to this JSON file")
+    args = parser.parse_args()
+
+    with open("port_mapping.json", "r") as file:
+        port_mapping = json.load(file)
+    with open("pub_key.txt", "rb") as file:
+        public_key = pickle.load(file)
+
+    paths = PathTable.load(args.paths) if args.paths else None
+    generator = LoadGenerator(port_mapping, public_key, args.in_flight, args.timeout, not args.no_encrypt, paths,
+                              args.max_active)
+    stats = generator.run(load_requests(args.requests_file), args.rate)
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(stats, file, indent=4)
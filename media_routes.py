@@ -0,0 +1,58 @@
+"""
+API Documentation
+
+This module provides the per-message-type routes of media traffic.
+
+Audio and video streams need bandwidth more than a short path, so the controller can compute, next to
+the routing tables of its algorithm, widest-path routes: the paths whose narrowest link has the greatest
+bandwidth (see dijkstra_paths.widest_path_tree). They are stored in the same routing tables, under the
+destination name prefixed with MEDIA_PREFIX, so they are versioned, diffed, pushed, replicated and
+persisted with the other entries. Nodes forward the messages of MEDIA_TYPES over these entries, and over
+the regular entry of the destination when the table has no media entry for it.
+
+Functions:
+    add_media_routes(routing_tables: dict, media_tables: dict) -> dict:
+        Adds media entries to routing tables.
+
+    media_route(routing_table: dict, destination: str, message_type: str) -> list:
+        Returns the media entry of a destination for a message of a media type.
+"""
+
+MEDIA_TYPES = frozenset({"audio_message", "video_message"})
+MEDIA_PREFIX = "media:"
+
+
+def add_media_routes(routing_tables, media_tables):
+    """
+    Adds media entries to routing tables, in place. Sources without a routing table are ignored.
+
+    Args:
+        routing_tables (dict): Source name -> {destination name -> path}.
+        media_tables (dict): Source name -> {destination name -> widest path}.
+
+    Returns:
+        dict: The routing tables.
+    """
+    for source, paths in media_tables.items():
+        table = routing_tables.get(source)
+        if table is not None:
+            table.update((MEDIA_PREFIX + destination, path) for destination, path in paths.items())
+    return routing_tables
+
+
+def media_route(routing_table, destination, message_type):
+    """
+    Returns the media entry of a destination, for a message of a media type.
+
+    Args:
+        routing_table (dict): A node's routing table.
+        destination (str): The name of the destination node.
+        message_type (str): The type of the message, e.g. 'audio_message'.
+
+    Returns:
+        list or None: The path of the media entry, or None if the message is not media or the table has no
+                      media entry for the destination.
+    """
+    if message_type not in MEDIA_TYPES or not routing_table:
+        return None
+    return routing_table.get(MEDIA_PREFIX + destination)
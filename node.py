@@ -7,10 +7,11 @@ Attributes:
     node_id (int): The ID of the node.
     name (str): The name of the node.
     node_type (str): The type of the node, default is 'router'.
+    area (int): The routing area of the node, default is 0.
 
 Methods:
-    __init__(node_id, name, node_type='router'):
-        Initializes a Node object with the specified ID, name, and optional node type.
+    __init__(node_id, name, node_type='router', area=0):
+        Initializes a Node object with the specified ID, name, and optional node type and area.
 
     __repr__():
         Returns a string representation of the Node object.
@@ -18,17 +19,19 @@ Methods:
 
 class Node:
     """
-    Initializes a Node object with the specified ID, name, and optional node type.
+    Initializes a Node object with the specified ID, name, and optional node type and area.
 
     Args:
         node_id (int): The ID of the node.
         name (str): The name of the node.
         node_type (str, optional): The type of the node (default is 'router').
+        area (int, optional): The routing area of the node (default is 0).
     """
-    def __init__(self, node_id, name, node_type='router'):
+    def __init__(self, node_id, name, node_type='router', area=0):
         self.node_id = node_id
         self.name = name
         self.node_type = node_type
+        self.area = area
 
     def __repr__(self):
         """
@@ -10,6 +10,13 @@ Attributes:
     listen_port (int): The port on which the node listens for incoming connections.
     outgoing_ports (list): List of outgoing ports for connecting to other nodes.
     routing_table (dict): Dictionary representing the routing table of the node.
+    snapshot (TopologySnapshot): Memory-mapped routing snapshot, if one was loaded.
+    shared_routes (SharedRoutingReader): Shared memory routing tables, if attached.
+    session_port (int): The port of the controller's session server.
+    table_version (int): Version of the routing table received from the controller.
+    session_key (bytes): Key authenticating heartbeats to the controller, None before the handshake.
+    heartbeat_counter (int): Counter of the last heartbeat sent with the session key.
+    link_load (LinkLoadMeter): Traffic sent to each neighbor, reported to the controller with the heartbeats.
     client_port (int): The port for connecting to the client.
 
 Methods:
@@ -36,19 +43,60 @@ Methods:
     connect_to_node(destination_node_name, position, message):
         Connects to a destination node and sends a message.
 
-    handle_user_message(message_type, origin_node, destination_node, user_message):
+    handle_user_message(message_type, origin_node, destination_node, user_message, message_id=None, hops=None,
+                        route=None):
         Handles a user message by printing it and routing it to the destination node.
 
     route_message(destination_node_name, message):
-        Routes a message to the destination node based on the routing table.
+        Routes a message to the destination node based on its source route or the routing table, switching
+        to the protection path of the destination if the next hop does not answer.
+
+    send_to_neighbor(neighbor, port, message):
+        Sends a message to a neighbor, counting it in the link load.
+
+    load_snapshot(file_name):
+        Reads routes from a binary snapshot written by the controller instead of the fetched routing table.
+
+    refresh_snapshot():
+        Maps the snapshot file again if the controller has replaced it.
+
+    attach_shared_routes(segment_name):
+        Reads routes from, and writes heartbeats to, the controller's shared memory segment.
+
+    open_session():
+        Opens a persistent, authenticated session with the controller.
+
+    receive_updates(session_socket):
+        Applies the routing tables and deltas pushed by the controller over a session.
+
+    apply_table_update(update):
+        Applies a full routing table, a diff or a "not modified" reply from the controller.
+
+    run_session(interval):
+        Sends heartbeats over the session forever, reopening it when it is lost.
+
+    next_hop(destination_node_name, message_type=None):
+        Returns the next hop towards a destination node, through the summary entry of its area if the
+        routing table has no entry for the node itself, and over the widest path for media messages.
 
 """
+import argparse
+import os
 import socket
 import json
 import threading
 import time
 import pickle
 import rsa
+import framing
+import session_auth
+from areas import summary_route
+from media_routes import media_route
+from path_protection import protection_route
+from shared_routes import SharedRoutingReader
+from sharding import shard_port
+from snapshot import TopologySnapshot
+from traffic_engineering import LinkLoadMeter
 
 file_pri = open('pri_key.txt', 'rb')
 private_key = pickle.load(file_pri)
@@ -77,6 +125,16 @@ class TCPNode:
         self.outgoing_ports = outgoing_ports
         self.routing_table = None
         self.client_port = client_port
+        self.snapshot = None
+        self._snapshot_checked = 0
+        self._snapshot_stat = None
+        self.shared_routes = None
+        self.session_port = server_port + 1
+        self.session_socket = None
+        self.table_version = None
+        self.session_key = None
+        self.heartbeat_counter = 0
+        self.link_load = LinkLoadMeter()
         with open("port_mapping.json", "r") as file:
             self.port_mapping = json.load(file)
 
@@ -85,8 +143,11 @@ class TCPNode:
         Starts the node by initiating the server socket and connecting to the server.
         """
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # A node restarted right after its previous run must not fail on the port's TIME_WAIT connections
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.server_socket.bind(("localhost", self.listen_port))
-        self.server_socket.listen(5)
+        # A burst of message chunks must not overflow the accept queue, whose dropped connections wait 1 s
+        self.server_socket.listen(128)
         print(f"Node {self.node_name} listening on port {self.listen_port}...")
 
         self.connect_to_server()
@@ -102,20 +163,56 @@ class TCPNode:
 
     def connect_to_server(self):
         """
-        Connects to the server to obtain the routing table.
+        Connects to the server to obtain the routing table. The first request performs the RSA handshake
+        that registers a session key; later requests are heartbeats authenticated with that key. When
+        attached to the controller's shared memory, only a heartbeat is written there instead.
         """
 
-        try:
-            client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            client_socket.connect((self.server_host, self.server_port))
-            encrypted_node_name = rsa.encrypt(self.node_name.encode(), public_key)
-            client_socket.sendall(encrypted_node_name)
-            routing_table_json = client_socket.recv(4096).decode()
-            self.routing_table = json.loads(routing_table_json)
-            client_socket.close()
-            print(f"ACK received from controller :", self.routing_table)
-        except Exception as e:
-            print(f"Error while connecting to server: {e}")
+        if self.shared_routes is not None:
+            self.shared_routes.heartbeat()
+            return
+        # An error reply is followed by one retry: the handshake again, at the shard the controller named
+        for attempt in range(2):
+            try:
+                client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                client_socket.connect((self.server_host, self.server_port))
+                # Report the table version we have, so the controller only sends what changed since
+                version = self.table_version if self.table_version is not None else -1
+                session_key = None
+                if self.session_key is None:
+                    session_key = session_auth.new_session_key()
+                    request = session_auth.handshake_request(self.node_name, session_key, version, public_key)
+                else:
+                    self.heartbeat_counter += 1
+                    request = session_auth.heartbeat_request(self.node_name, self.session_key, self.heartbeat_counter,
+                                                             version, report=self.link_load.report())
+                client_socket.sendall(request)
+                chunks = []
+                while True:
+                    chunk = client_socket.recv(65536)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                client_socket.close()
+                reply = json.loads(b"".join(chunks))
+            except Exception as e:
+                print(f"Error while connecting to server: {e}")
+                return
+            if "error" not in reply:
+                if session_key is not None:
+                    # Heartbeats are signed with a key bound to the nonce the controller answered the handshake with
+                    self.session_key = session_auth.session_mac_key(session_key, bytes.fromhex(reply["nonce"]))
+                    self.heartbeat_counter = 0
+                self.apply_table_update(reply)
+                return
+            print(f"Controller rejected the request: {reply['error']}")
+            # The controller lost our session key, e.g. after a restart, or another shard owns this node
+            self.session_key = None
+            if reply["error"] == "wrong shard":
+                self.server_port = reply["port"]
+                self.session_port = self.server_port + 1
+        print(f"Error: the controller on port {self.server_port} rejected node {self.node_name} again "
+              f"({reply['error']}), check the --shards setting of the node and the controller.")
 
     def accept_connections(self):
         """
@@ -144,8 +241,12 @@ class TCPNode:
             origin_node = message_data.get("origen")
             destination_node = message_data.get("destino")
             user_message = message_data.get("mensaje")
+            message_id = message_data.get("id")
+            hops = message_data.get("saltos")
+            route = message_data.get("ruta")
 
-            self.handle_user_message(message_type, origin_node, destination_node, user_message)
+            self.handle_user_message(message_type, origin_node, destination_node, user_message, message_id, hops,
+                                     route)
 
         except Exception as e:
             print(f"Error handling client: {e}")
@@ -171,7 +272,8 @@ class TCPNode:
         except Exception as e:
             print(f"Error while connecting to node {destination_node_name} on port {self.outgoing_ports[position]}: {e}")
 
-    def handle_user_message(self, message_type, origin_node, destination_node, user_message):
+    def handle_user_message(self, message_type, origin_node, destination_node, user_message, message_id=None,
+                            hops=None, route=None):
         """
         Handles user messages.
 
@@ -180,41 +282,217 @@ class TCPNode:
             origin_node (str): The origin node of the message.
             destination_node (str): The destination node of the message.
             user_message (str): The user message.
+            message_id (str, optional): An identifier set by the sender, forwarded unchanged to the destination.
+            hops (int, optional): The number of links traversed so far, counted only if the sender set it.
+            route (list, optional): The path the message follows instead of the routing tables, if the sender
+                                    or a node that switched to a protection path set it.
         """
         print(f"Received user message from {origin_node} to {destination_node}: {user_message}")
 
-        self.route_message(destination_node, {
+        message = {
             "tipo": message_type,
             "origen": origin_node,
             "destino": destination_node,
             "mensaje": user_message
-        })
+        }
+        if message_id is not None:
+            message["id"] = message_id
+        if hops is not None:
+            message["saltos"] = hops
+        if route is not None:
+            message["ruta"] = route
+        self.route_message(destination_node, message)
+
+    def load_snapshot(self, file_name):
+        """
+        Reads routes from a binary snapshot written by the controller. The file is memory-mapped, so
+        nodes on the same host share it, and it is mapped again whenever the controller replaces it.
+
+        Args:
+            file_name (str): The snapshot file.
+        """
+        stat = os.stat(file_name)
+        snapshot = TopologySnapshot(file_name)
+        if snapshot.next_hops is None:
+            print(f"Snapshot {file_name} has no routing tables.")
+        self.snapshot, self._snapshot_stat = snapshot, (stat.st_ino, stat.st_mtime_ns)
+        print(f"Node {self.node_name} mapped routing snapshot {file_name}")
+
+    def refresh_snapshot(self):
+        """
+        Maps the snapshot file again if the controller has replaced it. Checked at most once per second.
+        """
+        if self.snapshot is None or time.monotonic() - self._snapshot_checked < 1:
+            return
+        self._snapshot_checked = time.monotonic()
+        try:
+            stat = os.stat(self.snapshot.file_name)
+            if (stat.st_ino, stat.st_mtime_ns) != self._snapshot_stat:
+                self.load_snapshot(self.snapshot.file_name)
+        except Exception as e:
+            print(f"Error refreshing snapshot: {e}")
+
+    def attach_shared_routes(self, segment_name):
+        """
+        Reads routes from, and writes heartbeats to, the controller's shared memory segment instead of
+        fetching the routing table over TCP.
+
+        Args:
+            segment_name (str): The name of the segment published by the controller.
+        """
+        try:
+            self.shared_routes = SharedRoutingReader(self.node_name, segment_name)
+            print(f"Node {self.node_name} attached to shared routing tables {segment_name}")
+        except (FileNotFoundError, KeyError) as e:
+            print(f"Shared routing tables unavailable, using the controller over TCP: {e}")
+
+    def open_session(self):
+        """
+        Opens a persistent session with the controller. The node authenticates once with its RSA encrypted
+        name; afterwards heartbeats go upstream and routing table updates are pushed downstream.
+        """
+        session_socket = socket.create_connection((self.server_host, self.session_port))
+        framing.send_frame(session_socket, rsa.encrypt(self.node_name.encode(), public_key))
+        self.session_socket = session_socket
+        threading.Thread(target=self.receive_updates, args=(session_socket,), daemon=True).start()
+        print(f"Node {self.node_name} opened a session with the controller")
+
+    def receive_updates(self, session_socket):
+        """
+        Applies the routing tables and deltas pushed by the controller over a session.
+
+        Args:
+            session_socket (socket.socket): The session socket.
+        """
+        try:
+            while True:
+                message = framing.recv_json(session_socket)
+                if message is None:
+                    break
+                self.apply_table_update(message)
+        except Exception as e:
+            print(f"Error receiving updates: {e}")
+        finally:
+            session_socket.close()
+            if self.session_socket is session_socket:
+                self.session_socket = None
+
+    def apply_table_update(self, update):
+        """
+        Applies a routing table update from the controller.
+
+        Args:
+            update (dict): The new version with either the full "table", the "changes" since the version we
+                           have (destination -> path, None for removed destinations) or "not_modified".
+        """
+        if "table" in update:
+            self.routing_table = update["table"]
+        elif "changes" in update:
+            # Build a new table so that messages being routed never see a half applied diff
+            routing_table = dict(self.routing_table or {})
+            for destination, path in update["changes"].items():
+                if path is None:
+                    routing_table.pop(destination, None)
+                else:
+                    routing_table[destination] = path
+            self.routing_table = routing_table
+        self.table_version = update["version"]
+        if "not_modified" not in update:
+            print(f"Routing table version {self.table_version} received from controller")
+
+    def run_session(self, interval):
+        """
+        Sends heartbeats over the session forever, reopening it when it is lost.
+
+        Args:
+            interval (float): Seconds between heartbeats.
+        """
+        while True:
+            try:
+                if self.session_socket is None:
+                    self.open_session()
+                framing.send_json(self.session_socket, {"type": "heartbeat", "load": self.link_load.report()})
+            except Exception as e:
+                print(f"Error in session with controller: {e}")
+                if self.session_socket is not None:
+                    self.session_socket.close()
+                self.session_socket = None
+            time.sleep(interval)
+
+    def next_hop(self, destination_node_name, message_type=None):
+        """
+        Returns the next hop towards a destination node, from the shared memory tables or the snapshot if
+        one is attached and has a route, otherwise from the routing table. Destinations in another area
+        are routed through the longest matching summary prefix of the table (see areas.py). Audio and
+        video messages take the media entry of the routing table if the controller sent one (see
+        media_routes.py).
+
+        Args:
+            destination_node_name (str): The name of the destination node.
+            message_type (str, optional): The type of the message routed, e.g. 'audio_message'.
+
+        Returns:
+            str or None: The name of the next hop, the node itself if it is the destination, or None if
+                         there is no route.
+        """
+        path_to_destination = media_route(self.routing_table, destination_node_name, message_type)
+        if path_to_destination is not None:
+            return path_to_destination[1] if len(path_to_destination) > 1 else path_to_destination[0]
+        if self.shared_routes is not None:
+            next_hop = self.shared_routes.next_hop(destination_node_name)
+            if next_hop is not None:
+                return next_hop
+        if self.snapshot is not None:
+            self.refresh_snapshot()
+            next_hop = self.snapshot.next_hop(self.node_name, destination_node_name)
+            if next_hop is not None:
+                return next_hop
+        if not self.routing_table:
+            return None
+        path_to_destination = self.routing_table.get(destination_node_name)
+        if path_to_destination is None:
+            path_to_destination = summary_route(self.routing_table, destination_node_name)
+            if path_to_destination is None:
+                return None
+        return path_to_destination[1] if len(path_to_destination) > 1 else path_to_destination[0]
 
     def route_message(self, destination_node_name, message):
         """
-        Routes a message to a destination node.
+        Routes a message to a destination node, along its source route if it has one that goes through this
+        node. If the next hop does not answer and the controller sent a protection path that avoids it (see
+        path_protection.py), the message is sent along that path instead, as its source route.
 
         Args:
             destination_node_name (str): The name of the destination node.
             message (dict): The message to route.
         """
-        if destination_node_name in self.routing_table:
-
-            path_to_destination = self.routing_table[destination_node_name]
+        route = message.get("ruta")
+        if route and self.node_name in route[:-1]:
+            next_hop = route[route.index(self.node_name) + 1]
+        else:
+            next_hop = self.next_hop(destination_node_name, message.get("tipo"))
 
-            if len(path_to_destination) > 1:
+        if next_hop is not None:
 
-                next_hop = path_to_destination[1]
+            if next_hop != self.node_name:
 
-                next_hop_port = self.port_mapping[next_hop]
+                next_hop_port = self.port_mapping.get(next_hop)
 
                 if next_hop_port is not None:
 
-                    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    client_socket.connect(("localhost", next_hop_port))
-
-
-                    client_socket.sendall(pickle.dumps(message))
+                    if "saltos" in message:
+                        message["saltos"] += 1
+                    try:
+                        self.send_to_neighbor(next_hop, next_hop_port, message)
+                    except OSError as e:
+                        protection = protection_route(self.routing_table, destination_node_name, next_hop)
+                        if protection is None or self.port_mapping.get(protection[1]) is None:
+                            raise
+                        print(f"Next hop {next_hop} unreachable ({e}), node {self.node_name} switches to the "
+                              f"protection path {protection}")
+                        message["ruta"] = protection
+                        next_hop = protection[1]
+                        self.send_to_neighbor(next_hop, self.port_mapping[next_hop], message)
 
                     print(f"Node {self.node_name} routed message to {destination_node_name} via {next_hop}")
 
@@ -232,6 +510,24 @@ class TCPNode:
         else:
             print(f"No route found to {destination_node_name}")
 
+    def send_to_neighbor(self, neighbor, port, message):
+        """
+        Sends a message to a neighbor, counting it in the link load.
+
+        Args:
+            neighbor (str): The name of the neighbor.
+            port (int): The port the neighbor listens on.
+            message (dict): The message to send.
+
+        Raises:
+            OSError: If the neighbor cannot be reached.
+        """
+        payload = pickle.dumps(message)
+        with self.link_load.sending(neighbor, len(payload)):
+            client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            client_socket.connect(("localhost", port))
+            client_socket.sendall(payload)
+
 # Example of use
 if __name__ == "__main__":
     node_name = "10.0.0.10"
@@ -240,8 +536,24 @@ if __name__ == "__main__":
     server_port = 8000
     listen_port = 9020
     outgoing_ports = [9011, 9012, 9014]
+    parser = argparse.ArgumentParser(description=f"Run node {node_name}.")
+    parser.add_argument("--snapshot", help="read routes from a binary snapshot written by the controller")
+    parser.add_argument("--shared-memory", nargs="?", const="nsfnet_routes", metavar="SEGMENT",
+                        help="read routes from the controller's shared memory segment instead of over TCP")
+    parser.add_argument("--session", action="store_true",
+                        help="keep a persistent session with the controller and receive pushed updates")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="number of controller shards, to connect to the one that owns this node")
+    args = parser.parse_args()
+    server_port = shard_port(node_name, args.shards, server_port)
     node = TCPNode(node_name, server_host, server_port, listen_port, outgoing_ports)
+    if args.snapshot:
+        node.load_snapshot(args.snapshot)
+    if args.shared_memory:
+        node.attach_shared_routes(args.shared_memory)
     node.start()
+    if args.session:
+        node.run_session(15)
 
     while True:
         node.connect_to_server()
@@ -0,0 +1,718 @@
+"""
+API Documentation
+
+This module precomputes alternative paths between every pair of nodes, for protection routing and for
+clients that stripe their traffic over several paths.
+
+For every source and destination it computes the k shortest loopless paths, with Yen's algorithm, and
+the pair of node-disjoint paths of least total weight, with Suurballe's algorithm: a shortest path, then
+a shortest path in the residual graph with reduced weights in which every node is split into an entry
+and an exit joined by one arc, so that the two paths cannot share a node. The arcs that the second
+path takes backwards along the first cancel out, and what remains splits into the two disjoint paths.
+There is no disjoint pair when a single node cuts the destination off from the source.
+
+Sources are spread over a pool of worker processes. Paths are stored as node indexes in flat int32
+arrays, with int64 offsets per path and per pair (see PathSet), about 4 bytes per hop instead of a list
+of names per path. Before computing, the size of the table is estimated from the shortest paths of a
+few sources, and k is lowered to fit the memory budget.
+
+The topology is undirected, so the k shortest paths of a pair are searched from the destination back to
+the source, every spur path being an A* search guided by the distances from the source, which the first
+Dijkstra of the source gives for every destination. Both algorithms work on node indexes rather than on
+the NetworkX graph. Suurballe's residual search still visits most of the topology for every pair, so a
+table of a few hundred nodes takes minutes of CPU: this is meant for backbone topologies.
+
+PathCache keeps the table of the latest topology version for the controller, which adds a protection
+path per destination to the routing tables (see add_protection_routes) and can write the table to a file
+for clients (see PathTable.save and loadgen.py). The controller computes the table in the background
+(see PathCache.compute_async), so that its routing tables are not held up by it: until the table of the
+new version is ready, the paths of the previous one are used, but for those over links that are gone.
+A node whose next hop does not answer sends the message along its protection path, as a source route in
+the message.
+
+Classes:
+    PathSet:
+        Paths of every pair of nodes, in flat arrays.
+
+        Methods:
+            __init__(self, nodes: numpy.ndarray, path_offsets: numpy.ndarray, pair_offsets: numpy.ndarray):
+                Wraps the arrays.
+
+            paths(self, source: int, destination: int) -> list:
+                Returns the paths of a pair, as lists of node indexes.
+
+    PathTable:
+        The k shortest paths and the disjoint pair of every pair of nodes.
+
+        Methods:
+            __init__(self, names: list, k: int, shortest: PathSet, disjoint: PathSet, version: int = None):
+                Wraps the path sets.
+
+            shortest_paths(self, source: str, destination: str) -> list:
+                Returns the k shortest paths between two nodes.
+
+            disjoint_paths(self, source: str, destination: str) -> list:
+                Returns the disjoint pair between two nodes.
+
+            stripe_paths(self, source: str, destination: str) -> list:
+                Returns the paths to stripe traffic over.
+
+            nbytes(self) -> int:
+                Returns the memory used by the path arrays.
+
+            save(self, file_name: str):
+                Writes the table to a NumPy file.
+
+            load(file_name: str) -> PathTable:
+                Reads a table written by save (static method).
+
+    PathCache:
+        Keeps the path table of the latest topology version.
+
+        Methods:
+            __init__(self, k: int = 3, workers: int = None, memory_budget: int = 268435456,
+                     file_name: str = None):
+                Initializes the cache.
+
+            get(self, topology_snapshot: NetworkSnapshot, sources: list = None) -> PathTable:
+                Returns the table of a topology version, computing it if needed.
+
+            compute_async(self, topology_snapshot: NetworkSnapshot, sources: list = None, done: callable = None):
+                Computes the table of a topology version in a background thread.
+
+Functions:
+    disjoint_paths(graph: NetworkX Graph, source: str, destination: str) -> list:
+        Returns the pair of node-disjoint paths of least total weight between two nodes.
+
+    compute_paths(graph: NetworkX Graph, k: int = 3, sources: list = None, workers: int = None,
+                  memory_budget: int = 268435456, executor: Executor = None) -> PathTable:
+        Computes the path table of a topology.
+
+    add_protection_routes(routing_tables: dict, path_table: PathTable, graph: NetworkX Graph = None) -> dict:
+        Adds a protection path per destination to routing tables.
+
+    protection_route(routing_table: dict, destination: str, failed_hop: str) -> list:
+        Returns the protection path of a destination, if it avoids a failed next hop.
+"""
+import argparse
+import collections
+import concurrent.futures
+import heapq
+import itertools
+import math
+import multiprocessing
+import os
+import threading
+import time
+import networkx as nx
+import numpy as np
+
+PROTECTION_PREFIX = "protect:"
+SAMPLE_SOURCES = 8  # Sources whose shortest paths estimate the size of a table
+
+
+class PathSet:
+    def __init__(self, nodes, path_offsets, pair_offsets):
+        """
+        Wraps the arrays of a path set. The paths of the pair (source, destination), for n nodes, are the
+        paths pair_offsets[source * n + destination] to pair_offsets[source * n + destination + 1] - 1, and
+        path i holds the nodes nodes[path_offsets[i]:path_offsets[i + 1]].
+
+        Args:
+            nodes (numpy.ndarray): Node indexes of all paths, int32.
+            path_offsets (numpy.ndarray): Start of every path in nodes, and the end of the last one, int64.
+            pair_offsets (numpy.ndarray): First path of every pair, and the end of the last one, int64.
+        """
+        self.nodes = nodes
+        self.path_offsets = path_offsets
+        self.pair_offsets = pair_offsets
+        self.node_count = math.isqrt(len(pair_offsets) - 1)
+
+    def paths(self, source, destination):
+        """
+        Returns the paths of a pair.
+
+        Args:
+            source (int): Index of the source.
+            destination (int): Index of the destination.
+
+        Returns:
+            list: The paths, as lists of node indexes.
+        """
+        pair = source * self.node_count + destination
+        first, last = self.pair_offsets[pair], self.pair_offsets[pair + 1]
+        return [self.nodes[self.path_offsets[path]:self.path_offsets[path + 1]].tolist()
+                for path in range(first, last)]
+
+
+class PathTable:
+    def __init__(self, names, k, shortest, disjoint, version=None):
+        """
+        Wraps the path sets of a topology.
+
+        Args:
+            names (list): Node names, by index.
+            k (int): Number of shortest paths computed per pair.
+            shortest (PathSet): The k shortest paths of every pair, shortest first.
+            disjoint (PathSet): The disjoint pair of every pair, shorter first, or no path if there is none.
+            version (int, optional): The topology version the paths were computed for.
+        """
+        self.names = names
+        self.index = {name: position for position, name in enumerate(names)}
+        self.k = k
+        self.shortest = shortest
+        self.disjoint = disjoint
+        self.version = version
+
+    def _named(self, path_set, source, destination):
+        if source not in self.index or destination not in self.index:
+            return []
+        return [[self.names[node] for node in path]
+                for path in path_set.paths(self.index[source], self.index[destination])]
+
+    def shortest_paths(self, source, destination):
+        """
+        Returns the k shortest loopless paths between two nodes.
+
+        Args:
+            source (str): The name of the source.
+            destination (str): The name of the destination.
+
+        Returns:
+            list: The paths, lists of node names, shortest first; empty for unknown nodes.
+        """
+        return self._named(self.shortest, source, destination)
+
+    def disjoint_paths(self, source, destination):
+        """
+        Returns the pair of node-disjoint paths of least total weight between two nodes.
+
+        Args:
+            source (str): The name of the source.
+            destination (str): The name of the destination.
+
+        Returns:
+            list: The two paths, lists of node names, or an empty list if there is no disjoint pair.
+        """
+        return self._named(self.disjoint, source, destination)
+
+    def stripe_paths(self, source, destination):
+        """
+        Returns the paths to stripe traffic over: the disjoint pair, so that one failure only hits one
+        stripe, or the k shortest paths if there is no disjoint pair.
+
+        Args:
+            source (str): The name of the source.
+            destination (str): The name of the destination.
+
+        Returns:
+            list: The paths, lists of node names.
+        """
+        return self.disjoint_paths(source, destination) or self.shortest_paths(source, destination)
+
+    def nbytes(self):
+        """
+        Returns the memory used by the path arrays.
+
+        Returns:
+            int: The size in bytes.
+        """
+        return sum(array.nbytes for path_set in (self.shortest, self.disjoint)
+                   for array in (path_set.nodes, path_set.path_offsets, path_set.pair_offsets))
+
+    def save(self, file_name):
+        """
+        Writes the table to a NumPy file, atomically.
+
+        Args:
+            file_name (str): The file to write, ending in .npz.
+        """
+        temp_file = f"{file_name}.{os.getpid()}.tmp.npz"
+        np.savez(temp_file, names=np.array(self.names), k=self.k,
+                 version=-1 if self.version is None else self.version,
+                 shortest_nodes=self.shortest.nodes, shortest_paths=self.shortest.path_offsets,
+                 shortest_pairs=self.shortest.pair_offsets, disjoint_nodes=self.disjoint.nodes,
+                 disjoint_paths=self.disjoint.path_offsets, disjoint_pairs=self.disjoint.pair_offsets)
+        os.replace(temp_file, file_name)
+
+    @staticmethod
+    def load(file_name):
+        """
+        Reads a table written by save.
+
+        Args:
+            file_name (str): The file.
+
+        Returns:
+            PathTable: The table.
+        """
+        with np.load(file_name) as data:
+            version = int(data["version"])
+            return PathTable(data["names"].tolist(), int(data["k"]),
+                             PathSet(data["shortest_nodes"], data["shortest_paths"], data["shortest_pairs"]),
+                             PathSet(data["disjoint_nodes"], data["disjoint_paths"], data["disjoint_pairs"]),
+                             None if version < 0 else version)
+
+
+def _adjacency(graph):
+    names = list(graph)
+    index = {name: position for position, name in enumerate(names)}
+    adjacency = [{index[neighbor]: data["weight"] for neighbor, data in graph[name].items()} for name in names]
+    return names, index, adjacency
+
+
+def _split_dijkstra(adjacency, source):
+    # Shortest paths from the exit of a source in the graph whose node i is split into the entry 2i and the
+    # exit 2i + 1, joined by an arc of weight 0
+    distances = [math.inf] * (2 * len(adjacency))
+    parents = [-1] * (2 * len(adjacency))
+    distances[2 * source + 1] = 0.0
+    heap = [(0.0, 2 * source + 1)]
+    while heap:
+        distance, node = heapq.heappop(heap)
+        if distance > distances[node]:
+            continue
+        if node % 2 == 0:
+            arcs = ((node + 1, 0.0),)
+        else:
+            arcs = ((2 * neighbor, weight) for neighbor, weight in adjacency[node // 2].items())
+        for head, weight in arcs:
+            if distance + weight < distances[head]:
+                distances[head] = distance + weight
+                parents[head] = node
+                heapq.heappush(heap, (distance + weight, head))
+    return distances, parents
+
+
+def _split_path(parents, target):
+    path = [target]
+    while parents[path[-1]] >= 0:
+        path.append(parents[path[-1]])
+    return path[::-1]
+
+
+def _reduced_arcs(adjacency, distances):
+    # Arcs of the split graph out of every node, with the weights reduced by the distances from the source, which
+    # makes them non-negative and those of the shortest paths 0
+    arcs = []
+    for node in range(len(adjacency)):
+        arcs.append([(2 * node + 1, 0.0)])
+        arcs.append([(2 * neighbor, max(0.0, weight + distances[2 * node + 1] - distances[2 * neighbor]))
+                     for neighbor, weight in adjacency[node].items()])
+    return arcs
+
+
+def _suurballe(reduced_arcs, first):
+    # The second shortest path, in the residual graph of the first with reduced weights: the arcs of the first
+    # path are replaced by their reverse, at a reduced weight of 0
+    start, target = first[0], first[-1]
+    first_arcs = set(zip(first, first[1:]))
+    backwards = {head: tail for tail, head in first_arcs}
+    reduced = {start: 0.0}
+    parents = {start: -1}
+    heap = [(0.0, start)]
+    while heap:
+        distance, node = heapq.heappop(heap)
+        if node == target:
+            break
+        if distance > reduced[node]:
+            continue
+        arcs = reduced_arcs[node]
+        if node in backwards:
+            arcs = arcs + [(backwards[node], 0.0)]
+        for head, weight in arcs:
+            if distance + weight < reduced.get(head, math.inf) and (node, head) not in first_arcs:
+                reduced[head] = distance + weight
+                parents[head] = node
+                heapq.heappush(heap, (distance + weight, head))
+    else:
+        return None
+    second = _split_path(parents, target)
+    second_arcs = set(zip(second, second[1:]))
+    # An arc of the first path taken backwards by the second cancels out
+    arcs = {(tail, head) for tail, head in first_arcs if (head, tail) not in second_arcs}
+    arcs |= {(tail, head) for tail, head in second_arcs if (head, tail) not in first_arcs}
+    successors = collections.defaultdict(list)
+    for tail, head in arcs:
+        successors[tail].append(head)
+    paths = []
+    for _ in range(2):
+        path = [start // 2]
+        node = start
+        while node != target:
+            node = successors[node].pop()
+            if node % 2 == 0:
+                path.append(node // 2)
+        paths.append(path)
+    return paths
+
+
+def _path_weight(adjacency, path):
+    return sum(adjacency[tail][head] for tail, head in zip(path, path[1:]))
+
+
+def _a_star(adjacency, start, target, bounds, blocked_nodes, blocked_heads):
+    # Shortest path avoiding some nodes, and some arcs out of the start; bounds are the distances to the target
+    # in the whole graph, which removing nodes and arcs can only lengthen
+    costs = {start: 0.0}
+    parents = {start: -1}
+    heap = [(bounds[start], 0.0, start)]
+    while heap:
+        _, cost, node = heapq.heappop(heap)
+        if node == target:
+            path = [node]
+            while parents[path[-1]] >= 0:
+                path.append(parents[path[-1]])
+            return path[::-1], cost
+        if cost > costs[node]:
+            continue
+        for neighbor, weight in adjacency[node].items():
+            if neighbor in blocked_nodes or (node == start and neighbor in blocked_heads):
+                continue
+            if cost + weight < costs.get(neighbor, math.inf):
+                costs[neighbor] = cost + weight
+                parents[neighbor] = node
+                heapq.heappush(heap, (cost + weight + bounds[neighbor], cost + weight, neighbor))
+    return None, None
+
+
+def _k_shortest(adjacency, first, k, bounds):
+    # Yen's algorithm: every next path leaves a previous one at some node, the spur, by an arc none of the
+    # previous paths sharing its root takes there, and goes on without revisiting the root
+    paths = [first]
+    candidates = []
+    seen = {tuple(first)}
+    while len(paths) < k:
+        previous = paths[-1]
+        root_cost = 0.0
+        for position, spur in enumerate(previous[:-1]):
+            root = previous[:position + 1]
+            blocked_heads = {path[position + 1] for path in paths if path[:position + 1] == root}
+            spur_path, spur_cost = _a_star(adjacency, spur, first[-1], bounds, set(root[:-1]), blocked_heads)
+            if spur_path is not None and tuple(root[:-1] + spur_path) not in seen:
+                seen.add(tuple(root[:-1] + spur_path))
+                heapq.heappush(candidates, (root_cost + spur_cost, root[:-1] + spur_path))
+            root_cost += adjacency[spur][previous[position + 1]]
+        if not candidates:
+            break
+        paths.append(heapq.heappop(candidates)[1])
+    return paths
+
+
+def disjoint_paths(graph, source, destination):
+    """
+    Returns the pair of node-disjoint paths of least total weight between two nodes, with Suurballe's
+    algorithm.
+
+    Args:
+        graph (NetworkX Graph): The topology.
+        source (str): The name of the source.
+        destination (str): The name of the destination.
+
+    Returns:
+        list or None: The two paths, lists of node names, shorter first, or None if there is no disjoint pair.
+    """
+    names, index, adjacency = _adjacency(graph)
+    distances, parents = _split_dijkstra(adjacency, index[source])
+    if source == destination or distances[2 * index[destination]] == math.inf:
+        return None
+    pair = _suurballe(_reduced_arcs(adjacency, distances), _split_path(parents, 2 * index[destination]))
+    if pair is None:
+        return None
+    return [[names[node] for node in path] for path in sorted(pair, key=lambda path: _path_weight(adjacency, path))]
+
+
+def _source_paths(adjacency, source, k):
+    # Paths of one source, per destination: the k shortest paths and the disjoint pair. The graph is undirected,
+    # so the k shortest paths are searched from the destination back to the source, the distances from the
+    # source bounding the distances to it
+    distances, parents = _split_dijkstra(adjacency, source)
+    bounds = [distances[2 * node] for node in range(len(adjacency))]
+    bounds[source] = 0.0
+    reduced_arcs = _reduced_arcs(adjacency, distances)
+    shortest, disjoint = [], []
+    for destination in range(len(adjacency)):
+        if destination == source or bounds[destination] == math.inf:
+            shortest.append([])
+            disjoint.append([])
+            continue
+        first = _split_path(parents, 2 * destination)
+        path = [source] + [node // 2 for node in first if node % 2 == 0]
+        shortest.append([backwards[::-1] for backwards in _k_shortest(adjacency, path[::-1], k, bounds)])
+        pair = _suurballe(reduced_arcs, first)
+        disjoint.append(sorted(pair, key=lambda path: _path_weight(adjacency, path)) if pair else [])
+    return shortest, disjoint
+
+
+def _paths_for_sources(graph, sources, k):
+    _, index, adjacency = _adjacency(graph)
+    return [(index[source], *_source_paths(adjacency, index[source], k)) for source in sources]
+
+
+def _encode(rows, node_count):
+    # rows: source index -> per destination, a list of paths of node indexes
+    pair_counts = np.zeros(node_count * node_count, dtype=np.int64)
+    lengths, nodes = [], []
+    for source in sorted(rows):
+        for destination, paths in enumerate(rows[source]):
+            pair_counts[source * node_count + destination] = len(paths)
+            for path in paths:
+                lengths.append(len(path))
+                nodes.extend(path)
+    pair_offsets = np.zeros(len(pair_counts) + 1, dtype=np.int64)
+    np.cumsum(pair_counts, out=pair_offsets[1:])
+    path_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=path_offsets[1:])
+    return PathSet(np.array(nodes, dtype=np.int32), path_offsets, pair_offsets)
+
+
+def _fit_k(graph, k, source_count, memory_budget):
+    # Estimated bytes per path from the shortest paths of a few sources, with a margin for the longer ones
+    hops = []
+    for source in itertools.islice(graph, SAMPLE_SOURCES):
+        hops.extend(len(path) for path in nx.single_source_dijkstra_path(graph, source, weight="weight").values())
+    path_bytes = 4 * 1.5 * (sum(hops) / len(hops) if hops else 1) + 8
+    pairs = source_count * (len(graph) - 1)
+    fixed = 2 * 8 * len(graph) * len(graph)  # The pair offsets of both sets
+    fitting = int((memory_budget - fixed) / (pairs * path_bytes)) - 2 if pairs else k  # 2 for the disjoint pair
+    if fitting < 1:
+        raise MemoryError(f"A path table of {len(graph)} nodes needs more than {memory_budget} bytes, even with "
+                          f"k = 1")
+    if fitting < k:
+        print(f"Computing {fitting} shortest paths per pair instead of {k}, to stay within {memory_budget} bytes.")
+    return min(k, fitting)
+
+
+def compute_paths(graph, k=3, sources=None, workers=None, memory_budget=256 * 2 ** 20, executor=None):
+    """
+    Computes the k shortest paths and the disjoint pair of every pair of nodes, the sources being spread
+    over worker processes.
+
+    Args:
+        graph (NetworkX Graph): The topology, with weights 1/bandwidth.
+        k (int, optional): Number of shortest paths per pair (default is 3).
+        sources (list, optional): The sources to compute the paths of (default is every node).
+        workers (int, optional): Number of worker processes (default is the number of CPUs).
+        memory_budget (int, optional): Bytes the path arrays may use; k is lowered to fit (default is 256 MiB).
+        executor (concurrent.futures.Executor, optional): A pool to run on instead of a new one.
+
+    Returns:
+        PathTable: The paths.
+
+    Raises:
+        MemoryError: If even one shortest path per pair does not fit the budget.
+    """
+    # A plain graph pickles faster than the network's, and the workers only read it
+    graph = nx.Graph(graph)
+    sources = list(graph) if sources is None else [source for source in sources if source in graph]
+    k = _fit_k(graph, k, len(sources), memory_budget)
+    workers = workers or os.cpu_count() or 1
+    size = max(1, -(-len(sources) // (workers * 4)))
+    chunks = [sources[start:start + size] for start in range(0, len(sources), size)]
+    own_executor = executor is None
+    if own_executor:
+        executor = concurrent.futures.ProcessPoolExecutor(workers)
+    try:
+        results = [result for chunk in executor.map(_paths_for_sources, itertools.repeat(graph), chunks,
+                                                    itertools.repeat(k))
+                   for result in chunk]
+    finally:
+        if own_executor:
+            executor.shutdown()
+    names = list(graph)
+    shortest = _encode({source: rows for source, rows, _ in results}, len(names))
+    disjoint = _encode({source: rows for source, _, rows in results}, len(names))
+    return PathTable(names, k, shortest, disjoint)
+
+
+def _start_worker(parent_pid):
+    # The cache's workers are not told when the controller is killed, so they watch for it themselves
+    threading.Thread(target=_watch_parent, args=(parent_pid,), daemon=True).start()
+
+
+def _watch_parent(parent_pid):
+    while os.getppid() == parent_pid:
+        time.sleep(1)
+    os._exit(0)
+
+
+class PathCache:
+    def __init__(self, k=3, workers=None, memory_budget=256 * 2 ** 20, file_name=None):
+        """
+        Initializes the cache. Its worker processes are started with the first computation.
+
+        Args:
+            k (int, optional): Number of shortest paths per pair (default is 3).
+            workers (int, optional): Number of worker processes (default is the number of CPUs).
+            memory_budget (int, optional): Bytes the path arrays may use (default is 256 MiB).
+            file_name (str, optional): A file every new table is written to, for clients (default is none).
+        """
+        self.k = k
+        self.workers = workers or os.cpu_count() or 1
+        self.memory_budget = memory_budget
+        self.file_name = file_name
+        self.table = None
+        self.executor = None
+        self.lock = threading.Lock()
+        self.pending = None  # Latest (topology snapshot, sources, done) the background thread has to compute
+        self.requested = None  # Topology version of the latest background request
+        self.thread = None
+        self.pending_lock = threading.Lock()
+
+    def get(self, topology_snapshot, sources=None):
+        """
+        Returns the path table of a topology version, computing it if the cached one is of another version.
+
+        Args:
+            topology_snapshot (NetworkSnapshot): The topology version.
+            sources (list, optional): The sources to compute the paths of (default is every node).
+
+        Returns:
+            PathTable: The paths.
+        """
+        with self.lock:
+            if self.table is not None and self.table.version == topology_snapshot.version:
+                return self.table
+            if self.executor is None:
+                # Spawned workers do not inherit the controller's threads and sockets, as forked ones would
+                self.executor = concurrent.futures.ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=_start_worker,
+                    initargs=(os.getpid(),))
+            started = time.perf_counter()
+            table = compute_paths(topology_snapshot.graph, self.k, sources, self.workers, self.memory_budget,
+                                  self.executor)
+            table.version = topology_snapshot.version
+            print(f"Protection paths of topology version {table.version} computed in "
+                  f"{time.perf_counter() - started:.2f} s, {table.nbytes() / 2 ** 20:.1f} MiB.")
+            if self.file_name:
+                table.save(self.file_name)
+            self.table = table
+            return table
+
+    def compute_async(self, topology_snapshot, sources=None, done=None):
+        """
+        Computes the path table of a topology version in a background thread, and calls done once it is
+        cached, unless a newer version was requested meanwhile. A request waiting for the thread is replaced
+        by a newer one, so a burst of topology changes computes the first and the last version only.
+
+        Args:
+            topology_snapshot (NetworkSnapshot): The topology version.
+            sources (list, optional): The sources to compute the paths of (default is every node).
+            done (callable, optional): Called without arguments once the table is cached (default is none).
+        """
+        with self.pending_lock:
+            if self.requested == topology_snapshot.version:
+                return
+            self.requested = topology_snapshot.version
+            self.pending = (topology_snapshot, sources, done)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._compute_pending, daemon=True)
+                self.thread.start()
+
+    def _compute_pending(self):
+        while True:
+            with self.pending_lock:
+                if self.pending is None:
+                    self.thread = None
+                    return
+                topology_snapshot, sources, done = self.pending
+                self.pending = None
+            try:
+                self.get(topology_snapshot, sources)
+            except Exception as e:
+                print(f"Error computing the protection paths of topology version {topology_snapshot.version}: {e}")
+                with self.pending_lock:
+                    if self.requested == topology_snapshot.version:
+                        self.requested = None  # The next request of this version tries again
+                continue
+            with self.pending_lock:
+                superseded = self.pending is not None
+            if done is not None and not superseded:
+                done()
+
+
+def add_protection_routes(routing_tables, path_table, graph=None):
+    """
+    Adds a protection path per destination to routing tables, in place, under the destination name
+    prefixed with PROTECTION_PREFIX: the shortest precomputed path that shares no node with the routed
+    path but its ends, or else one whose next hop differs.
+
+    Args:
+        routing_tables (dict): Source name -> {destination name -> path}.
+        path_table (PathTable): The precomputed paths of the topology.
+        graph (NetworkX Graph, optional): The current topology, if the paths may be of an earlier version:
+                                          paths over links it lacks are skipped (default is none).
+
+    Returns:
+        dict: The routing tables.
+    """
+    for source, table in routing_tables.items():
+        protection = {}
+        for destination, path in table.items():
+            if len(path) < 2 or destination not in path_table.index:
+                continue
+            candidates = [candidate for candidate in (path_table.shortest_paths(source, destination)
+                                                      + path_table.disjoint_paths(source, destination))
+                          if candidate[1] != path[1]
+                          and (graph is None or all(map(graph.has_edge, candidate, candidate[1:])))]
+            avoided = set(path[1:-1])
+            disjoint = [candidate for candidate in candidates if not avoided & set(candidate[1:-1])]
+            if disjoint or candidates:
+                protection[PROTECTION_PREFIX + destination] = (disjoint or candidates)[0]
+        table.update(protection)
+    return routing_tables
+
+
+def protection_route(routing_table, destination, failed_hop):
+    """
+    Returns the protection path of a destination, if it avoids a failed next hop.
+
+    Args:
+        routing_table (dict): A node's routing table.
+        destination (str): The name of the destination node.
+        failed_hop (str): The next hop that did not answer.
+
+    Returns:
+        list or None: The protection path, from the node to the destination, or None if there is none
+                      that avoids the failed hop.
+    """
+    path = (routing_table or {}).get(PROTECTION_PREFIX + destination)
+    if path is None or failed_hop in path:
+        return None
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the k shortest paths and the disjoint path pair of "
+                                                 "every pair of nodes.")
+    parser.add_argument("--topology", help="a topology file written by topology.py (default is the embedded NSFNet)")
+    parser.add_argument("-k", type=int, default=3, help="shortest paths per pair (default 3)")
+    parser.add_argument("--workers", type=int, help="worker processes (default is the number of CPUs)")
+    parser.add_argument("--memory-budget", type=float, default=256, help="MiB the paths may use (default 256)")
+    parser.add_argument("--output", default="protection_paths.npz", help="file for the path table")
+    parser.add_argument("--show", nargs=2, metavar=("SOURCE", "DESTINATION"), help="print the paths of a pair")
+    args = parser.parse_args()
+
+    if args.topology:
+        import topology
+        network = topology.load_topology(args.topology)
+    else:
+        from controllerserver import network
+    started = time.perf_counter()
+    try:
+        path_table = compute_paths(network.graph, args.k, workers=args.workers,
+                                   memory_budget=int(args.memory_budget * 2 ** 20))
+    except MemoryError as e:
+        parser.exit(1, f"{e}\n")
+    path_table.version = network.version
+    print(f"Paths of {len(path_table.names)} nodes computed in {time.perf_counter() - started:.2f} s: "
+          f"{len(path_table.shortest.path_offsets) - 1} shortest and {len(path_table.disjoint.path_offsets) - 1} "
+          f"disjoint paths, {path_table.nbytes() / 2 ** 20:.2f} MiB.")
+    path_table.save(args.output)
+    print(f"Path table written to {args.output}")
+    if args.show:
+        source, destination = args.show
+        for path in path_table.shortest_paths(source, destination):
+            print(f"Shortest: {path}")
+        for path in path_table.disjoint_paths(source, destination):
+            print(f"Disjoint: {path}")
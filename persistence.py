@@ -0,0 +1,120 @@
+"""
+API Documentation
+
+This module provides atomic, write-behind persistence for the files the controller writes.
+
+Files are written to a temporary file in the same directory, flushed to disk with fsync and then moved
+over the old file with os.replace, so readers always see either the previous or the new content, never a
+partial write. Writes run on a background thread; when they lag behind, only the latest submitted
+version is written and the intermediate ones are skipped.
+
+Classes:
+    WriteBehind:
+        Runs a write function on a background thread, keeping only the latest pending call.
+
+        Methods:
+            __init__(self, write: callable):
+                Starts the writer thread.
+
+            submit(self, *args):
+                Schedules a write, replacing a pending one.
+
+            flush(self, timeout: float = None) -> bool:
+                Waits until all submitted writes are done or skipped.
+
+            counters(self) -> dict:
+                Returns the number of writes submitted, written and skipped.
+
+Functions:
+    write_json_atomic(data: object, file_name: str):
+        Writes compact JSON to a file atomically.
+"""
+import json
+import os
+import threading
+
+
+def write_json_atomic(data, file_name):
+    """
+    Writes compact JSON to a file atomically.
+
+    Args:
+        data (object): The object to write.
+        file_name (str): The file to replace.
+    """
+    temp_file = f"{file_name}.{os.getpid()}.tmp"
+    with open(temp_file, "w") as file:
+        json.dump(data, file, separators=(",", ":"))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_file, file_name)
+
+
+class WriteBehind:
+    def __init__(self, write):
+        """
+        Starts the writer thread.
+
+        Args:
+            write (callable): The write function, called on the writer thread with the arguments of submit.
+        """
+        self.write = write
+        self.condition = threading.Condition()
+        self.pending = None
+        self.busy = False
+        self.counts = {"submitted": 0, "written": 0, "skipped": 0}
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, *args):
+        """
+        Schedules a write. A write that is still pending is replaced, and counted as skipped.
+
+        Args:
+            *args: The arguments of the write function.
+        """
+        with self.condition:
+            if self.pending is not None:
+                self.counts["skipped"] += 1
+            self.pending = args
+            self.counts["submitted"] += 1
+            self.condition.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Waits until all submitted writes are done or skipped.
+
+        Args:
+            timeout (float, optional): Seconds to wait at most (default is no limit).
+
+        Returns:
+            bool: False if the timeout expired first.
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: self.pending is None and not self.busy, timeout)
+
+    def counters(self):
+        """
+        Returns the number of writes submitted, written and skipped.
+
+        Returns:
+            dict: The counters.
+        """
+        with self.condition:
+            return dict(self.counts)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending is not None)
+                args, self.pending = self.pending, None
+                self.busy = True
+            written = False
+            try:
+                self.write(*args)
+                written = True
+            except Exception as e:
+                print(f"Error writing in the background: {e}")
+            with self.condition:
+                self.busy = False
+                self.counts["written"] += written
+                self.condition.notify_all()
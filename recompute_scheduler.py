@@ -0,0 +1,158 @@
+"""
+API Documentation
+
+This module provides the scheduler that decides when the controller recomputes its routing tables.
+
+A single scheduler thread runs every computation, so computations never overlap. Topology changes are
+reported with notify() and coalesced: all the changes that arrive while a computation is pending are
+served by one computation, which starts once the topology has been quiet for a short delay. The delay
+adapts to the churn rate: it grows with the number of changes in the last churn_window seconds, so a
+burst of failures triggers one computation instead of many, while an isolated failure is acted on
+within min_delay. A computation is never postponed more than max_delay after the first change it serves.
+
+If changes arrive while a computation is in flight, the computation is superseded: it is told to stop
+through its cancelled() callback, which it checks between sources, and a fresh one is scheduled. A
+computation is not superseded more than max_supersede times in a row, so that constant churn cannot
+starve the tables. The first computation runs as soon as the scheduler starts; after that, without
+changes, the tables are recomputed every period seconds.
+
+Classes:
+    RecomputeScheduler:
+        Runs a computation function on its own thread when the topology changes.
+
+        Methods:
+            __init__(self, compute: callable, period: float = 30.0, min_delay: float = 0.5,
+                     max_delay: float = 5.0, churn_window: float = 10.0, max_supersede: int = 2):
+                Initializes the scheduler.
+
+            start(self):
+                Starts the scheduler thread, which runs the first computation at once.
+
+            stop(self):
+                Stops the scheduler thread after the current computation.
+
+            notify(self):
+                Reports a topology change.
+
+            counters(self) -> dict:
+                Returns the scheduler counters.
+"""
+import collections
+import threading
+import time
+
+
+class RecomputeScheduler:
+    def __init__(self, compute, period=30.0, min_delay=0.5, max_delay=5.0, churn_window=10.0, max_supersede=2):
+        """
+        Initializes the scheduler.
+
+        Args:
+            compute (callable): The computation. It is called with a cancelled() callback, which returns
+                                True once it should stop, and returns False if it stopped early.
+            period (float, optional): Seconds between computations when the topology does not change
+                                      (default is 30.0).
+            min_delay (float, optional): Quiet time required after an isolated change (default is 0.5).
+            max_delay (float, optional): Longest wait after the first change a computation serves
+                                         (default is 5.0).
+            churn_window (float, optional): Seconds over which the churn rate is measured (default is 10.0).
+            max_supersede (int, optional): Most computations superseded in a row (default is 2).
+        """
+        self.compute = compute
+        self.period = period
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.churn_window = churn_window
+        self.max_supersede = max_supersede
+        self.condition = threading.Condition()
+        self.pending = 0  # Changes that no computation has started to serve yet
+        self.first_pending = None
+        self.last_change = None
+        self.recent_changes = collections.deque()
+        self.superseded_in_row = 0
+        self.next_periodic = None
+        self.running = False
+        self.thread = None
+        self.counts = {"queued": 0, "coalesced": 0, "started": 0, "completed": 0, "superseded": 0, "periodic": 0,
+                       "failed": 0}
+
+    def start(self):
+        """Starts the scheduler thread. The first computation runs at once, without waiting for a change or a period."""
+
+        self.running = True
+        self.next_periodic = time.monotonic()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stops the scheduler thread after the current computation."""
+
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+
+    def notify(self):
+        """Reports a topology change, to be served by the next computation."""
+
+        with self.condition:
+            now = time.monotonic()
+            self.counts["queued"] += 1
+            if self.pending:
+                self.counts["coalesced"] += 1
+            else:
+                self.first_pending = now
+            self.pending += 1
+            self.last_change = now
+            self.recent_changes.append(now)
+            self.condition.notify()
+
+    def counters(self):
+        """
+        Returns the scheduler counters.
+
+        Returns:
+            dict: The number of changes queued and coalesced, and of computations started, completed,
+                  superseded, failed and started without changes (periodic), plus the current delay.
+        """
+        with self.condition:
+            counters = dict(self.counts)
+            counters["delay_s"] = self._delay(time.monotonic())
+        return counters
+
+    def _delay(self, now):
+        while self.recent_changes and self.recent_changes[0] < now - self.churn_window:
+            self.recent_changes.popleft()
+        return min(self.max_delay, self.min_delay * max(len(self.recent_changes), 1))
+
+    def _time_to_next(self, now):
+        if self.pending:
+            return min(self.last_change + self._delay(now), self.first_pending + self.max_delay) - now
+        return self.next_periodic - now
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.running:
+                    wait = self._time_to_next(time.monotonic())
+                    if wait <= 0:
+                        break
+                    self.condition.wait(wait)
+                if not self.running:
+                    return
+                if not self.pending:
+                    self.counts["periodic"] += 1
+                self.counts["started"] += 1
+                self.pending = 0
+                self.first_pending = None
+                may_cancel = self.superseded_in_row < self.max_supersede
+            cancelled = (lambda: self.pending > 0) if may_cancel else (lambda: False)
+            try:
+                outcome = "superseded" if self.compute(cancelled) is False else "completed"
+            except Exception as e:
+                print(f"Error computing routing tables: {e}")
+                outcome = "failed"
+            with self.condition:
+                self.next_periodic = time.monotonic() + self.period
+                self.counts[outcome] += 1
+                self.superseded_in_row = self.superseded_in_row + 1 if outcome == "superseded" else 0
@@ -0,0 +1,183 @@
+"""
+API Documentation
+
+This module replicates the controller's state to hot-standby controllers on the same host.
+
+The primary controller serves a Unix stream socket. A standby that connects first receives the full
+state (the topology, the routing tables and their recent history, the session keys and the heartbeat
+history of every node), then every change as it happens: new routing tables, topology changes, session
+keys, and the heartbeats received, sent in batches every ping_interval seconds together with a ping.
+Messages are JSON frames (see framing.py) with a "type" key; the controller decides what they hold. The
+socket is DEFAULT_PATH unless configured otherwise.
+
+A standby considers the primary failed when the stream ends, which happens as soon as the primary's
+process dies, or when nothing arrives for timeout seconds, for a primary that hangs. It then takes over
+with the replicated state, without waiting for a recomputation.
+
+Applying a message twice must be harmless: a standby that connects while the primary changes its state
+may get a change both in the full state and as a message.
+
+Classes:
+    ReplicationServer:
+        The primary side: streams the state to the connected standbys.
+
+        Methods:
+            __init__(self, path: str, full_state: callable, ping_interval: float = 0.1):
+                Initializes the server.
+
+            start(self):
+                Binds the socket and starts accepting standbys.
+
+            send(self, message: dict):
+                Sends a change to every standby.
+
+            record_heartbeat(self, node_name: str, arrival: float):
+                Queues a heartbeat for the next batch.
+
+    StandbyClient:
+        The standby side: receives the state until the primary fails.
+
+        Methods:
+            __init__(self, path: str, apply: callable, timeout: float = 1.0):
+                Initializes the client.
+
+            run(self):
+                Connects to the primary and applies its messages until it fails.
+"""
+import os
+import socket
+import tempfile
+import threading
+import time
+import framing
+
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), "nsfnet_controller.replication.sock")
+
+
+class ReplicationServer:
+    def __init__(self, path, full_state, ping_interval=0.1):
+        """
+        Initializes the server.
+
+        Args:
+            path (str): The path of the Unix socket.
+            full_state (callable): Returns the full state message sent to a standby when it connects.
+            ping_interval (float, optional): Seconds between heartbeat batches and pings (default is 0.1).
+        """
+        self.path = path
+        self.full_state = full_state
+        self.ping_interval = ping_interval
+        self.standbys = []
+        self.lock = threading.Lock()  # Orders full states and changes on every standby connection
+        self.heartbeats = []
+        self.heartbeats_lock = threading.Lock()
+
+    def start(self):
+        """Binds the socket, replacing a stale one, and starts accepting standbys and sending pings."""
+
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server_socket.bind(self.path)
+        server_socket.listen(4)
+        print(f"Replicating to standby controllers on {self.path}...")
+        threading.Thread(target=self._accept, args=(server_socket,), daemon=True).start()
+        threading.Thread(target=self._ping, daemon=True).start()
+
+    def send(self, message):
+        """
+        Sends a change to every standby. Standbys that cannot keep up are disconnected.
+
+        Args:
+            message (dict): The change, a JSON object with a "type" key.
+        """
+        with self.lock:
+            for standby in list(self.standbys):
+                try:
+                    framing.send_json(standby, message)
+                except OSError as e:
+                    print(f"Standby controller disconnected: {e}")
+                    self.standbys.remove(standby)
+                    standby.close()
+
+    def record_heartbeat(self, node_name, arrival):
+        """
+        Queues a heartbeat for the next batch.
+
+        Args:
+            node_name (str): The name of the node.
+            arrival (float): Its arrival time, from time.monotonic(), which all processes of a host share.
+        """
+        if self.standbys:
+            with self.heartbeats_lock:
+                self.heartbeats.append((node_name, arrival))
+
+    def _accept(self, server_socket):
+        while True:
+            standby, _ = server_socket.accept()
+            with self.lock:
+                try:
+                    framing.send_json(standby, self.full_state())
+                except OSError as e:
+                    print(f"Error sending the state to a standby controller: {e}")
+                    standby.close()
+                    continue
+                self.standbys.append(standby)
+            print("Standby controller connected.")
+
+    def _ping(self):
+        while True:
+            time.sleep(self.ping_interval)
+            with self.heartbeats_lock:
+                heartbeats, self.heartbeats = self.heartbeats, []
+            self.send({"type": "ping", "heartbeats": heartbeats})
+
+
+class StandbyClient:
+    def __init__(self, path, apply, timeout=1.0):
+        """
+        Initializes the client.
+
+        Args:
+            path (str): The path of the primary's Unix socket.
+            apply (callable): Called with every message received, the full state first.
+            timeout (float, optional): Seconds without any message after which the primary is considered
+                                       failed (default is 1.0).
+        """
+        self.path = path
+        self.apply = apply
+        self.timeout = timeout
+
+    def run(self):
+        """
+        Connects to the primary, waiting for it to start, and applies its messages until it fails.
+
+        Returns:
+            bool: True if the full state was received before the primary failed.
+        """
+        while True:
+            try:
+                client_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                client_socket.connect(self.path)
+                break
+            except OSError:
+                client_socket.close()
+                time.sleep(self.timeout)
+        print(f"Connected to the primary controller on {self.path}.")
+        client_socket.settimeout(self.timeout)
+        synchronized = False
+        try:
+            while True:
+                message = framing.recv_json(client_socket)
+                if message is None:
+                    print("The primary controller closed the replication stream.")
+                    break
+                self.apply(message)
+                synchronized = True
+        except socket.timeout:
+            print(f"No message from the primary controller for {self.timeout} s.")
+        except OSError as e:
+            print(f"Replication stream lost: {e}")
+        finally:
+            client_socket.close()
+        return synchronized
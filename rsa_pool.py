@@ -0,0 +1,164 @@
+"""
+API Documentation
+
+This module provides a process pool for the controller's RSA private-key operations.
+
+rsa.decrypt is pure Python and holds the GIL, so decryptions on request threads serialize and stall the
+rest of the controller during a burst of handshakes. The pool runs them in worker processes instead,
+each of which loads the private key once when it starts. A dispatcher thread collects the ciphertexts
+that arrive within a short window and splits them into one batch per worker, so a burst is spread over
+all cores with one round trip per batch. Callers wait on a Future, which releases the GIL.
+
+Classes:
+    DecryptionPool:
+        Decrypts ciphertexts in worker processes.
+
+        Methods:
+            __init__(self, key_file: str = 'pri_key.txt', workers: int = None, batch_size: int = 64,
+                     batch_wait: float = 0.001):
+                Starts the worker processes and the dispatcher thread.
+
+            submit(self, ciphertext: bytes) -> Future:
+                Queues a ciphertext for decryption.
+
+            decrypt(self, ciphertext: bytes, timeout: float = None) -> bytes:
+                Decrypts a ciphertext, waiting for the result.
+
+            close(self):
+                Stops the dispatcher and the worker processes.
+"""
+import concurrent.futures
+import functools
+import multiprocessing
+import os
+import pickle
+import queue
+import threading
+import time
+import rsa
+
+_private_key = None
+
+
+def _start_worker(key_file, parent_pid):
+    global _private_key
+    with open(key_file, "rb") as file:
+        _private_key = pickle.load(file)
+    # Workers are not told when the controller is killed, so they watch for it themselves
+    threading.Thread(target=_watch_parent, args=(parent_pid,), daemon=True).start()
+
+
+def _watch_parent(parent_pid):
+    while os.getppid() == parent_pid:
+        time.sleep(1)
+    os._exit(0)
+
+
+def _decrypt_batch(ciphertexts):
+    results = []
+    for ciphertext in ciphertexts:
+        try:
+            results.append((True, rsa.decrypt(ciphertext, _private_key)))
+        except Exception as e:
+            results.append((False, str(e)))
+    return results
+
+
+class DecryptionPool:
+    def __init__(self, key_file="pri_key.txt", workers=None, batch_size=64, batch_wait=0.001):
+        """
+        Starts the worker processes and the dispatcher thread.
+
+        Args:
+            key_file (str, optional): The pickled private key (default is 'pri_key.txt').
+            workers (int, optional): Number of worker processes (default is the number of CPUs).
+            batch_size (int, optional): Largest number of ciphertexts sent to a worker at once (default is 64).
+            batch_wait (float, optional): Seconds to wait for more ciphertexts before dispatching a batch
+                                          (default is 0.001).
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.batches = 0
+        # Spawned workers do not inherit the controller's threads and sockets, as forked ones would
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=_start_worker,
+            initargs=(key_file, os.getpid()))
+        self.queue = queue.Queue()
+        self.dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def submit(self, ciphertext):
+        """
+        Queues a ciphertext for decryption.
+
+        Args:
+            ciphertext (bytes): The ciphertext.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the plaintext, or fails with rsa.DecryptionError.
+        """
+        future = concurrent.futures.Future()
+        self.queue.put((ciphertext, future))
+        return future
+
+    def decrypt(self, ciphertext, timeout=None):
+        """
+        Decrypts a ciphertext, waiting for the result.
+
+        Args:
+            ciphertext (bytes): The ciphertext.
+            timeout (float, optional): Seconds to wait at most (default is no limit).
+
+        Returns:
+            bytes: The plaintext.
+
+        Raises:
+            rsa.DecryptionError: If the ciphertext cannot be decrypted.
+        """
+        return self.submit(ciphertext).result(timeout)
+
+    def _dispatch(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            pending = [item]
+            deadline = time.monotonic() + self.batch_wait
+            while len(pending) < self.batch_size * self.workers:
+                try:
+                    item = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.queue.put(None)
+                    break
+                pending.append(item)
+            # One batch per worker, so that all cores share the burst
+            size = -(-len(pending) // self.workers)
+            for start in range(0, len(pending), size):
+                batch = pending[start:start + size]
+                result = self.executor.submit(_decrypt_batch, [ciphertext for ciphertext, _ in batch])
+                result.add_done_callback(functools.partial(self._resolve, batch))
+                self.batches += 1
+
+    @staticmethod
+    def _resolve(batch, result):
+        try:
+            outcomes = result.result()
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), (ok, value) in zip(batch, outcomes):
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(rsa.DecryptionError(value))
+
+    def close(self):
+        """Stops the dispatcher and the worker processes. Queued ciphertexts are still decrypted."""
+
+        self.queue.put(None)
+        self.dispatcher.join()
+        self.executor.shutdown()
@@ -0,0 +1,189 @@
+"""
+API Documentation
+
+This module provides the session-key handshake that authenticates node heartbeats to the controller.
+
+A node authenticates once with RSA: it sends a fresh random session key together with its name,
+encrypted with the controller's public key. The controller answers with a fresh random nonce, and both
+sides derive the key of the session from the two with session_mac_key. Every later heartbeat is sent in
+clear text and carries a counter and an HMAC-SHA256 over (node name, counter, table version, load
+report) computed with that key, which the controller checks at the cost of one hash instead of an RSA
+decryption. The counter must grow with every heartbeat, so captured heartbeats cannot be replayed. A
+replayed handshake restarts the counter, but under a key derived from a new nonce, which the captured
+heartbeats were not signed with.
+
+The controller keeps the session keys across connections: a node that reconnects resumes its session
+with the next heartbeat. Only when the controller no longer knows the key (after a restart, for
+example) does it answer with an error, and the node performs the handshake again.
+
+Requests on the controller port:
+
+    b"HELLO" + rsa.encrypt(session_key + name) + version        handshake, answered with a "nonce" field
+    b"BEAT " + "name counter version mac [report]"              heartbeat
+
+The optional report is the node's link load (see traffic_engineering.py), as compact JSON.
+
+Functions:
+    new_session_key() -> bytes:
+        Returns a random session key.
+
+    new_nonce() -> bytes:
+        Returns a random handshake nonce.
+
+    session_mac_key(session_key: bytes, nonce: bytes) -> bytes:
+        Derives the key that authenticates the heartbeats of a session.
+
+    handshake_request(node_name: str, session_key: bytes, version: int, public_key: rsa.PublicKey) -> bytes:
+        Builds the handshake request of a node.
+
+    read_handshake(payload: bytes, private_key: rsa.PrivateKey, decrypt: callable = None) -> tuple:
+        Decrypts a handshake request.
+
+    heartbeat_request(node_name: str, session_key: bytes, counter: int, version: int, report: dict = None) -> bytes:
+        Builds an authenticated heartbeat request.
+
+    read_heartbeat(payload: bytes) -> tuple:
+        Splits a heartbeat request into its fields.
+
+    verify_heartbeat(session_key: bytes, node_name: str, counter: int, version: int, mac: str,
+                     report: str = '') -> bool:
+        Checks the MAC of a heartbeat.
+"""
+import hashlib
+import hmac
+import json
+import os
+import rsa
+
+HELLO = b"HELLO"
+BEAT = b"BEAT "
+KEY_SIZE = 16
+NONCE_SIZE = 16
+
+
+def new_session_key():
+    """
+    Returns a random session key.
+
+    Returns:
+        bytes: KEY_SIZE random bytes.
+    """
+    return os.urandom(KEY_SIZE)
+
+
+def new_nonce():
+    """
+    Returns a random handshake nonce.
+
+    Returns:
+        bytes: NONCE_SIZE random bytes.
+    """
+    return os.urandom(NONCE_SIZE)
+
+
+def session_mac_key(session_key, nonce):
+    """
+    Derives the key that authenticates the heartbeats of a session from the node's session key and the
+    controller's nonce, so that every handshake, even a replayed one, yields a different key.
+
+    Args:
+        session_key (bytes): The session key sent in the handshake.
+        nonce (bytes): The nonce of the controller's answer to the handshake.
+
+    Returns:
+        bytes: The heartbeat key.
+    """
+    return hmac.new(session_key, b"session " + nonce, hashlib.sha256).digest()
+
+
+def _mac(session_key, node_name, counter, version, report=""):
+    # Heartbeats without a report keep the MAC they had before reports existed
+    text = f"{node_name} {counter} {version} {report}" if report else f"{node_name} {counter} {version}"
+    return hmac.new(session_key, text.encode(), hashlib.sha256).hexdigest()
+
+
+def handshake_request(node_name, session_key, version, public_key):
+    """
+    Builds the handshake request of a node. The session key and the name are RSA encrypted; the table
+    version the node holds follows in clear text.
+
+    Args:
+        node_name (str): The name of the node.
+        session_key (bytes): The session key, from new_session_key.
+        version (int): The routing table version the node holds, -1 if none.
+        public_key (rsa.PublicKey): The controller's public key.
+
+    Returns:
+        bytes: The request.
+    """
+    return HELLO + rsa.encrypt(session_key + node_name.encode(), public_key) + str(version).encode()
+
+
+def read_handshake(payload, private_key, decrypt=None):
+    """
+    Decrypts a handshake request, without its HELLO prefix.
+
+    Args:
+        payload (bytes): The request after the prefix.
+        private_key (rsa.PrivateKey): The controller's private key.
+        decrypt (callable, optional): Function decrypting a ciphertext with the private key, such as
+                                      DecryptionPool.decrypt (default is rsa.decrypt on this thread).
+
+    Returns:
+        tuple: The node name, the session key and the table version.
+    """
+    size = rsa.common.byte_size(private_key.n)
+    plaintext = decrypt(payload[:size]) if decrypt else rsa.decrypt(payload[:size], private_key)
+    return plaintext[KEY_SIZE:].decode(), plaintext[:KEY_SIZE], int(payload[size:])
+
+
+def heartbeat_request(node_name, session_key, counter, version, report=None):
+    """
+    Builds an authenticated heartbeat request.
+
+    Args:
+        node_name (str): The name of the node.
+        session_key (bytes): The heartbeat key, from session_mac_key.
+        counter (int): A number larger than the one of the previous heartbeat of this session.
+        version (int): The routing table version the node holds, -1 if none.
+        report (dict, optional): The node's link load, neighbor name -> [bytes per second, queue depth].
+
+    Returns:
+        bytes: The request.
+    """
+    report = json.dumps(report, separators=(",", ":")) if report else ""
+    request = f"{node_name} {counter} {version} {_mac(session_key, node_name, counter, version, report)}"
+    return BEAT + (f"{request} {report}" if report else request).encode()
+
+
+def read_heartbeat(payload):
+    """
+    Splits a heartbeat request, without its BEAT prefix, into its fields.
+
+    Args:
+        payload (bytes): The request after the prefix.
+
+    Returns:
+        tuple: The node name, the counter, the table version, the MAC and the load report as JSON text
+               ('' if the heartbeat has none).
+    """
+    node_name, counter, version, mac, *report = payload.decode().split(" ", 4)
+    return node_name, int(counter), int(version), mac, report[0] if report else ""
+
+
+def verify_heartbeat(session_key, node_name, counter, version, mac, report=""):
+    """
+    Checks the MAC of a heartbeat in constant time.
+
+    Args:
+        session_key (bytes): The heartbeat key of the node.
+        node_name (str): The name in the heartbeat.
+        counter (int): The counter in the heartbeat.
+        version (int): The table version in the heartbeat.
+        mac (str): The MAC in the heartbeat.
+        report (str, optional): The load report in the heartbeat, as JSON text (default is none).
+
+    Returns:
+        bool: Whether the MAC is valid.
+    """
+    return hmac.compare_digest(_mac(session_key, node_name, counter, version, report), mac)
@@ -0,0 +1,199 @@
+"""
+API Documentation
+
+This module provides what the sharded controller needs to split the nodes between several controller
+processes on one host.
+
+Nodes are assigned to shards by consistent hashing: every shard owns many points on a hash ring, and a
+node belongs to the shard owning the first point after the hash of its name. Adding a shard moves only
+about 1/N of the nodes. Shard i listens on port base_port + 2 * i, with its session server on the next
+port, and nodes started with the same shard count compute the port of their shard themselves.
+
+Each shard tracks the liveness of its own nodes and computes the routing tables of its own nodes only.
+Topology changes are shared through a bus of Unix datagram sockets, one per shard: when a shard removes
+or adds one of its nodes, it sends the event to every other shard, which applies it to its own copy of
+the topology. A shard that starts announces itself with a "hello" event, and the other shards reply with
+their nodes that are currently removed, so a restarted shard catches up with the failures it missed.
+
+Classes:
+    HashRing:
+        Assigns node names to shards by consistent hashing.
+
+        Methods:
+            __init__(self, shards: int, replicas: int = 64):
+                Builds the ring.
+
+            shard_of(self, node_name: str) -> int:
+                Returns the shard that owns a node.
+
+    ShardBus:
+        Sends topology events to the other shards and receives theirs.
+
+        Methods:
+            __init__(self, shard: int, shards: int, handler: callable, name: str = 'nsfnet_controller',
+                     directory: str = None):
+                Initializes the bus of one shard.
+
+            start(self):
+                Binds the shard's socket and starts receiving events.
+
+            publish(self, event: dict, shard: int = None):
+                Sends an event to every other shard, or to one shard.
+
+            close(self):
+                Closes and removes the shard's socket.
+
+Functions:
+    controller_port(shard: int, base_port: int = 8000) -> int:
+        Returns the port of a shard.
+
+    shard_port(node_name: str, shards: int, base_port: int = 8000) -> int:
+        Returns the port of the shard that owns a node.
+"""
+import bisect
+import functools
+import hashlib
+import json
+import os
+import socket
+import tempfile
+import threading
+
+MAX_EVENT_SIZE = 65536
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.sha1(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    def __init__(self, shards, replicas=64):
+        """
+        Builds the ring.
+
+        Args:
+            shards (int): Number of shards.
+            replicas (int, optional): Points per shard on the ring; more points balance the shards better
+                                      (default is 64).
+        """
+        self.shards = shards
+        points = sorted((_hash(f"shard-{shard}-{replica}"), shard)
+                        for shard in range(shards) for replica in range(replicas))
+        self.hashes = [point for point, _ in points]
+        self.owners = [shard for _, shard in points]
+
+    def shard_of(self, node_name):
+        """
+        Returns the shard that owns a node.
+
+        Args:
+            node_name (str): The name of the node.
+
+        Returns:
+            int: The shard index, from 0 to shards - 1.
+        """
+        index = bisect.bisect(self.hashes, _hash(node_name))
+        return self.owners[index % len(self.owners)]
+
+
+def controller_port(shard, base_port=8000):
+    """
+    Returns the port of a shard. Its session server listens on the next port.
+
+    Args:
+        shard (int): The shard index.
+        base_port (int, optional): The port of shard 0 (default is 8000).
+
+    Returns:
+        int: The port.
+    """
+    return base_port + 2 * shard
+
+
+@functools.lru_cache(maxsize=16)
+def _ring(shards):
+    return HashRing(shards)
+
+
+def shard_port(node_name, shards, base_port=8000):
+    """
+    Returns the port of the shard that owns a node.
+
+    Args:
+        node_name (str): The name of the node.
+        shards (int): Number of shards the controller runs.
+        base_port (int, optional): The port of shard 0 (default is 8000).
+
+    Returns:
+        int: The port, base_port itself when the controller is not sharded.
+    """
+    if shards <= 1:
+        return base_port
+    return controller_port(_ring(shards).shard_of(node_name), base_port)
+
+
+class ShardBus:
+    def __init__(self, shard, shards, handler, name="nsfnet_controller", directory=None):
+        """
+        Initializes the bus of one shard.
+
+        Args:
+            shard (int): The index of this shard.
+            shards (int): Number of shards.
+            handler (callable): Called with every event received from another shard, on the bus thread.
+            name (str, optional): Prefix of the socket files (default is 'nsfnet_controller').
+            directory (str, optional): Directory of the socket files (default is the temporary directory).
+        """
+        self.shard = shard
+        self.shards = shards
+        self.handler = handler
+        self.name = name
+        self.directory = directory or tempfile.gettempdir()
+        self.socket = None
+
+    def _path(self, shard):
+        return os.path.join(self.directory, f"{self.name}.shard{shard}.sock")
+
+    def start(self):
+        """Binds the shard's socket, replacing a stale one, and starts receiving events."""
+
+        path = self._path(self.shard)
+        if os.path.exists(path):
+            os.unlink(path)
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.socket.bind(path)
+        threading.Thread(target=self._receive, daemon=True).start()
+
+    def publish(self, event, shard=None):
+        """
+        Sends an event to every other shard, or to one shard. Shards that are not running miss it.
+
+        Args:
+            event (dict): The event, a JSON object with an "event" key.
+            shard (int, optional): The only shard to send it to (default is every other shard).
+        """
+        data = json.dumps(dict(event, shard=self.shard), separators=(",", ":")).encode()
+        targets = [shard] if shard is not None else [other for other in range(self.shards) if other != self.shard]
+        for target in targets:
+            try:
+                self.socket.sendto(data, self._path(target))
+            except OSError as e:
+                print(f"Shard {target} unreachable: {e}")
+
+    def close(self):
+        """Closes and removes the shard's socket."""
+
+        self.socket.close()
+        if os.path.exists(self._path(self.shard)):
+            os.unlink(self._path(self.shard))
+
+    def _receive(self):
+        while True:
+            try:
+                data = self.socket.recv(MAX_EVENT_SIZE)
+            except OSError:
+                return
+            try:
+                self.handler(json.loads(data))
+            except Exception as e:
+                print(f"Error handling shard event: {e}")
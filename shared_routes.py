@@ -0,0 +1,243 @@
+"""
+API Documentation
+
+This module publishes next-hop routing tables to co-located nodes through shared memory.
+
+The controller creates a multiprocessing.shared_memory segment and writes the next-hop table of every
+node into it. Nodes on the same host attach to the segment and read their own row directly: no socket,
+no RSA and no JSON. Consistency is kept with a seqlock: the writer makes the sequence counter odd while
+it writes and even when it is done, and a reader retries whenever the counter was odd or changed during
+its copy. Readers only poll the counter, so an unchanged table costs one 8-byte read.
+
+Nodes also store their heartbeat, a time.time() timestamp, in their own slot of the segment, which the
+controller scans instead of receiving a TCP connection per heartbeat.
+
+Segment layout (native byte order):
+
+    sequence    uint64          seqlock counter; the table version is sequence // 2
+    node_count  uint64          N
+    names       N x 64 bytes    UTF-8 node names, NUL padded
+    heartbeats  float64[N]      last heartbeat of each node, written by the node itself
+    next_hops   int32[N x N]    next_hops[i, j] is the index of the next hop from i towards j
+                                (i itself when j == i, -1 when j is unreachable)
+
+The set of nodes is fixed when the segment is created; nodes outside it keep using TCP.
+
+Classes:
+    SharedRoutingTables:
+        The controller side: creates the segment, publishes tables and reads heartbeats.
+
+        Methods:
+            __init__(self, names: list, segment_name: str = 'nsfnet_routes'):
+                Creates the segment for the given nodes.
+
+            publish(self, routing_tables: dict):
+                Writes new routing tables and bumps the version.
+
+            heartbeats(self) -> dict:
+                Returns the last heartbeat timestamp of every node, keyed by name.
+
+            close(self):
+                Closes and removes the segment.
+
+    SharedRoutingReader:
+        The node side: reads one node's row and writes its heartbeat.
+
+        Methods:
+            __init__(self, node_name: str, segment_name: str = 'nsfnet_routes'):
+                Attaches to the segment.
+
+            version(self) -> int:
+                Returns the version of the published tables.
+
+            next_hop(self, destination: str) -> str:
+                Returns the next hop towards a destination, or None.
+
+            heartbeat(self):
+                Records a heartbeat for this node.
+
+            close(self):
+                Detaches from the segment.
+"""
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+
+SEGMENT_NAME = "nsfnet_routes"
+NAME_SIZE = 64
+HEADER = struct.Struct("QQ")
+
+
+def _layout(node_count):
+    names = HEADER.size
+    heartbeats = names + node_count * NAME_SIZE
+    heartbeats += -heartbeats % 8
+    next_hops = heartbeats + node_count * 8
+    return names, heartbeats, next_hops, next_hops + node_count * node_count * 4
+
+
+def _attach(segment_name):
+    # Attaching registers the segment with this process's resource tracker, which would remove it when
+    # the node exits. Only the controller, which created it, may remove it.
+    try:
+        return shared_memory.SharedMemory(segment_name, track=False)
+    except TypeError:
+        segment = shared_memory.SharedMemory(segment_name)
+        resource_tracker.unregister(segment._name, "shared_memory")
+        return segment
+
+
+class SharedRoutingTables:
+    def __init__(self, names, segment_name=SEGMENT_NAME):
+        """
+        Creates the segment for the given nodes, replacing a stale segment of the same name.
+
+        Args:
+            names (list): Names of the nodes that can read their table from the segment.
+            segment_name (str, optional): Name of the shared memory segment (default is 'nsfnet_routes').
+        """
+        self.names = list(names)
+        self.index = {name: index for index, name in enumerate(self.names)}
+        n = len(self.names)
+        names_offset, heartbeats_offset, next_hops_offset, size = _layout(n)
+        try:
+            stale = _attach(segment_name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        self.segment = shared_memory.SharedMemory(segment_name, create=True, size=size)
+        self._header = np.ndarray(2, dtype=np.uint64, buffer=self.segment.buf)
+        self._header[:] = (0, n)
+        for index, name in enumerate(self.names):
+            encoded = name.encode()[:NAME_SIZE]
+            start = names_offset + index * NAME_SIZE
+            self.segment.buf[start:start + len(encoded)] = encoded
+        self._heartbeats = np.ndarray(n, dtype=np.float64, buffer=self.segment.buf, offset=heartbeats_offset)
+        self._heartbeats[:] = 0
+        self._next_hops = np.ndarray((n, n), dtype=np.int32, buffer=self.segment.buf, offset=next_hops_offset)
+        self._next_hops[:] = -1
+
+    def publish(self, routing_tables):
+        """
+        Writes new routing tables and bumps the version. Nodes outside the segment are ignored.
+
+        Args:
+            routing_tables (dict): Routing tables as computed by the controller, mapping each source name to
+                                   a dict of destination name -> path.
+        """
+        next_hops = np.full(self._next_hops.shape, -1, dtype=np.int32)
+        for source, paths in routing_tables.items():
+            if source not in self.index:
+                continue
+            row = next_hops[self.index[source]]
+            for destination, path in paths.items():
+                if path and destination in self.index:
+                    hop = path[1] if len(path) > 1 else path[0]
+                    if hop in self.index:
+                        row[self.index[destination]] = self.index[hop]
+        self._header[0] += 1  # Odd: write in progress
+        self._next_hops[:] = next_hops
+        self._header[0] += 1
+
+    def version(self):
+        """
+        Returns the version of the published tables.
+
+        Returns:
+            int: The number of publications so far.
+        """
+        return int(self._header[0]) // 2
+
+    def heartbeats(self):
+        """
+        Returns the last heartbeat timestamp of every node that has sent one.
+
+        Returns:
+            dict: time.time() timestamps keyed by node name.
+        """
+        return {self.names[index]: float(value) for index, value in enumerate(self._heartbeats.tolist()) if value}
+
+    def close(self):
+        """Closes and removes the segment."""
+
+        self._header = self._heartbeats = self._next_hops = None
+        self.segment.close()
+        self.segment.unlink()
+
+
+class SharedRoutingReader:
+    def __init__(self, node_name, segment_name=SEGMENT_NAME):
+        """
+        Attaches to the segment.
+
+        Args:
+            node_name (str): The name of this node.
+            segment_name (str, optional): Name of the shared memory segment (default is 'nsfnet_routes').
+
+        Raises:
+            FileNotFoundError: If the segment does not exist.
+            KeyError: If the node is not part of the segment.
+        """
+        self.node_name = node_name
+        self.segment = _attach(segment_name)
+        self._header = np.ndarray(2, dtype=np.uint64, buffer=self.segment.buf)
+        n = int(self._header[1])
+        names_offset, heartbeats_offset, next_hops_offset, _ = _layout(n)
+        self.names = [bytes(self.segment.buf[names_offset + i * NAME_SIZE:names_offset + (i + 1) * NAME_SIZE])
+                      .rstrip(b"\0").decode() for i in range(n)]
+        self.index = {name: index for index, name in enumerate(self.names)}
+        self.position = self.index[node_name]
+        self._heartbeats = np.ndarray(n, dtype=np.float64, buffer=self.segment.buf, offset=heartbeats_offset)
+        self._row = np.ndarray(n, dtype=np.int32, buffer=self.segment.buf,
+                               offset=next_hops_offset + self.position * n * 4)
+        self._version = None
+        self._table = None
+
+    def version(self):
+        """
+        Returns the version of the published tables.
+
+        Returns:
+            int: The number of publications so far.
+        """
+        return int(self._header[0]) // 2
+
+    def _read_row(self):
+        while True:
+            before = int(self._header[0])
+            if before % 2 == 0:
+                row = self._row.copy()
+                if int(self._header[0]) == before:
+                    return before // 2, row
+            time.sleep(0)
+
+    def next_hop(self, destination):
+        """
+        Returns the next hop towards a destination. The row is only copied again when the version changed.
+
+        Args:
+            destination (str): The name of the destination node.
+
+        Returns:
+            str or None: The name of the next hop (this node if it is the destination), or None if there is
+                         no route or the destination is not part of the segment.
+        """
+        if self._version != self.version():
+            self._version, self._table = self._read_row()
+        index = self.index.get(destination)
+        if index is None or self._table[index] < 0:
+            return None
+        return self.names[self._table[index]]
+
+    def heartbeat(self):
+        """Records a heartbeat for this node."""
+
+        self._heartbeats[self.position] = time.time()
+
+    def close(self):
+        """Detaches from the segment."""
+
+        self._header = self._heartbeats = self._row = self._table = None
+        self.segment.close()
@@ -0,0 +1,335 @@
+"""
+API Documentation
+
+This module provides a versioned binary snapshot format for topologies and routing tables.
+
+A snapshot file is memory-mapped and used through NumPy views, without parsing, so that loading takes
+the same time for any network size and all processes on a host that map the same file share its
+physical pages. Files are replaced atomically (write to a temporary file, then os.replace), so processes
+that still map an older snapshot keep a consistent view of it.
+
+File layout (little-endian, every section aligned to 8 bytes):
+
+    header      magic b"NSFSNAP\\0", format version (u32), flags (u32), node count N (u64),
+                CSR entry count M (u64), then the offsets of the sections below (u64 each)
+    node_ids    int64[N]     node IDs
+    name_index  int64[N+1]   offsets of the node names in the names section
+    names       bytes        UTF-8 node names, concatenated
+    name_order  int32[N]     node indices sorted by name, for lookups by name
+    indptr      int64[N+1]   CSR row pointers; the neighbors of node i are indices[indptr[i]:indptr[i+1]]
+    indices     int32[M]     neighbor node indices
+    bandwidth   float64[M]   link bandwidths
+    weight      float64[M]   link weights
+    next_hop    int32[N*N]   optional: next_hop[i, j] is the index of the next hop from i towards j
+                             (i itself when j == i, -1 when j is unreachable)
+    area        int32[N]     routing area of every node (format version 2)
+    node_type   int32[N]     index of every node's type in type_names (format version 2)
+    type_names  bytes        UTF-8 node types, each followed by a zero byte (format version 2)
+
+Files of format version 1, which have no areas or types, are still read: their nodes are routers of
+area 0.
+
+Classes:
+    TopologySnapshot:
+        A read-only, memory-mapped snapshot.
+
+        Methods:
+            __init__(self, file_name: str):
+                Maps a snapshot file.
+
+            name(self, index: int) -> str:
+                Returns the name of the node at an index.
+
+            node_type(self, index: int) -> str:
+                Returns the type of the node at an index.
+
+            index(self, name: str) -> int:
+                Returns the index of a node by name, or None.
+
+            next_hop(self, source: str, destination: str) -> str:
+                Returns the next hop from source towards destination, or None.
+
+            routing_table(self, source: str) -> dict:
+                Returns the routing table of a node in the format served by the controller.
+
+            to_network(self) -> Network:
+                Builds a Network from the snapshot.
+
+            close(self):
+                Unmaps the file.
+
+Functions:
+    write_snapshot(network: Network or NetworkSnapshot, file_name: str, routing_tables: dict = None):
+        Writes a network, and optionally its routing tables as a next-hop matrix, to a snapshot file.
+"""
+import mmap
+import os
+import struct
+import numpy as np
+from network import Network
+
+MAGIC = b"NSFSNAP\0"
+FORMAT_VERSION = 2
+FLAG_NEXT_HOP = 1
+SECTIONS = ("node_ids", "name_index", "names", "name_order", "indptr", "indices", "bandwidth", "weight",
+            "next_hop", "area", "node_type", "type_names")
+HEADER = struct.Struct("<8sIIQQ" + "Q" * len(SECTIONS))
+# Sections and header of format version 1, which ended with next_hop
+SECTIONS_V1 = SECTIONS[:9]
+HEADER_V1 = struct.Struct("<8sIIQQ" + "Q" * len(SECTIONS_V1))
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def write_snapshot(network, file_name, routing_tables=None):
+    """
+    Writes a network, and optionally its routing tables as a next-hop matrix, to a snapshot file.
+
+    Args:
+        network (Network or NetworkSnapshot): The network, or one of its snapshots.
+        file_name (str): The file to write. It is replaced atomically.
+        routing_tables (dict, optional): Routing tables as computed by the controller, mapping each source
+                                         name to a dict of destination name -> path.
+    """
+    nodes = list(network.nodes.values())
+    position = {node.name: index for index, node in enumerate(nodes)}
+    encoded = [node.name.encode() for node in nodes]
+    name_index = np.zeros(len(nodes) + 1, dtype="<i8")
+    np.cumsum([len(name) for name in encoded], out=name_index[1:])
+    name_order = np.array(sorted(range(len(nodes)), key=encoded.__getitem__), dtype="<i4")
+
+    neighbors = [[] for _ in nodes]
+    for link in network.links:
+        source, destination = position[link.source.name], position[link.destination.name]
+        neighbors[source].append((destination, link.bandwidth))
+        neighbors[destination].append((source, link.bandwidth))
+    indptr = np.zeros(len(nodes) + 1, dtype="<i8")
+    np.cumsum([len(row) for row in neighbors], out=indptr[1:])
+    indices = np.array([neighbor for row in neighbors for neighbor, _ in row], dtype="<i4")
+    bandwidth = np.array([bandwidth for row in neighbors for _, bandwidth in row], dtype="<f8")
+    weight = 1 / bandwidth if len(bandwidth) else bandwidth
+    type_names = sorted({node.node_type for node in nodes})
+    type_index = {node_type: index for index, node_type in enumerate(type_names)}
+
+    sections = {
+        "node_ids": np.array([node.node_id for node in nodes], dtype="<i8").tobytes(),
+        "name_index": name_index.tobytes(),
+        "names": b"".join(encoded),
+        "name_order": name_order.tobytes(),
+        "indptr": indptr.tobytes(),
+        "indices": indices.tobytes(),
+        "bandwidth": bandwidth.tobytes(),
+        "weight": weight.tobytes(),
+        "next_hop": b"",
+        "area": np.array([node.area for node in nodes], dtype="<i4").tobytes(),
+        "node_type": np.array([type_index[node.node_type] for node in nodes], dtype="<i4").tobytes(),
+        "type_names": b"".join(node_type.encode() + b"\0" for node_type in type_names),
+    }
+    flags = 0
+    if routing_tables is not None:
+        flags |= FLAG_NEXT_HOP
+        next_hop = np.full((len(nodes), len(nodes)), -1, dtype="<i4")
+        for source, paths in routing_tables.items():
+            row = next_hop[position[source]]
+            for destination, path in paths.items():
+                # Entries that are not nodes, such as media routes, have no place in the matrix
+                if path and destination in position:
+                    row[position[destination]] = position[path[1] if len(path) > 1 else path[0]]
+        sections["next_hop"] = next_hop.tobytes()
+
+    offsets = []
+    offset = _align(HEADER.size)
+    for name in SECTIONS:
+        offsets.append(offset)
+        offset = _align(offset + len(sections[name]))
+    temp_file = f"{file_name}.{os.getpid()}.tmp"
+    with open(temp_file, "wb") as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, flags, len(nodes), len(indices), *offsets))
+        for name, section_offset in zip(SECTIONS, offsets):
+            file.seek(section_offset)
+            file.write(sections[name])
+        file.truncate(offset)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_file, file_name)
+
+
+class TopologySnapshot:
+    def __init__(self, file_name):
+        """
+        Maps a snapshot file. The arrays of the snapshot are exposed as read-only NumPy views:
+        node_ids, areas, indptr, indices, bandwidth, weight and next_hops (an N x N matrix, or None).
+
+        Args:
+            file_name (str): The snapshot file.
+        """
+        self.file_name = file_name
+        with open(file_name, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = struct.unpack_from("<8sI", self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{file_name} is not a topology snapshot")
+        if version not in (1, FORMAT_VERSION):
+            raise ValueError(f"Unsupported snapshot format version: {version}")
+        header, sections = (HEADER, SECTIONS) if version == FORMAT_VERSION else (HEADER_V1, SECTIONS_V1)
+        _, _, self.flags, self.node_count, self.entry_count, *offsets = header.unpack_from(self._mmap)
+        self._offsets = dict(zip(sections, offsets))
+        n, m = self.node_count, self.entry_count
+        self.node_ids = self._view("node_ids", "<i8", n)
+        if version == FORMAT_VERSION:
+            self.areas = self._view("area", "<i4", n)
+            self._node_types = self._view("node_type", "<i4", n)
+            # type_names is the last section: every node type index refers to one of its first names
+            type_count = int(self._node_types.max()) + 1 if n else 0
+            self._type_names = [name.decode() for name in
+                                self._mmap[self._offsets["type_names"]:].split(b"\0")[:type_count]]
+        else:
+            self.areas = np.zeros(n, dtype="<i4")
+            self._node_types = np.zeros(n, dtype="<i4")
+            self._type_names = ["router"]
+        self._name_index = self._view("name_index", "<i8", n + 1)
+        self._name_order = self._view("name_order", "<i4", n)
+        self.indptr = self._view("indptr", "<i8", n + 1)
+        self.indices = self._view("indices", "<i4", m)
+        self.bandwidth = self._view("bandwidth", "<f8", m)
+        self.weight = self._view("weight", "<f8", m)
+        self.next_hops = None
+        if self.flags & FLAG_NEXT_HOP:
+            self.next_hops = self._view("next_hop", "<i4", n * n).reshape(n, n)
+
+    def _view(self, section, dtype, count):
+        return np.frombuffer(self._mmap, dtype=dtype, count=count, offset=self._offsets[section])
+
+    def name(self, index):
+        """
+        Returns the name of the node at an index.
+
+        Args:
+            index (int): The node index.
+
+        Returns:
+            str: The node name.
+        """
+        start = self._offsets["names"]
+        return self._mmap[start + int(self._name_index[index]):start + int(self._name_index[index + 1])].decode()
+
+    def node_type(self, index):
+        """
+        Returns the type of the node at an index.
+
+        Args:
+            index (int): The node index.
+
+        Returns:
+            str: The node type, e.g. 'router'.
+        """
+        return self._type_names[int(self._node_types[index])]
+
+    def index(self, name):
+        """
+        Returns the index of a node by name, with a binary search over the sorted names.
+
+        Args:
+            name (str): The node name.
+
+        Returns:
+            int or None: The node index, or None if the node is not in the snapshot.
+        """
+        key = name.encode()
+        start = self._offsets["names"]
+        low, high = 0, self.node_count
+        while low < high:
+            middle = (low + high) // 2
+            index = int(self._name_order[middle])
+            candidate = self._mmap[start + int(self._name_index[index]):start + int(self._name_index[index + 1])]
+            if candidate < key:
+                low = middle + 1
+            elif candidate > key:
+                high = middle
+            else:
+                return index
+        return None
+
+    def next_hop_index(self, source_index, destination_index):
+        """
+        Returns the index of the next hop from one node index towards another.
+
+        Args:
+            source_index (int): The index of the source node.
+            destination_index (int): The index of the destination node.
+
+        Returns:
+            int: The index of the next hop, the source itself if it is the destination, -1 if unreachable.
+        """
+        return int(self.next_hops[source_index, destination_index])
+
+    def next_hop(self, source, destination):
+        """
+        Returns the next hop from source towards destination.
+
+        Args:
+            source (str): The name of the source node.
+            destination (str): The name of the destination node.
+
+        Returns:
+            str or None: The name of the next hop (source itself if it is the destination), or None if
+                         there is no route or the snapshot has no next-hop matrix.
+        """
+        if self.next_hops is None:
+            return None
+        source_index, destination_index = self.index(source), self.index(destination)
+        if source_index is None or destination_index is None:
+            return None
+        hop = self.next_hop_index(source_index, destination_index)
+        return self.name(hop) if hop >= 0 else None
+
+    def routing_table(self, source):
+        """
+        Returns the routing table of a node in the format served by the controller. Paths are cut to the
+        next hop, [source, next_hop], which is all the nodes use.
+
+        Args:
+            source (str): The name of the node.
+
+        Returns:
+            dict or None: Destination name -> path, or None if the node or the next-hop matrix is missing.
+        """
+        source_index = self.index(source) if self.next_hops is not None else None
+        if source_index is None:
+            return None
+        table = {}
+        for destination_index, hop in enumerate(self.next_hops[source_index].tolist()):
+            if hop == source_index:
+                table[self.name(destination_index)] = [source]
+            elif hop >= 0:
+                table[self.name(destination_index)] = [source, self.name(hop)]
+        return table
+
+    def to_network(self):
+        """
+        Builds a Network from the snapshot with Network.bulk_load, with the node types and areas.
+
+        Returns:
+            Network: The network.
+        """
+        names = [self.name(index) for index in range(self.node_count)]
+        node_types = [self.node_type(index) for index in range(self.node_count)]
+        node_ids = self.node_ids.tolist()
+        sources = np.repeat(np.arange(self.node_count), np.diff(self.indptr))
+        # Every link is stored in both directions; keep the one from the lower index
+        keep = sources < self.indices
+        links = zip([node_ids[i] for i in sources[keep].tolist()],
+                    [node_ids[i] for i in self.indices[keep].tolist()],
+                    self.bandwidth[keep].tolist())
+        network = Network()
+        network.bulk_load(zip(node_ids, names, node_types, self.areas.tolist()), links)
+        return network
+
+    def close(self):
+        """Unmaps the file. The NumPy views must not be used afterwards."""
+
+        self.node_ids = self.indptr = self.indices = self.bandwidth = self.weight = self.next_hops = None
+        self.areas = self._node_types = self._name_index = self._name_order = None
+        self._mmap.close()
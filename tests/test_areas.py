@@ -0,0 +1,75 @@
+import random
+
+import networkx as nx
+import pytest
+
+import areas
+import topology
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    # Small areas, so that a few hundred nodes make a hierarchy of ten areas
+    monkeypatch.setattr(topology, "AREA_SIZE", 40)
+    return topology.generate_topology("multi_area", 400, seed=3).graph
+
+
+def next_hop(table, destination):
+    path = table.get(destination) or areas.summary_route(table, destination)
+    if path is None:
+        return None
+    return path[1] if len(path) > 1 else path[0]
+
+
+def forward(tables, source, destination):
+    # Follows the next hops hop by hop, as the nodes do; returns the visited nodes, or None on a loop
+    visited = [source]
+    while visited[-1] != destination:
+        hop = next_hop(tables[visited[-1]], destination)
+        if hop is None or hop in visited:
+            return None
+        visited.append(hop)
+    return visited
+
+
+def test_hop_by_hop_forwarding_is_loop_free(graph):
+    assert areas.is_hierarchical(graph) and nx.is_connected(graph)
+    tables = areas.area_routing_tables(graph)
+    rng = random.Random(0)
+    nodes = sorted(graph)
+    for _ in range(3000):
+        source, destination = rng.sample(nodes, 2)
+        route = forward(tables, source, destination)
+        assert route is not None, f"no loop-free route from {source} to {destination}"
+        assert all(graph.has_edge(u, v) for u, v in zip(route, route[1:]))
+
+
+def test_tables_only_list_their_own_area(graph):
+    tables = areas.area_routing_tables(graph)
+    area_of = dict(graph.nodes(data="area"))
+    source = sorted(graph)[0]
+    destinations = [key for key in tables[source] if "/" not in key]
+    assert destinations and all(area_of[destination] == area_of[source] for destination in destinations)
+    assert len(tables[source]) < len(graph) / 2
+
+
+def test_expanded_summaries_keep_the_next_hops(graph):
+    tables = areas.area_routing_tables(graph)
+    expanded = areas.expand_summaries(tables, graph)
+    for source in sorted(graph)[:20]:
+        assert set(expanded[source]) | {source} >= set(graph) - {source}
+        for destination in graph:
+            if destination != source:
+                assert expanded[source][destination][1] == next_hop(tables[source], destination)
+
+
+def test_border_router_is_chosen_by_total_distance():
+    graph = nx.Graph()
+    graph.add_nodes_from(["10.0.0.1", "10.0.0.2", "10.0.0.3"], area=0)
+    graph.add_nodes_from(["10.0.1.1", "10.0.1.2"], area=1)
+    # 10.0.0.1 is next to border 10.0.0.2, whose inter-area link is expensive, and two hops from 10.0.0.3
+    graph.add_weighted_edges_from([("10.0.0.1", "10.0.0.2", 1), ("10.0.0.2", "10.0.0.3", 1),
+                                   ("10.0.0.1", "10.0.0.3", 3), ("10.0.0.2", "10.0.1.1", 10),
+                                   ("10.0.0.3", "10.0.1.2", 1), ("10.0.1.1", "10.0.1.2", 1)])
+    tables = areas.area_routing_tables(graph)
+    assert forward(tables, "10.0.0.1", "10.0.1.1") == ["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.1.2", "10.0.1.1"]
@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+
+import capacity_planner
+from capacity_planner import CapacityPlanner, random_demands
+from network import Network
+
+
+def barbell():
+    # Two triangles of 1000 Gbps links joined by one 100 Gbps link between 10.0.0.3 and 10.0.0.4
+    network = Network()
+    with network.batch():
+        for node_id in range(1, 7):
+            network.add_node(node_id, f"10.0.0.{node_id}")
+        for source, destination in ((1, 2), (2, 3), (1, 3), (4, 5), (5, 6), (4, 6)):
+            network.add_link(source, destination, 1000)
+        network.add_link(3, 4, 100)
+    return network
+
+
+def indexes(planner, *names):
+    return np.array([planner.index[name] for name in names], dtype=np.int32)
+
+
+def test_route_follows_the_routing_tables():
+    planner = CapacityPlanner(barbell())
+    tables = {"10.0.0.1": {"10.0.0.5": ["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.4", "10.0.0.5"]},
+              "10.0.0.2": {"10.0.0.5": ["10.0.0.2", "10.0.0.3", "10.0.0.4", "10.0.0.5"]},
+              "10.0.0.3": {"10.0.0.5": ["10.0.0.3", "10.0.0.4", "10.0.0.5"]},
+              "10.0.0.4": {"10.0.0.5": ["10.0.0.4", "10.0.0.5"]}}
+    loads, unrouted = planner.route(planner.next_hop_matrix(tables), indexes(planner, "10.0.0.1", "10.0.0.6"),
+                                    indexes(planner, "10.0.0.5", "10.0.0.5"), np.array([50.0, 7.0]))
+    # The demand of 10.0.0.6 has no table entry
+    assert unrouted == 7.0
+    used = {(planner.names[tail], planner.names[head]): load
+            for tail, head, load in zip(planner.tails, planner.heads, loads) if load}
+    assert used == {("10.0.0.1", "10.0.0.2"): 50.0, ("10.0.0.2", "10.0.0.3"): 50.0,
+                    ("10.0.0.3", "10.0.0.4"): 50.0, ("10.0.0.4", "10.0.0.5"): 50.0}
+
+
+def test_shortest_paths_and_saturation_report():
+    planner = CapacityPlanner(barbell())
+    destinations = indexes(planner, "10.0.0.6")
+    loads, unrouted = planner.route(planner.shortest_next_hops(planner.weights, destinations),
+                                    indexes(planner, "10.0.0.1"), destinations, np.array([80.0]))
+    assert unrouted == 0
+    first = planner.saturation_report(loads, 1)[0]
+    assert (first["source"], first["destination"]) == ("10.0.0.3", "10.0.0.4")
+    assert first["utilization"] == pytest.approx(0.8) and first["saturation_factor"] == pytest.approx(1.25)
+
+
+def test_bottleneck_cut_bounds_the_balanced_flow():
+    planner = CapacityPlanner(barbell())
+    balanced = planner.balance(indexes(planner, "10.0.0.1", "10.0.0.2"), indexes(planner, "10.0.0.5", "10.0.0.6"),
+                               np.array([100.0, 200.0]))
+    # Every flow crosses the 100 Gbps link, so the cut bound is exact
+    assert balanced["lower_bound"] == pytest.approx(3.0)
+    assert balanced["max_utilization"] == pytest.approx(3.0)
+
+
+def test_balancing_splits_demands_and_stays_above_the_bound():
+    network = Network()
+    with network.batch():
+        for node_id in range(1, 5):
+            network.add_node(node_id, f"10.0.0.{node_id}")
+        # Two equally wide routes from 10.0.0.1 to 10.0.0.4, one of them slightly shorter
+        network.add_link(1, 2, 1000)
+        network.add_link(2, 4, 1000)
+        network.add_link(1, 3, 999)
+        network.add_link(3, 4, 999)
+    planner = CapacityPlanner(network)
+    origins, destinations, demands = indexes(planner, "10.0.0.1"), indexes(planner, "10.0.0.4"), np.array([1000.0])
+    single, _ = planner.route(planner.shortest_next_hops(planner.weights, destinations), origins, destinations,
+                              demands)
+    balanced = planner.balance(origins, destinations, demands, iterations=30)
+    assert (single / planner.capacities).max() == pytest.approx(1.0)
+    assert balanced["max_utilization"] < 0.6
+    assert 0.45 < balanced["lower_bound"] <= balanced["max_utilization"]
+
+
+def test_balancing_stops_within_the_tolerance():
+    planner = CapacityPlanner(barbell())
+    balanced = planner.balance(indexes(planner, "10.0.0.1", "10.0.0.2"), indexes(planner, "10.0.0.5", "10.0.0.6"),
+                               np.array([100.0, 200.0]), iterations=30, tolerance=0.05)
+    # The shortest paths already meet the cut bound
+    assert balanced["iterations"] == 0
+
+
+def grid(side):
+    network = Network()
+    with network.batch():
+        for node_id in range(1, side * side + 1):
+            network.add_node(node_id, f"10.0.{node_id // 256}.{node_id % 256}")
+        for node_id in range(1, side * side + 1):
+            if node_id % side:
+                network.add_link(node_id, node_id + 1, 100 if node_id % 3 else 400)
+            if node_id + side <= side * side:
+                network.add_link(node_id, node_id + side, 100 if node_id % 4 else 400)
+    return network
+
+
+def test_blocks_of_destinations_conserve_the_flow(monkeypatch):
+    planner = CapacityPlanner(grid(7))
+    origins, destinations, demands = random_demands(planner, 2000, 5000.0)
+    assert len(np.unique(destinations)) > capacity_planner.BLOCK_DESTINATIONS
+    single, _ = planner.route(planner.shortest_next_hops(planner.weights, np.unique(destinations)), origins,
+                              destinations, demands)
+    balanced = planner.balance(origins, destinations, demands, iterations=5, tolerance=0.0)
+    assert balanced["iterations"] == 5
+    assert balanced["lower_bound"] <= balanced["max_utilization"] < (single / planner.capacities).max()
+    # Every node sends out, net, what it originates minus what it receives
+    loads = balanced["loads"]
+    net = (np.bincount(planner.tails, weights=loads, minlength=len(planner.names))
+           - np.bincount(planner.heads, weights=loads, minlength=len(planner.names)))
+    expected = (np.bincount(origins, weights=demands, minlength=len(planner.names))
+                - np.bincount(destinations, weights=demands, minlength=len(planner.names)))
+    assert net == pytest.approx(expected, abs=1e-6)
+    # Link directions are found the same way without the node x node matrix
+    monkeypatch.setattr(capacity_planner, "DENSE_ARC_NODES", 0)
+    sparse = CapacityPlanner(grid(7))
+    assert sparse._arc_matrix is None
+    sparse_loads, _ = sparse.route(sparse.shortest_next_hops(sparse.weights, np.unique(destinations)), origins,
+                                   destinations, demands)
+    assert sparse_loads == pytest.approx(single)
+
+
+def test_random_demands_sum_to_the_total():
+    planner = CapacityPlanner(barbell())
+    origins, destinations, demands = random_demands(planner, 500, 1234.0)
+    assert demands.sum() == pytest.approx(1234.0)
+    assert not np.any(origins == destinations)
@@ -0,0 +1,51 @@
+import socket
+import struct
+import threading
+import time
+
+import framing
+from controllerserver import TCPServer
+
+
+def open_session(server, node_name):
+    controller_end, node_end = socket.socketpair()
+    session = [controller_end, threading.Lock(), 0]
+    server.sessions[node_name] = session
+    return session, node_end
+
+
+def test_push_sends_deltas_and_full_tables():
+    server = TCPServer("localhost", 0, "dijkstra")
+    current, current_node = open_session(server, "10.0.0.1")
+    behind, behind_node = open_session(server, "10.0.0.2")
+    behind[2] = None
+    tables = {"10.0.0.1": {"10.0.0.3": ["10.0.0.1", "10.0.0.3"]}, "10.0.0.2": {}}
+    server.push_routing_tables(1, {"10.0.0.1": {"10.0.0.3": ["10.0.0.1", "10.0.0.3"]}}, tables)
+    assert framing.recv_json(current_node) == {"type": "delta", "version": 1,
+                                               "changes": {"10.0.0.3": ["10.0.0.1", "10.0.0.3"]}}
+    assert framing.recv_json(behind_node) == {"type": "table", "version": 1, "table": {}}
+    assert current[2] == behind[2] == 1
+
+
+def test_stalled_session_is_dropped_without_blocking_others():
+    server = TCPServer("localhost", 0, "dijkstra")
+    stalled, stalled_node = open_session(server, "10.0.0.1")
+    # The send timeout that handle_session sets, shortened
+    stalled[0].setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, struct.pack("ll", 1, 0))
+    stalled[0].setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+    healthy, healthy_node = open_session(server, "10.0.0.2")
+    healthy[2] = 1
+    big_table = {f"10.1.{index // 256}.{index % 256}": ["10.0.0.1", "10.0.0.5"] for index in range(20000)}
+    tables = {"10.0.0.1": big_table, "10.0.0.2": {}}
+    pusher = threading.Thread(target=server.push_routing_tables, args=(2, {"10.0.0.1": big_table}, tables))
+    pusher.start()
+    # Readers of the tables are not held up by the push
+    time.sleep(0.2)
+    assert server.tables_lock.acquire(timeout=0.5)
+    server.tables_lock.release()
+    pusher.join(10)
+    assert not pusher.is_alive()
+    assert "10.0.0.1" not in server.sessions
+    assert "10.0.0.2" in server.sessions and healthy[2] == 2
+    stalled_node.close()
+    healthy_node.close()
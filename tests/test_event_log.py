@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from event_log import EventLog
+from network import Network
+
+
+def names(network):
+    return sorted(node.name for node in network.nodes.values())
+
+
+def start(directory, network=None, snapshot_every=2):
+    log = EventLog(str(directory), snapshot_every=snapshot_every)
+    network = network if network is not None else Network()
+    log.open(network.snapshot())
+    network.journal = log.append
+    return log, network
+
+
+def restart(directory, snapshot_every=2):
+    log = EventLog(str(directory), snapshot_every=snapshot_every)
+    network = log.load()
+    return start(directory, network, snapshot_every)
+
+
+def last_segment(directory):
+    return sorted(path for path in os.listdir(directory) if path.startswith("events."))[-1]
+
+
+def test_restart_replays_the_tail_after_the_snapshot(tmp_path):
+    log, network = start(tmp_path, snapshot_every=3)
+    network.add_node(1, "10.0.0.1")
+    network.add_node(2, "10.0.0.2")
+    network.add_link(1, 2, 1000)
+    network.add_node(3, "10.0.0.3")
+    network.set_bandwidth(1, 2, 500)
+    log.close()
+    restored = EventLog(str(tmp_path)).load()
+    assert names(restored) == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+    assert [link.bandwidth for link in restored.links] == [500]
+
+
+def test_compaction_deletes_covered_segments(tmp_path):
+    log, network = start(tmp_path)
+    for node_id in range(1, 8):
+        network.add_node(node_id, f"10.0.0.{node_id}")
+    log.close()
+    segments = [path for path in os.listdir(tmp_path) if path.startswith("events.")]
+    assert len(segments) <= 2
+    assert names(EventLog(str(tmp_path)).load()) == [f"10.0.0.{node_id}" for node_id in range(1, 8)]
+
+
+@pytest.mark.parametrize("partial", ['{"sequence":3,"ev', '{"sequence":3,"events":[]}'])
+def test_entries_after_a_cut_first_entry_are_kept(tmp_path, partial):
+    log, network = start(tmp_path)
+    network.add_node(1, "10.0.0.1")
+    network.add_node(2, "10.0.0.2")
+    log.close()
+    # A crash while writing the first entry of the segment the rollover started
+    with open(tmp_path / last_segment(tmp_path), "a") as file:
+        file.write(partial)
+    log, network = restart(tmp_path)
+    network.add_node(3, "10.0.0.3")
+    log.close()
+    assert names(EventLog(str(tmp_path)).load()) == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+
+
+def test_entries_after_a_cut_last_entry_are_kept(tmp_path):
+    log, network = start(tmp_path, snapshot_every=10)
+    network.add_node(1, "10.0.0.1")
+    log.close()
+    with open(tmp_path / last_segment(tmp_path), "a") as file:
+        file.write('{"sequence":2,"events":[{"event":"node_add')
+    log, network = restart(tmp_path, snapshot_every=10)
+    network.add_node(2, "10.0.0.2")
+    network.add_node(3, "10.0.0.3")
+    log.close()
+    assert names(EventLog(str(tmp_path)).load()) == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
@@ -0,0 +1,81 @@
+import collections
+import random
+
+import networkx as nx
+import pytest
+
+import failure_analysis
+from failure_analysis import _baseline, _evaluate, _source_routes, _start_worker, failure_scenarios
+
+
+def from_scratch(graph, demands, scenario):
+    # Every surviving source recomputed on the failed topology, compared on the pairs reachable before
+    failed_nodes = {name for kind, name in scenario if kind == "node"}
+    failed_links = [name for kind, name in scenario if kind == "link"]
+    view = nx.restricted_view(graph, failed_nodes, failed_links)
+    loads = collections.Counter()
+    unreachable = 0
+    stretches = []
+    for source in view:
+        before = nx.single_source_dijkstra_path_length(graph, source, weight="weight")
+        routes = _source_routes(view, source, demands)
+        loads.update(routes["loads"])
+        for destination, distance in before.items():
+            if destination == source or destination in failed_nodes:
+                continue
+            if destination in routes["distances"]:
+                stretches.append(routes["distances"][destination] / distance)
+            else:
+                unreachable += 1
+    max_utilization = max((load * view[source][destination]["weight"]
+                           for (source, destination), load in loads.items()), default=0.0)
+    return {"unreachable_pairs": unreachable, "mean_stretch": sum(stretches) / len(stretches) if stretches else None,
+            "max_utilization": max_utilization}
+
+
+def random_graph(seed, components):
+    generator = random.Random(seed)
+    graph = nx.Graph()
+    for component in range(components):
+        part = nx.gnm_random_graph(6, 9, seed=seed * 10 + component)
+        graph.add_weighted_edges_from((f"{component}.{u}", f"{component}.{v}", 1 / generator.choice([1, 2, 5]))
+                                      for u, v in part.edges)
+    return graph
+
+
+@pytest.mark.parametrize("seed,components", [(1, 1), (2, 1), (3, 2), (4, 2)])
+def test_incremental_evaluation_matches_a_full_recomputation(seed, components):
+    graph = random_graph(seed, components)
+    generator = random.Random(seed)
+    demands = {(origin, destination): generator.random() for origin in graph for destination in graph
+               if origin != destination}
+    _start_worker(graph, demands, *_baseline(graph, demands))
+    try:
+        for scenario in failure_scenarios(graph, double=True):
+            result = _evaluate(scenario)
+            expected = from_scratch(graph, demands, scenario)
+            assert result["unreachable_pairs"] == expected["unreachable_pairs"], scenario
+            assert result["mean_stretch"] == pytest.approx(expected["mean_stretch"]), scenario
+            assert result["max_utilization"] == pytest.approx(expected["max_utilization"]), scenario
+    finally:
+        failure_analysis._state = None
+
+
+def test_failed_leaf_does_not_recompute_the_other_sources(monkeypatch):
+    # A path a-b-c-d: c is interior to the trees of a and b, and d is a leaf of every other tree
+    graph = nx.path_graph(["a", "b", "c", "d"])
+    nx.set_edge_attributes(graph, 1.0, "weight")
+    demands = {(origin, destination): 1.0 for origin in graph for destination in graph if origin != destination}
+    _start_worker(graph, demands, *_baseline(graph, demands))
+    recomputed = []
+    source_routes = failure_analysis._source_routes
+    monkeypatch.setattr(failure_analysis, "_source_routes",
+                        lambda view, source, demands: recomputed.append(source) or source_routes(view, source, demands))
+    try:
+        result = _evaluate((("node", "d"),))
+        assert recomputed == []
+        assert result["unreachable_pairs"] == 0 and result["mean_stretch"] == 1.0
+        # Without the demands to d, every link direction of a-b-c carries two demands
+        assert result["max_utilization"] == pytest.approx(2.0)
+    finally:
+        failure_analysis._state = None
@@ -0,0 +1,74 @@
+import time
+from loadgen import LoadGenerator, client_ports, percentile
+
+
+class RecordingGenerator(LoadGenerator):
+    # Records when each message would be sent, without sockets
+    def __init__(self, port_mapping):
+        super().__init__(port_mapping, None, in_flight=4, timeout=0.0, encrypt=False)
+        self.sends = []
+
+    def _listen(self, destination):
+        pass
+
+    def _send(self, request, message_id, payload):
+        self.sends.append((request["destination"], time.perf_counter()))
+
+
+def test_client_ports_of_nsfnet_nodes():
+    ports = client_ports({"10.0.0.1": 9011, "10.0.0.14": 9024})
+    assert ports == {"10.0.0.1": 7001, "10.0.0.14": 7014}
+
+
+def test_client_ports_do_not_collide_with_node_ports_on_large_topologies():
+    port_mapping = {f"n{node_id}": 9010 + node_id for node_id in range(1, 5001)}
+    ports = client_ports(port_mapping)
+    assert len(set(ports.values())) == len(port_mapping)
+    assert not set(ports.values()) & set(port_mapping.values())
+
+
+def test_paced_request_does_not_block_later_requests():
+    generator = RecordingGenerator({"a": 9011, "b": 9012, "c": 9013})
+    started = time.perf_counter()
+    generator.run([{"origin": "a", "destination": "b", "count": 5, "rate": 10},
+                   {"origin": "a", "destination": "c", "count": 1}])
+    sends = {destination: [] for destination in ("b", "c")}
+    for destination, sent in generator.sends:
+        sends[destination].append(sent - started)
+    assert len(sends["b"]) == 5
+    assert sends["c"][0] < 0.2  # Not after the 0.4 s that the paced request lasts
+    assert sends["b"][-1] >= 0.35
+
+
+def test_requests_are_read_as_the_active_ones_finish():
+    read = []
+    payloads = []
+
+    class StreamingGenerator(RecordingGenerator):
+        def _payload(self, request):
+            payloads.append(request)
+            return b""
+
+        def _send(self, request, message_id, payload):
+            self.sends.append(len(read))
+
+    generator = StreamingGenerator({"a": 9011, "b": 9012})
+    generator.max_active = 4
+    generator.in_flight = 1  # Messages are sent one at a time, in dispatch order
+
+    def requests():
+        for index in range(1000):
+            read.append(index)
+            yield {"origin": "a", "destination": "b", "count": 2}
+
+    generator.run(requests())
+    assert len(generator.sends) == 2000
+    # The first message is sent with no more than max_active requests read
+    assert generator.sends[0] <= 4
+    # A payload is built for every message, when it is sent
+    assert len(payloads) == 2000
+
+
+def test_percentile_interpolates():
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([], 99) is None
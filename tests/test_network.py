@@ -0,0 +1,74 @@
+import pytest
+
+from network import Network
+
+
+def triangle():
+    network = Network()
+    with network.batch():
+        for node_id in (1, 2, 3):
+            network.add_node(node_id, f"10.0.0.{node_id}")
+        network.add_link(1, 2, 1000)
+        network.add_link(2, 3, 500)
+        network.add_link(1, 3, 250)
+    return network
+
+
+def test_snapshot_is_isolated_from_later_changes():
+    network = triangle()
+    before = network.snapshot()
+    network.remove_node("10.0.0.3")
+    network.set_bandwidth(1, 2, 2000)
+    network.add_node(4, "10.0.0.4")
+    network.add_link(2, 4, 100)
+    assert sorted(before.graph.nodes) == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+    assert sorted(before.graph["10.0.0.3"]) == ["10.0.0.1", "10.0.0.2"]
+    assert before.graph["10.0.0.1"]["10.0.0.2"]["weight"] == 1 / 1000
+    assert [link.bandwidth for link in before.links] == [1000, 500, 250]
+    assert sorted(before.nodes) == [1, 2, 3]
+    after = network.snapshot()
+    assert sorted(after.graph.nodes) == ["10.0.0.1", "10.0.0.2", "10.0.0.4"]
+    assert after.graph["10.0.0.1"]["10.0.0.2"]["weight"] == 1 / 2000
+    assert [(link.source.name, link.destination.name) for link in after.links] == [
+        ("10.0.0.1", "10.0.0.2"), ("10.0.0.2", "10.0.0.4")]
+
+
+def test_snapshot_cannot_be_modified():
+    snapshot = triangle().snapshot()
+    with pytest.raises(TypeError):
+        snapshot.nodes[4] = None
+    with pytest.raises(Exception):
+        snapshot.graph.add_node("10.0.0.9")
+
+
+def test_batch_publishes_one_version():
+    network = triangle()
+    version = network.version
+    with network.batch():
+        network.remove_node("10.0.0.1")
+        network.remove_node("10.0.0.2")
+        assert network.version == version
+    assert network.version == version + 1
+    assert list(network.graph.nodes) == ["10.0.0.3"]
+    assert network.links == ()
+
+
+def test_failed_batch_is_discarded():
+    network = triangle()
+    before = network.snapshot()
+    with pytest.raises(RuntimeError):
+        with network.batch():
+            network.remove_node("10.0.0.1")
+            raise RuntimeError
+    assert network.snapshot() is before
+
+
+def test_node_removed_and_added_back_in_one_batch_keeps_new_links():
+    network = triangle()
+    with network.batch():
+        network.remove_node("10.0.0.3")
+        network.add_node(3, "10.0.0.3")
+        network.add_link(1, 3, 800)
+    assert [(link.source.node_id, link.destination.node_id, link.bandwidth) for link in network.links] == [
+        (1, 2, 1000), (1, 3, 800)]
+    assert sorted(network.graph["10.0.0.3"]) == ["10.0.0.1"]
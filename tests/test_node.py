@@ -0,0 +1,66 @@
+import json
+import socket
+import threading
+
+import pytest
+
+import node1
+
+
+class FakeController:
+    # Answers every request on an ephemeral port with the reply function's JSON
+    def __init__(self, reply):
+        self.reply = reply
+        self.requests = []
+        self.socket = socket.create_server(("localhost", 0))
+        self.port = self.socket.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                client_socket, _ = self.socket.accept()
+            except OSError:
+                return
+            with client_socket:
+                self.requests.append(client_socket.recv(65536))
+                client_socket.sendall(json.dumps(self.reply()).encode())
+
+    def close(self):
+        self.socket.close()
+
+
+@pytest.fixture
+def controllers():
+    started = []
+    yield lambda reply: started.append(FakeController(reply)) or started[-1]
+    for controller in started:
+        controller.close()
+
+
+def make_node(port, monkeypatch):
+    monkeypatch.setattr(node1, "client_port", 7001, raising=False)
+    return node1.TCPNode("10.0.0.1", "localhost", port, 0, [])
+
+
+def test_wrong_shard_is_followed_once(controllers, monkeypatch):
+    owner = controllers(lambda: {"version": 3, "table": {"10.0.0.2": ["10.0.0.1", "10.0.0.2"]}, "nonce": "00" * 16})
+    other = controllers(lambda: {"error": "wrong shard", "port": owner.port})
+    node = make_node(other.port, monkeypatch)
+    node.connect_to_server()
+    assert node.server_port == owner.port and node.session_port == owner.port + 1
+    assert node.table_version == 3 and node.routing_table == {"10.0.0.2": ["10.0.0.1", "10.0.0.2"]}
+    assert node.session_key is not None
+    assert len(other.requests) == 1 and len(owner.requests) == 1
+    # The handshake is made again with the owner, not continued with the key the other shard saw
+    assert owner.requests[0].startswith(b"HELLO") and owner.requests[0] != other.requests[0]
+
+
+def test_repeated_rejection_stops_after_one_retry(controllers, monkeypatch, capsys):
+    first = controllers(lambda: {"error": "wrong shard", "port": second.port})
+    second = controllers(lambda: {"error": "wrong shard", "port": first.port})
+    node = make_node(first.port, monkeypatch)
+    node.connect_to_server()
+    assert len(first.requests) == 1 and len(second.requests) == 1
+    assert node.routing_table is None and node.session_key is None
+    assert "rejected node 10.0.0.1 again" in capsys.readouterr().out
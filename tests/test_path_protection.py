@@ -0,0 +1,127 @@
+import concurrent.futures
+import itertools
+import random
+import threading
+import types
+
+import networkx as nx
+
+import path_protection
+from path_protection import PROTECTION_PREFIX, PathCache, add_protection_routes, compute_paths, disjoint_paths
+
+
+def trap_graph():
+    # The shortest path s-a-b-t blocks every other path, but s-a-t and s-b-t are disjoint
+    graph = nx.Graph()
+    graph.add_weighted_edges_from([("s", "a", 1), ("a", "b", 1), ("b", "t", 1), ("s", "b", 3), ("a", "t", 3)])
+    return graph
+
+
+def best_disjoint_pair(graph, source, destination):
+    def weight(path):
+        return sum(graph[u][v]["weight"] for u, v in zip(path, path[1:]))
+
+    paths = list(nx.all_simple_paths(graph, source, destination))
+    pairs = [weight(first) + weight(second) for first, second in itertools.combinations(paths, 2)
+             if not set(first[1:-1]) & set(second[1:-1])]
+    return min(pairs, default=None)
+
+
+def test_suurballe_finds_the_disjoint_pair_that_the_shortest_path_blocks():
+    first, second = disjoint_paths(trap_graph(), "s", "t")
+    assert sorted([first, second]) == [["s", "a", "t"], ["s", "b", "t"]]
+
+
+def test_suurballe_pairs_are_disjoint_and_of_least_total_weight():
+    generator = random.Random(7)
+    for seed in range(20):
+        graph = nx.gnm_random_graph(8, 14, seed=seed)
+        for u, v in graph.edges:
+            graph[u][v]["weight"] = generator.randint(1, 9)
+        graph = nx.relabel_nodes(graph, str)
+        for source, destination in [("0", "7"), ("1", "5"), ("2", "6")]:
+            pair = disjoint_paths(graph, source, destination)
+            best = best_disjoint_pair(graph, source, destination)
+            if best is None:
+                assert pair is None
+                continue
+            first, second = pair
+            assert first[0] == second[0] == source and first[-1] == second[-1] == destination
+            assert not set(first[1:-1]) & set(second[1:-1])
+            assert all(graph.has_edge(u, v) for path in pair for u, v in zip(path, path[1:]))
+            assert nx.path_weight(graph, first, "weight") + nx.path_weight(graph, second, "weight") == best
+
+
+def test_protection_routes_avoid_the_routed_path():
+    graph = trap_graph()
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        path_table = compute_paths(graph, 3, executor=executor)
+    routing_tables = {"s": {"t": ["s", "a", "b", "t"], "s": ["s"]}}
+    add_protection_routes(routing_tables, path_table)
+    # No path avoids both a and b, so the protection path only leaves over another next hop
+    assert routing_tables["s"][PROTECTION_PREFIX + "t"][1] == "b"
+    assert PROTECTION_PREFIX + "s" not in routing_tables["s"]
+
+
+def test_protection_routes_skip_removed_links():
+    graph = trap_graph()
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        path_table = compute_paths(graph, 3, executor=executor)
+    current = graph.copy()
+    current.remove_edge("b", "t")
+    routing_tables = {"s": {"t": ["s", "a", "t"]}}
+    add_protection_routes(routing_tables, path_table, current)
+    assert PROTECTION_PREFIX + "t" not in routing_tables["s"]
+    add_protection_routes(routing_tables, path_table)
+    assert routing_tables["s"][PROTECTION_PREFIX + "t"] == ["s", "b", "t"]
+
+
+def test_compute_async_calls_done_for_the_latest_version_only():
+    cache = PathCache(k=2, workers=1)
+    cache.executor = concurrent.futures.ThreadPoolExecutor(1)
+    done = []
+    finished = threading.Event()
+
+    def on_done(version):
+        done.append(version)
+        finished.set()
+
+    graph = trap_graph()
+    # A computation in progress holds the cache's lock: the requests wait, the first is superseded and the
+    # repeated version is not requested again
+    with cache.lock:
+        cache.compute_async(types.SimpleNamespace(graph=graph, version=1), None, lambda: on_done(1))
+        cache.compute_async(types.SimpleNamespace(graph=graph, version=2), None, lambda: on_done(2))
+        cache.compute_async(types.SimpleNamespace(graph=graph, version=2), None, lambda: on_done(3))
+        thread = cache.thread
+    assert finished.wait(10)
+    thread.join(10)
+    assert done == [2]
+    assert cache.table.version == 2
+    cache.executor.shutdown()
+
+
+def test_compute_async_retries_a_failed_version(monkeypatch):
+    cache = PathCache(k=2, workers=1)
+    cache.executor = concurrent.futures.ThreadPoolExecutor(1)
+    calls = []
+    real_compute_paths = path_protection.compute_paths
+
+    def failing_once(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise MemoryError("budget")
+        return real_compute_paths(*args)
+
+    monkeypatch.setattr(path_protection, "compute_paths", failing_once)
+    finished = threading.Event()
+    snapshot = types.SimpleNamespace(graph=trap_graph(), version=1)
+    cache.compute_async(snapshot, None, finished.set)
+    thread = cache.thread
+    if thread is not None:
+        thread.join(10)
+    assert cache.table is None and not finished.is_set()
+    cache.compute_async(snapshot, None, finished.set)
+    assert finished.wait(10)
+    assert cache.table.version == 1
+    cache.executor.shutdown()
@@ -0,0 +1,45 @@
+import threading
+import time
+
+from recompute_scheduler import RecomputeScheduler
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = 0
+        self.event = threading.Event()
+
+    def __call__(self, cancelled):
+        self.calls += 1
+        self.event.set()
+        return True
+
+
+def test_first_computation_runs_at_start():
+    compute = Recorder()
+    scheduler = RecomputeScheduler(compute, period=60)
+    scheduler.start()
+    try:
+        assert compute.event.wait(2)
+    finally:
+        scheduler.stop()
+    counters = scheduler.counters()
+    assert counters["started"] == counters["completed"] == counters["periodic"] == 1
+
+
+def test_burst_of_changes_is_coalesced():
+    compute = Recorder()
+    scheduler = RecomputeScheduler(compute, period=60, min_delay=0.1, max_delay=1)
+    scheduler.start()
+    try:
+        assert compute.event.wait(2)
+        compute.event.clear()
+        for _ in range(5):
+            scheduler.notify()
+        assert compute.event.wait(3)
+        time.sleep(0.3)
+    finally:
+        scheduler.stop()
+    counters = scheduler.counters()
+    assert compute.calls == 2
+    assert counters["queued"] == 5 and counters["coalesced"] == 4
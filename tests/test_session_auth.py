@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+import controllerserver
+import session_auth
+from controllerserver import TCPServer
+
+NODE = "10.0.0.1"
+
+
+@pytest.fixture
+def server():
+    server = TCPServer("localhost", 0, "dijkstra")
+    server.routing_tables = server.build_routing_tables(controllerserver.network.graph)
+    server.table_version = 1
+    return server
+
+
+def handshake(server, session_key):
+    request = session_auth.handshake_request(NODE, session_key, -1, controllerserver.public_key)
+    reply = json.loads(server.process_request(request))
+    return request, session_auth.session_mac_key(session_key, bytes.fromhex(reply["nonce"]))
+
+
+def accepted(server, request):
+    return "error" not in json.loads(server.process_request(request))
+
+
+def test_heartbeats_are_accepted_once(server):
+    _, mac_key = handshake(server, session_auth.new_session_key())
+    first = session_auth.heartbeat_request(NODE, mac_key, 1, 1)
+    second = session_auth.heartbeat_request(NODE, mac_key, 2, 1, report={"10.0.0.2": [100.0, 0]})
+    assert accepted(server, first)
+    assert accepted(server, second)
+    assert not accepted(server, second)
+    assert not accepted(server, first)
+
+
+def test_forged_mac_is_rejected(server):
+    _, mac_key = handshake(server, session_auth.new_session_key())
+    assert not accepted(server, session_auth.heartbeat_request(NODE, b"x" * len(mac_key), 1, 1))
+    assert not accepted(server, session_auth.heartbeat_request(NODE, mac_key, 1, 1).replace(b" 1 1 ", b" 1 2 "))
+
+
+def test_replayed_handshake_does_not_revive_captured_heartbeats(server):
+    hello, mac_key = handshake(server, session_auth.new_session_key())
+    captured = [session_auth.heartbeat_request(NODE, mac_key, counter, 1) for counter in (1, 2, 3)]
+    for heartbeat in captured:
+        assert accepted(server, heartbeat)
+    # The replayed handshake restarts the counter, but under a key bound to a new nonce
+    assert "nonce" in json.loads(server.process_request(hello))
+    for heartbeat in captured:
+        assert not accepted(server, heartbeat)
@@ -0,0 +1,79 @@
+import os
+import threading
+
+import pytest
+
+from shared_routes import SharedRoutingReader, SharedRoutingTables
+
+NAMES = [f"10.0.0.{index}" for index in range(1, 41)]
+
+
+@pytest.fixture
+def tables():
+    tables = SharedRoutingTables(NAMES, f"nsfnet_test_{os.getpid()}")
+    yield tables
+    tables.close()
+
+
+def star(hub):
+    # Every node routes through the hub, so a row that mixes two versions has two different next hops
+    return {source: {destination: [source, hub, destination] for destination in NAMES if destination != source}
+            for source in NAMES}
+
+
+def test_reader_sees_published_next_hops(tables):
+    tables.publish({"10.0.0.1": {"10.0.0.3": ["10.0.0.1", "10.0.0.2", "10.0.0.3"], "10.0.0.1": ["10.0.0.1"]}})
+    reader = SharedRoutingReader("10.0.0.1", tables.segment.name.lstrip("/"))
+    try:
+        assert reader.version() == 1
+        assert reader.next_hop("10.0.0.3") == "10.0.0.2"
+        assert reader.next_hop("10.0.0.1") == "10.0.0.1"
+        assert reader.next_hop("10.0.0.4") is None
+        assert reader.next_hop("10.9.9.9") is None
+        reader.heartbeat()
+        assert list(tables.heartbeats()) == ["10.0.0.1"]
+    finally:
+        reader.close()
+
+
+def test_reader_waits_while_a_write_is_in_progress(tables):
+    tables.publish(star("10.0.0.2"))
+    reader = SharedRoutingReader("10.0.0.1", tables.segment.name.lstrip("/"))
+    try:
+        tables._header[0] += 1  # A writer that started but did not finish
+        result = []
+        thread = threading.Thread(target=lambda: result.append(reader._read_row()), daemon=True)
+        thread.start()
+        thread.join(0.2)
+        assert thread.is_alive()
+        tables._header[0] += 1
+        thread.join(2)
+        assert result and result[0][0] == 2  # The version of the finished write
+    finally:
+        reader.close()
+
+
+def test_concurrent_reads_never_mix_versions(tables):
+    hubs = ["10.0.0.2", "10.0.0.3"]
+    tables.publish(star(hubs[0]))
+    versions = [star(hub) for hub in hubs]
+    reader = SharedRoutingReader("10.0.0.1", tables.segment.name.lstrip("/"))
+    done = threading.Event()
+
+    def write():
+        for count in range(2000):
+            tables.publish(versions[count % 2])
+        done.set()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        reads = 0
+        while not done.is_set() or reads == 0:
+            version, row = reader._read_row()
+            hops = {int(hop) for position, hop in enumerate(row) if position != 0}
+            assert len(hops) == 1, f"torn read of version {version}: {hops}"
+            reads += 1
+    finally:
+        writer.join()
+        reader.close()
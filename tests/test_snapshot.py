@@ -0,0 +1,48 @@
+import areas
+import topology
+from network import Network
+from snapshot import TopologySnapshot, write_snapshot
+
+
+def _small_network():
+    network = Network()
+    network.add_node(1, "a")
+    network.add_node(2, "b", "host", area=1)
+    network.add_node(3, "c", area=1)
+    network.add_link(1, 2, 300)
+    network.add_link(2, 3, 600)
+    return network
+
+
+def test_round_trip_keeps_areas_types_and_links(tmp_path):
+    file_name = str(tmp_path / "topology.snap")
+    network = _small_network()
+    write_snapshot(network, file_name)
+    snapshot = TopologySnapshot(file_name)
+    restored = snapshot.to_network()
+    assert {(node.node_id, node.name, node.node_type, node.area) for node in restored.nodes.values()} == \
+           {(1, "a", "router", 0), (2, "b", "host", 1), (3, "c", "router", 1)}
+    assert sorted((link.source.name, link.destination.name, link.bandwidth) for link in restored.links) == \
+           [("a", "b", 300), ("b", "c", 600)]
+    snapshot.close()
+
+
+def test_round_trip_keeps_hierarchical_routing(tmp_path):
+    file_name = str(tmp_path / "areas.snap")
+    network = topology.generate_topology("multi_area", 1200)
+    assert areas.is_hierarchical(network.graph)
+    write_snapshot(network, file_name)
+    snapshot = TopologySnapshot(file_name)
+    assert areas.is_hierarchical(snapshot.to_network().graph)
+    snapshot.close()
+
+
+def test_next_hops(tmp_path):
+    file_name = str(tmp_path / "routes.snap")
+    write_snapshot(_small_network(), file_name, {"a": {"a": ["a"], "c": ["a", "b", "c"], "media:c": ["a", "b"]}})
+    snapshot = TopologySnapshot(file_name)
+    assert snapshot.next_hop("a", "c") == "b"
+    assert snapshot.next_hop("a", "a") == "a"
+    assert snapshot.next_hop("c", "a") is None
+    assert snapshot.routing_table("a") == {"a": ["a"], "c": ["a", "b"]}
+    snapshot.close()
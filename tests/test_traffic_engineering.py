@@ -0,0 +1,54 @@
+import networkx as nx
+import pytest
+
+from traffic_engineering import LinkLoadMeter, LinkUtilization
+
+
+@pytest.fixture
+def graph():
+    # Two routes from a to c: the direct 300 Gbps link, or the longer one over b with 500 Gbps links
+    graph = nx.Graph()
+    graph.add_weighted_edges_from([("a", "c", 1 / 300), ("a", "b", 1 / 500), ("b", "c", 1 / 500)])
+    return graph
+
+
+def test_mesh_load_does_not_register_at_the_default_capacity(graph):
+    traffic = LinkUtilization()
+    assert not traffic.update("a", {"c": [30000.0, 0]}, graph)
+    assert traffic.utilization("a", "c", graph) == pytest.approx(30000 / (300 * 125e6))
+
+
+def test_capacity_per_bandwidth_scales_the_utilization(graph):
+    traffic = LinkUtilization(capacity_per_bandwidth=125)
+    assert traffic.update("a", {"c": [30000.0, 0]}, graph)
+    assert traffic.utilization("a", "c", graph) == pytest.approx(0.8)
+    # The congested direct link now weighs more than the detour
+    weighted = traffic.weighted_graph(graph)
+    assert nx.shortest_path(weighted, "a", "c", weight="weight") == ["a", "b", "c"]
+    assert nx.shortest_path(graph, "a", "c", weight="weight") == ["a", "c"]
+
+
+def test_small_changes_are_absorbed_by_the_hysteresis(graph):
+    traffic = LinkUtilization(capacity_per_bandwidth=125, smoothing=1.0, hysteresis=0.25)
+    assert traffic.update("a", {"c": [18750.0, 0]}, graph)  # Utilization 0.5: factor 2
+    assert not traffic.update("a", {"c": [20000.0, 0]}, graph)  # Factor 2.14, within 25%
+    assert traffic.update("a", {"c": [30000.0, 0]}, graph)  # Factor 5
+
+
+def test_idle_neighbors_are_reported():
+    meter = LinkLoadMeter()
+    with meter.sending("b", 1000):
+        pass
+    assert meter.report()["b"][0] > 0
+    assert meter.report() == {"b": [0.0, 0]}
+
+
+def test_factor_of_a_link_returns_to_1_once_its_load_stops(graph):
+    traffic = LinkUtilization(capacity_per_bandwidth=125)
+    assert traffic.update("a", {"c": [30000.0, 0]}, graph)
+    assert traffic.factors[("a", "c")] > 4
+    changes = [traffic.update("a", {"c": [0.0, 0]}, graph) for _ in range(30)]
+    assert changes[-1] is False and any(changes)
+    assert ("a", "c") not in traffic.factors
+    assert traffic.utilization("a", "c", graph) < 0.01
+    assert traffic.weighted_graph(graph) is graph
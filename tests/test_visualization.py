@@ -0,0 +1,35 @@
+import networkx as nx
+from visualization import LayoutCache, topology_key
+
+
+def test_topology_key_ignores_order_and_sees_edges():
+    graph = nx.Graph([("a", "b"), ("b", "c")])
+    same = nx.Graph([("c", "b"), ("b", "a")])
+    rewired = nx.Graph([("a", "b"), ("a", "c")])
+    assert topology_key(graph) == topology_key(same)
+    assert topology_key(graph) != topology_key(rewired)
+
+
+def test_restarted_cache_does_not_reuse_layout_of_another_topology(tmp_path):
+    cache_file = str(tmp_path / "layout.json")
+    LayoutCache(cache_file).positions(nx.Graph([("a", "b"), ("b", "c")]))
+    # Same number of nodes after a restart, but c was replaced by d
+    positions = LayoutCache(cache_file).positions(nx.Graph([("a", "b"), ("b", "d")]))
+    assert set(positions) == {"a", "b", "d"}
+
+
+def test_restarted_cache_keeps_positions_of_same_topology(tmp_path):
+    cache_file = str(tmp_path / "layout.json")
+    graph = nx.Graph([("a", "b"), ("b", "c")])
+    first = LayoutCache(cache_file).positions(graph)
+    assert LayoutCache(cache_file).positions(graph) == first
+
+
+def test_positions_returns_a_copy():
+    cache = LayoutCache()
+    graph = nx.Graph([("a", "b")])
+    positions = cache.positions(graph)
+    positions["a"] = (99.0, 99.0)
+    del positions["b"]
+    assert set(cache.positions(graph)) == {"a", "b"}
+    assert cache.positions(graph)["a"] != (99.0, 99.0)
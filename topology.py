@@ -0,0 +1,242 @@
+"""
+API Documentation
+
+This module generates large synthetic topologies and stores them in a compact file.
+
+Topologies are built with Network.bulk_load, which skips the per-call checks of add_node and add_link,
+so networks with tens of thousands of nodes load in a fraction of a second. Node i is named after the
+address 10.0.0.0 + i and listens on port 9010 + i, as the NSFNet nodes do.
+
+The 'multi_area' family joins several geometric areas of AREA_SIZE nodes into a ring of routing
+areas, with a few extra links between random areas. Node IDs are area << 16 | index, so that the nodes
+of area k are named 10.k.x.y and every area is summarized by one address prefix.
+
+A topology file is gzip-compressed JSON holding one array per column:
+
+    {"format": 1, "node_ids": [...], "names": [...], "node_types": [...], "areas": [...],
+     "sources": [...], "destinations": [...], "bandwidths": [...]}
+
+The "areas" column is optional; nodes without one are in area 0.
+
+Functions:
+    node_name(node_id: int) -> str:
+        Returns the address used as the name of a node.
+
+    generate_graph(family: str, node_count: int, seed: int = 1) -> NetworkX Graph:
+        Generates a connected synthetic topology with integer node labels, and an "area" attribute for
+        the 'multi_area' family.
+
+    generate_topology(family: str, node_count: int, seed: int = 1) -> Network:
+        Generates a synthetic Network with NSFNet link bandwidths.
+
+    port_mapping(network: Network) -> dict:
+        Returns the listen port of every node, keyed by node name.
+
+    save_topology(network: Network, file_name: str):
+        Writes a network to a topology file.
+
+    load_topology(file_name: str) -> Network:
+        Reads a network from a topology file.
+"""
+import argparse
+import gzip
+import json
+import math
+import random
+import networkx as nx
+import numpy as np
+from network import Network
+
+FORMAT_VERSION = 1
+FAMILIES = ("geometric", "waxman", "grid", "scale_free", "multi_area")
+AREA_SIZE = 500
+BANDWIDTHS = (300, 600, 1200, 1500, 2100, 2400, 2700, 3000, 3600, 3900, 4800)  # As on the NSFNet links
+PORT_BASE = 9010
+MAX_PORT = 65535
+
+
+def node_name(node_id):
+    """
+    Returns the address used as the name of a node, 10.0.0.0 + node_id.
+
+    Args:
+        node_id (int): The ID of the node.
+
+    Returns:
+        str: The name of the node.
+    """
+    return f"10.{node_id >> 16 & 255}.{node_id >> 8 & 255}.{node_id & 255}"
+
+
+def generate_graph(family, node_count, seed=1):
+    """
+    Generates a connected synthetic topology with integer node labels starting at 1.
+
+    Disconnected generators keep their largest connected component, so the returned graph can have
+    slightly fewer nodes than requested.
+
+    Args:
+        family (str): One of 'geometric', 'waxman', 'grid', 'scale_free' or 'multi_area'.
+        node_count (int): Number of nodes.
+        seed (int, optional): Random seed (default is 1).
+
+    Returns:
+        NetworkX Graph: The topology.
+    """
+    if family == "multi_area":
+        return _multi_area_graph(node_count, seed)
+    if family == "geometric":
+        radius = 1.5 * math.sqrt(math.log(node_count) / (math.pi * node_count))
+        graph = nx.random_geometric_graph(node_count, radius, seed=seed)
+    elif family == "waxman":
+        graph = _waxman_graph(node_count, seed)
+    elif family == "grid":
+        side = max(2, round(math.sqrt(node_count)))
+        graph = nx.grid_2d_graph(side, side)
+    elif family == "scale_free":
+        graph = nx.barabasi_albert_graph(node_count, 2, seed=seed)
+    else:
+        raise ValueError(f"Invalid topology family: {family}")
+    if not nx.is_connected(graph):
+        graph = graph.subgraph(max(nx.connected_components(graph), key=len))
+    return nx.convert_node_labels_to_integers(graph, first_label=1)
+
+
+def _waxman_graph(node_count, seed, beta=0.4, mean_degree=6):
+    # nx.waxman_graph loops over all node pairs in Python; this draws the same model row by row with NumPy.
+    # Edge probability is beta * exp(-d / (alpha * L)), alpha is scaled so the mean degree stays bounded.
+    rng = np.random.default_rng(seed)
+    points = rng.random((node_count, 2))
+    scale = min(0.4 * math.sqrt(2), math.sqrt(mean_degree / (beta * node_count * 2 * math.pi)))
+    graph = nx.Graph()
+    graph.add_nodes_from(range(node_count))
+    for i in range(node_count - 1):
+        distances = np.hypot(*(points[i + 1:] - points[i]).T)
+        hits = np.nonzero(rng.random(len(distances)) < beta * np.exp(-distances / scale))[0]
+        graph.add_edges_from((i, i + 1 + j) for j in hits.tolist())
+    return graph
+
+
+def _multi_area_graph(node_count, seed):
+    area_count = max(1, min(255, round(node_count / AREA_SIZE)))
+    rng = random.Random(seed)
+    graph = nx.Graph()
+    members = []
+    for area in range(area_count):
+        area_graph = generate_graph("geometric", max(2, node_count // area_count), seed + area)
+        graph.add_nodes_from((area << 16 | node for node in area_graph), area=area)
+        graph.add_edges_from((area << 16 | u, area << 16 | v) for u, v in area_graph.edges)
+        members.append([area << 16 | node for node in area_graph])
+    # A ring of areas, plus a few chords; every connection is made of two links between random nodes
+    pairs = [(area, (area + 1) % area_count) for area in range(area_count)] if area_count > 1 else []
+    if area_count > 3:
+        pairs += [tuple(rng.sample(range(area_count), 2)) for _ in range(area_count // 2)]
+    for a, b in pairs:
+        for _ in range(2):
+            graph.add_edge(rng.choice(members[a]), rng.choice(members[b]))
+    return graph
+
+
+def generate_topology(family, node_count, seed=1):
+    """
+    Generates a synthetic Network. Every link gets a bandwidth drawn from the NSFNet link bandwidths.
+
+    Args:
+        family (str): One of 'geometric', 'waxman', 'grid', 'scale_free' or 'multi_area'.
+        node_count (int): Number of nodes.
+        seed (int, optional): Random seed (default is 1).
+
+    Returns:
+        Network: The network.
+    """
+    graph = generate_graph(family, node_count, seed)
+    rng = random.Random(seed)
+    network = Network()
+    network.bulk_load(((node_id, node_name(node_id), "router", area)
+                       for node_id, area in graph.nodes(data="area", default=0)),
+                      ((source_id, destination_id, rng.choice(BANDWIDTHS)) for source_id, destination_id in graph.edges))
+    return network
+
+
+def port_mapping(network):
+    """
+    Returns the listen port of every node, 9010 + node ID, keyed by node name. When the nodes are in
+    several areas, whose IDs are spread out, they get consecutive ports in node ID order instead.
+
+    Args:
+        network (Network): The network.
+
+    Returns:
+        dict: The port mapping, in the format of port_mapping.json.
+    """
+    nodes = network.nodes.values()
+    if any(node.area for node in nodes):
+        mapping = {network.nodes[node_id].name: PORT_BASE + index
+                   for index, node_id in enumerate(sorted(network.nodes))}
+    else:
+        mapping = {node.name: PORT_BASE + node.node_id for node in nodes}
+    if mapping and max(mapping.values()) > MAX_PORT:
+        raise ValueError(f"Too many nodes for one host: ports above {MAX_PORT} would be needed.")
+    return mapping
+
+
+def save_topology(network, file_name):
+    """
+    Writes a network to a topology file.
+
+    Args:
+        network (Network): The network.
+        file_name (str): The file to write.
+    """
+    nodes = list(network.nodes.values())
+    data = {
+        "format": FORMAT_VERSION,
+        "node_ids": [node.node_id for node in nodes],
+        "names": [node.name for node in nodes],
+        "node_types": [node.node_type for node in nodes],
+        "areas": [node.area for node in nodes],
+        "sources": [link.source.node_id for link in network.links],
+        "destinations": [link.destination.node_id for link in network.links],
+        "bandwidths": [link.bandwidth for link in network.links],
+    }
+    with gzip.open(file_name, "wt") as file:
+        json.dump(data, file, separators=(",", ":"))
+
+
+def load_topology(file_name):
+    """
+    Reads a network from a topology file.
+
+    Args:
+        file_name (str): The file to read.
+
+    Returns:
+        Network: The network.
+    """
+    with gzip.open(file_name, "rt") as file:
+        data = json.load(file)
+    if data.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported topology file format: {data.get('format')}")
+    network = Network()
+    areas = data.get("areas") or [0] * len(data["node_ids"])
+    network.bulk_load(zip(data["node_ids"], data["names"], data["node_types"], areas),
+                      zip(data["sources"], data["destinations"], data["bandwidths"]))
+    return network
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic topology file.")
+    parser.add_argument("output", help="topology file to write, e.g. geometric_20k.json.gz")
+    parser.add_argument("--family", default="geometric", choices=FAMILIES)
+    parser.add_argument("--nodes", type=int, default=1000, help="number of nodes")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port-mapping", help="also write the matching port mapping to this JSON file")
+    args = parser.parse_args()
+
+    network = generate_topology(args.family, args.nodes, args.seed)
+    save_topology(network, args.output)
+    print(f"Wrote {len(network.nodes)} nodes and {len(network.links)} links to {args.output}")
+    if args.port_mapping:
+        with open(args.port_mapping, "w") as file:
+            json.dump(port_mapping(network), file, indent=4)
+        print(f"Port mapping written to {args.port_mapping}")
@@ -0,0 +1,218 @@
+"""
+API Documentation
+
+This module provides load-aware traffic engineering: nodes measure the traffic they send to each
+neighbor, and the controller turns those measurements into congestion-aware link weights.
+
+Nodes count the bytes they forward to each neighbor and the number of messages waiting to be sent to it
+(their queue depth), and report both with every heartbeat: {neighbor: [bytes per second, queue depth]}.
+Every neighbor a node has sent to is in its reports, with [0.0, 0] once idle, so that the load of a link
+that routes moved away from decays too.
+
+The controller smooths the reports of every link direction with an exponentially weighted moving
+average. The utilization of a link is the busier of its two directions, divided by its capacity, which
+follows from its bandwidth and so from its static weight 1/bandwidth. Link.bandwidth is in Gbps, so by
+default a link carries capacity_per_bandwidth = 125,000,000 bytes per second per unit of bandwidth. The
+NSFNet links of 300 to 4800 Gbps are far beyond what the local mesh of node processes forwards over
+loopback TCP, where the utilization stays near 0; to route the mesh by its load, the controller's
+--te-capacity-per-bandwidth option scales the capacities, e.g. 125 to read the bandwidths as kbit/s.
+Routes are computed with the static weight multiplied by a congestion factor,
+
+    factor = 1 / (1 - min(utilization, max_utilization)) + queue_penalty * queue depth
+
+which grows like the queueing delay of the link. To keep routes from flapping, the factor used for a
+link only changes when the new one differs from it by more than the hysteresis ratio, and only those
+changes trigger a recomputation. Factors within the hysteresis of 1.0 count as 1.0, so that a link whose
+load stops gets back its static weight, rather than keeping a factor a little above 1.0.
+
+Classes:
+    LinkLoadMeter:
+        The node side: measures the traffic sent to each neighbor.
+
+        Methods:
+            __init__(self):
+                Initializes the counters.
+
+            sending(self, neighbor: str, size: int):
+                Context manager around the sending of a message to a neighbor.
+
+            report(self) -> dict:
+                Returns the load per neighbor since the last report.
+
+    LinkUtilization:
+        The controller side: smoothed utilization and congestion-aware weights.
+
+        Methods:
+            __init__(self, capacity_per_bandwidth: float = 125000000.0, smoothing: float = 0.3,
+                     hysteresis: float = 0.25, max_utilization: float = 0.95, queue_penalty: float = 0.1):
+                Initializes the link state.
+
+            update(self, node_name: str, report: dict, graph: NetworkX Graph) -> bool:
+                Records a node's load report and returns whether a congestion factor changed.
+
+            utilization(self, source: str, destination: str, graph: NetworkX Graph) -> float:
+                Returns the smoothed utilization of a link.
+
+            weighted_graph(self, graph: NetworkX Graph) -> NetworkX Graph:
+                Returns a copy of a graph with congestion-aware weights.
+"""
+import collections
+import contextlib
+import threading
+import time
+
+
+class LinkLoadMeter:
+    def __init__(self):
+        """Initializes the counters."""
+
+        self.lock = threading.Lock()
+        self.bytes_sent = collections.Counter()
+        self.in_flight = collections.Counter()
+        self.peak_queue = collections.Counter()  # Most messages waiting for a neighbor since the last report
+        self.neighbors = set()  # Every neighbor sent to, reported even when idle
+        self.since = time.monotonic()
+
+    @contextlib.contextmanager
+    def sending(self, neighbor, size):
+        """
+        Context manager around the sending of a message to a neighbor: the message counts in the queue
+        depth while the block runs, and its size in the bytes sent.
+
+        Args:
+            neighbor (str): The name of the neighbor.
+            size (int): The size of the message in bytes.
+        """
+        with self.lock:
+            self.neighbors.add(neighbor)
+            self.in_flight[neighbor] += 1
+            self.peak_queue[neighbor] = max(self.peak_queue[neighbor], self.in_flight[neighbor])
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.in_flight[neighbor] -= 1
+                self.bytes_sent[neighbor] += size
+
+    def report(self):
+        """
+        Returns the load per neighbor since the last report, and starts a new measurement period.
+
+        Returns:
+            dict: Neighbor name -> [bytes per second, peak queue depth], for every neighbor sent to.
+        """
+        now = time.monotonic()
+        with self.lock:
+            elapsed = max(now - self.since, 1e-3)
+            report = {neighbor: [round(self.bytes_sent[neighbor] / elapsed, 1), self.peak_queue[neighbor]]
+                      for neighbor in self.neighbors}
+            self.bytes_sent.clear()
+            self.peak_queue = collections.Counter({neighbor: count for neighbor, count in self.in_flight.items()
+                                                   if count})
+            self.since = now
+        return report
+
+
+class LinkUtilization:
+    def __init__(self, capacity_per_bandwidth=1e9 / 8, smoothing=0.3, hysteresis=0.25, max_utilization=0.95,
+                 queue_penalty=0.1):
+        """
+        Initializes the link state.
+
+        Args:
+            capacity_per_bandwidth (float, optional): Bytes per second a link carries per unit of bandwidth
+                                                      (default is 125000000.0, for bandwidths in Gbps).
+            smoothing (float, optional): Weight of the newest report in the moving averages (default is 0.3).
+            hysteresis (float, optional): Relative change of a congestion factor below which the factor in use
+                                          is kept (default is 0.25).
+            max_utilization (float, optional): Utilization at which the factor stops growing (default is 0.95).
+            queue_penalty (float, optional): Factor added per message waiting on the link (default is 0.1).
+        """
+        self.capacity_per_bandwidth = capacity_per_bandwidth
+        self.smoothing = smoothing
+        self.hysteresis = hysteresis
+        self.max_utilization = max_utilization
+        self.queue_penalty = queue_penalty
+        self.rates = {}  # (source, destination) -> smoothed bytes per second
+        self.queues = {}  # (source, destination) -> smoothed queue depth
+        self.factors = {}  # Undirected link (sorted pair) -> congestion factor in use
+        self.lock = threading.Lock()
+
+    def _smooth(self, averages, key, value):
+        previous = averages.get(key)
+        averages[key] = value if previous is None else previous + self.smoothing * (value - previous)
+
+    def _utilization(self, source, destination, graph):
+        capacity = self.capacity_per_bandwidth / graph[source][destination]["weight"]
+        load = max(self.rates.get((source, destination), 0.0), self.rates.get((destination, source), 0.0))
+        return load / capacity
+
+    def update(self, node_name, report, graph):
+        """
+        Records a node's load report and updates the congestion factors of its links.
+
+        Args:
+            node_name (str): The reporting node.
+            report (dict): Neighbor name -> [bytes per second, queue depth], as from LinkLoadMeter.report.
+            graph (NetworkX Graph): The topology, with the static weights.
+
+        Returns:
+            bool: True if the factor of a link changed by more than the hysteresis, so routes should be
+                  recomputed.
+        """
+        changed = False
+        with self.lock:
+            for neighbor, (rate, queue) in report.items():
+                if not graph.has_edge(node_name, neighbor):
+                    continue
+                self._smooth(self.rates, (node_name, neighbor), rate)
+                self._smooth(self.queues, (node_name, neighbor), queue)
+                queue = max(self.queues.get((node_name, neighbor), 0.0), self.queues.get((neighbor, node_name), 0.0))
+                utilization = min(self._utilization(node_name, neighbor, graph), self.max_utilization)
+                factor = 1.0 / (1.0 - utilization) + self.queue_penalty * queue
+                if factor - 1.0 <= self.hysteresis:
+                    factor = 1.0
+                link = tuple(sorted((node_name, neighbor)))
+                current = self.factors.get(link, 1.0)
+                if factor != current and (factor == 1.0 or abs(factor / current - 1.0) > self.hysteresis):
+                    if factor == 1.0:
+                        del self.factors[link]
+                    else:
+                        self.factors[link] = factor
+                    changed = True
+        return changed
+
+    def utilization(self, source, destination, graph):
+        """
+        Returns the smoothed utilization of a link: its busier direction, relative to its capacity.
+
+        Args:
+            source (str): One end of the link.
+            destination (str): The other end.
+            graph (NetworkX Graph): The topology, with the static weights.
+
+        Returns:
+            float: The utilization, 0.0 for a link without reports.
+        """
+        with self.lock:
+            return self._utilization(source, destination, graph)
+
+    def weighted_graph(self, graph):
+        """
+        Returns a copy of a graph whose weights are multiplied by the congestion factors in use.
+
+        Args:
+            graph (NetworkX Graph): The topology, with the static weights.
+
+        Returns:
+            NetworkX Graph: The copy, or the graph itself if no link has a congestion factor.
+        """
+        with self.lock:
+            factors = dict(self.factors)
+        if not factors:
+            return graph
+        weighted = graph.copy()
+        for (source, destination), factor in factors.items():
+            if weighted.has_edge(source, destination):
+                weighted[source][destination]["weight"] *= factor
+        return weighted
@@ -0,0 +1,343 @@
+"""
+API Documentation
+
+This module provides stable graph layouts and headless, non-blocking rendering of the network.
+
+Rendering is done with the Agg canvas directly (no pyplot, no GUI window), so it works on servers
+and on background worker threads, and callers such as the clients' send_message never wait for a figure.
+
+Classes:
+    LayoutCache:
+        Node positions that survive topology changes and can be persisted to disk.
+
+        Methods:
+            __init__(self, cache_file: str = None, seed: int = 1, spring_limit: int = 1000):
+                Initializes the cache, loading positions from cache_file if it exists.
+
+            positions(self, graph: NetworkX Graph) -> dict:
+                Returns positions for every node of the graph, placing only new nodes.
+
+            save(self):
+                Writes the cached positions to cache_file.
+
+    TopologyAnimator:
+        Writes numbered frames of the topology with failed nodes highlighted.
+
+        Methods:
+            __init__(self, output_dir: str = 'topology_frames', layout_cache: LayoutCache = None,
+                     file_format: str = 'png', dpi: int = 80, label_limit: int = 100):
+                Initializes the animator.
+
+            write_frame(self, network: Network, failed_nodes: iterable = None) -> str:
+                Renders the current topology to the next frame file and returns its name.
+
+    PathRenderer:
+        A background worker that batches path highlights into image files.
+
+        Methods:
+            __init__(self, output_dir: str = 'path_renders', file_format: str = 'png',
+                     batch_size: int = 8, batch_interval: float = 0.5, layout_cache: LayoutCache = None):
+                Initializes the renderer and starts its worker thread.
+
+            submit(self, path: list, network: Network):
+                Queues a path to be highlighted in the next rendered figure.
+
+            close(self, timeout: float = None):
+                Flushes pending paths and stops the worker thread.
+
+Functions:
+    draw_paths(ax, graph, pos, paths):
+        Draws the graph on the given axes and highlights each of the given paths.
+
+    topology_key(graph: NetworkX Graph) -> str:
+        Returns a digest of the node and edge sets of a graph.
+"""
+import hashlib
+import os
+import json
+import queue
+import random
+import threading
+import networkx as nx
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+PATH_COLORS = ['red', 'green', 'orange', 'purple', 'brown', 'magenta', 'olive', 'cyan']
+
+
+def draw_paths(ax, graph, pos, paths):
+    """
+    Draws the graph on the given axes and highlights each of the given paths.
+
+    Args:
+        ax (matplotlib.axes.Axes): The axes to draw on.
+        graph (NetworkX Graph): The network topology.
+        pos (dict): Node positions keyed by node name.
+        paths (list): A list of paths, each a list of node names.
+    """
+    nx.draw(graph, pos, ax=ax, with_labels=True, node_color='lightblue', node_size=500, font_size=10,
+            font_weight='bold')
+    for index, path in enumerate(paths):
+        color = PATH_COLORS[index % len(PATH_COLORS)]
+        path_edges = list(zip(path, path[1:]))
+        nx.draw_networkx_nodes(graph, pos, ax=ax, nodelist=path, node_color=color)
+        nx.draw_networkx_edges(graph, pos, ax=ax, edgelist=path_edges, edge_color=color, width=2)
+
+
+def topology_key(graph):
+    """
+    Returns a digest of the node and edge sets of a graph, the same in every process and after restarts,
+    unlike Network.version.
+
+    Args:
+        graph (NetworkX Graph): The network topology.
+
+    Returns:
+        str: The hexadecimal digest.
+    """
+    digest = hashlib.sha1()
+    for node in sorted(map(str, graph)):
+        digest.update(node.encode() + b"\0")
+    digest.update(b"\1")
+    for edge in sorted("\0".join(sorted(map(str, edge))) for edge in graph.edges()):
+        digest.update(edge.encode() + b"\1")
+    return digest.hexdigest()
+
+
+class LayoutCache:
+    def __init__(self, cache_file=None, seed=1, spring_limit=1000):
+        """
+        Initializes the cache, loading positions from cache_file if it exists.
+
+        Args:
+            cache_file (str, optional): JSON file the positions are persisted to.
+            seed (int, optional): Seed for the initial layout and for the placement jitter (default is 1).
+            spring_limit (int, optional): Largest graph laid out with the O(V^2) spring layout (default is 1000).
+        """
+        self.cache_file = cache_file
+        self.spring_limit = spring_limit
+        self.topology = None
+        self._pos = {}
+        self._random = random.Random(seed)
+        self._seed = seed
+        self._lock = threading.Lock()
+        if cache_file is not None and os.path.exists(cache_file):
+            with open(cache_file, "r") as file:
+                data = json.load(file)
+            self.topology = data.get("topology")
+            self._pos = {node: tuple(xy) for node, xy in data["positions"].items()}
+
+    def positions(self, graph):
+        """
+        Returns positions for every node of the graph.
+
+        Nodes that are already known keep their position, removed nodes are dropped and only new nodes
+        are placed, at the centroid of their already placed neighbors. A full layout is only computed when
+        nothing is known yet: a spring layout, or a spectral layout above spring_limit nodes. When the
+        nodes and edges are those of the last call (see topology_key), the cached positions are reused.
+
+        Args:
+            graph (NetworkX Graph): The network topology.
+
+        Returns:
+            dict: Node positions keyed by node name, a copy the caller may modify.
+        """
+        key = topology_key(graph)
+        with self._lock:
+            if key == self.topology and len(self._pos) == len(graph):
+                return dict(self._pos)
+            if not self._pos:
+                if len(graph) > self.spring_limit:
+                    layout = nx.spectral_layout(graph)
+                else:
+                    layout = nx.spring_layout(graph, seed=self._seed)
+                self._pos = {node: tuple(xy) for node, xy in layout.items()}
+            else:
+                self._pos = {node: xy for node, xy in self._pos.items() if node in graph}
+                self._place_new_nodes(graph)
+            self.topology = key
+            if self.cache_file is not None:
+                self._save()
+            return dict(self._pos)
+
+    def save(self):
+        """Writes the cached positions to cache_file."""
+
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        data = {"topology": self.topology, "positions": {node: list(xy) for node, xy in self._pos.items()}}
+        temp_file = self.cache_file + ".tmp"
+        with open(temp_file, "w") as file:
+            json.dump(data, file, separators=(",", ":"))
+        os.replace(temp_file, self.cache_file)
+
+    def _place_new_nodes(self, graph):
+        pending = [node for node in graph if node not in self._pos]
+        if not pending:
+            return
+        xs = [x for x, _ in self._pos.values()] or [0.0]
+        ys = [y for _, y in self._pos.values()] or [0.0]
+        spread = 0.05 * max(max(xs) - min(xs), max(ys) - min(ys), 1.0)
+        # Nodes next to placed ones go first so chains of new nodes are seeded from each other
+        while pending:
+            remaining = []
+            for node in pending:
+                placed = [self._pos[neighbor] for neighbor in graph[node] if neighbor in self._pos]
+                if placed:
+                    x = sum(p[0] for p in placed) / len(placed) + self._random.uniform(-spread, spread)
+                    y = sum(p[1] for p in placed) / len(placed) + self._random.uniform(-spread, spread)
+                    self._pos[node] = (x, y)
+                else:
+                    remaining.append(node)
+            if len(remaining) == len(pending):
+                # Nodes without placed neighbors are scattered over the current drawing area
+                for node in remaining:
+                    self._pos[node] = (self._random.uniform(min(xs), max(xs)), self._random.uniform(min(ys), max(ys)))
+                break
+            pending = remaining
+
+
+class TopologyAnimator:
+    def __init__(self, output_dir='topology_frames', layout_cache=None, file_format='png', dpi=80,
+                 label_limit=100):
+        """
+        Initializes the animator.
+
+        Args:
+            output_dir (str, optional): Directory the frames are written to (default is 'topology_frames').
+            layout_cache (LayoutCache, optional): Layout cache to use. A new in-memory cache is created if omitted.
+            file_format (str, optional): Image format, 'png' or 'svg' (default is 'png').
+            dpi (int, optional): Resolution of the frames (default is 80).
+            label_limit (int, optional): Node labels are only drawn up to this many nodes (default is 100).
+        """
+        self.output_dir = output_dir
+        self.layout_cache = layout_cache if layout_cache is not None else LayoutCache()
+        self.file_format = file_format
+        self.dpi = dpi
+        self.label_limit = label_limit
+        self.frame = 0
+        self._last_pos = {}
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def write_frame(self, network, failed_nodes=None):
+        """
+        Renders the current topology to the next frame file.
+
+        Args:
+            network (Network): The network instance representing the network topology.
+            failed_nodes (iterable, optional): Names of failed nodes. Defaults to the nodes that were drawn
+                                               in earlier frames and are no longer in the network.
+
+        Returns:
+            str: The name of the written frame file.
+        """
+        graph = network.graph
+        pos = self.layout_cache.positions(graph)
+        self._last_pos.update(pos)
+        if failed_nodes is None:
+            failed_nodes = [node for node in self._last_pos if node not in graph]
+        figure = Figure(figsize=(10, 8))
+        FigureCanvasAgg(figure)
+        ax = figure.add_subplot()
+        ax.set_axis_off()
+        segments = [(pos[u], pos[v]) for u, v in graph.edges()]
+        ax.add_collection(LineCollection(segments, colors='gray', linewidths=0.5, zorder=1))
+        nodes = list(graph.nodes())
+        ax.scatter([pos[n][0] for n in nodes], [pos[n][1] for n in nodes], s=20, c='skyblue', zorder=2)
+        failed = [node for node in failed_nodes if node in self._last_pos]
+        if failed:
+            ax.scatter([self._last_pos[n][0] for n in failed], [self._last_pos[n][1] for n in failed], s=40,
+                       c='red', marker='x', zorder=3)
+        if len(nodes) <= self.label_limit:
+            for node in nodes:
+                ax.annotate(node, pos[node], fontsize=7, ha='center', va='bottom')
+        ax.autoscale_view()
+        self.frame += 1
+        file_name = os.path.join(self.output_dir, f"frame_{self.frame:05d}.{self.file_format}")
+        figure.savefig(file_name, format=self.file_format, dpi=self.dpi)
+        return file_name
+
+
+class PathRenderer:
+    def __init__(self, output_dir='path_renders', file_format='png', batch_size=8, batch_interval=0.5,
+                 layout_cache=None):
+        """
+        Initializes the renderer and starts its worker thread.
+
+        Args:
+            output_dir (str, optional): Directory where the figures are written (default is 'path_renders').
+            file_format (str, optional): Image format, 'png' or 'svg' (default is 'png').
+            batch_size (int, optional): Maximum number of paths highlighted in one figure (default is 8).
+            batch_interval (float, optional): Seconds to wait for more paths before rendering a batch
+                                              (default is 0.5).
+            layout_cache (LayoutCache, optional): Layout cache to use. A new in-memory cache is created if omitted.
+        """
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.rendered = 0
+        self._queue = queue.Queue()
+        self.layout_cache = layout_cache if layout_cache is not None else LayoutCache()
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, path, network):
+        """
+        Queues a path to be highlighted in the next rendered figure. Returns immediately.
+
+        Args:
+            path (list): A list of node names representing the path.
+            network (Network): The network instance representing the network topology.
+        """
+        if path:
+            # Snapshots are immutable, so the worker draws the frozen graph of the current one without a copy
+            self._queue.put((list(path), network.snapshot().graph))
+
+    def close(self, timeout=None):
+        """
+        Flushes pending paths and stops the worker thread.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the worker to finish.
+        """
+        self._queue.put(None)
+        self._worker.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=self.batch_interval)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self._render(batch)
+            except Exception as e:
+                print(f"Error rendering paths: {e}")
+
+    def _render(self, batch):
+        # The most recent topology is drawn; paths over removed nodes are dropped
+        _, graph = batch[-1]
+        paths = [path for path, _ in batch if all(node in graph for node in path)]
+        figure = Figure(figsize=(8, 6))
+        FigureCanvasAgg(figure)
+        ax = figure.add_subplot()
+        draw_paths(ax, graph, self.layout_cache.positions(graph), paths)
+        self.rendered += 1
+        file_name = os.path.join(self.output_dir, f"paths_{self.rendered:05d}.{self.file_format}")
+        figure.savefig(file_name, format=self.file_format)
+        print(f"Rendered {len(paths)} path(s) to {file_name}")